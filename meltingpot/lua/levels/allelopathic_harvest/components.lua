@@ -90,6 +90,7 @@ function Berry:setBerryType(colorId)
     self:_incrementUnripeBerries(unripeBerriesPerType)
     self:_decrementUnripeBerries(unripeBerriesPerType, previousBerryId)
   end
+  self:_getGlobalBerryTracker():onNumBerriesPerTypeChanged()
 end
 
 function Berry:ripen()
@@ -116,15 +117,20 @@ function Berry:start()
   local ripeBerriesPerType, unripeBerriesPerType = self:_getBerriesPerType()
   -- All berries start out unripe.
   self:_incrementUnripeBerries(unripeBerriesPerType)
+  self:_getGlobalBerryTracker():onNumBerriesPerTypeChanged()
 end
 
 function Berry:getBerryColorId()
   return self._variables.colorId
 end
 
-function Berry:_getBerriesPerType()
+function Berry:_getGlobalBerryTracker()
   local sceneObject = self.gameObject.simulation:getSceneObject()
-  local globalBerryTracker = sceneObject:getComponent('GlobalBerryTracker')
+  return sceneObject:getComponent('GlobalBerryTracker')
+end
+
+function Berry:_getBerriesPerType()
+  local globalBerryTracker = self:_getGlobalBerryTracker()
   local ripeBerriesPerType = globalBerryTracker:getRipeBerriesPerType()
   local unripeBerriesPerType = globalBerryTracker:getUnripeBerriesPerType()
   return ripeBerriesPerType, unripeBerriesPerType
@@ -226,6 +232,23 @@ function Regrowth:__init__(kwargs)
   self._config.baseRate = kwargs.baseRate
   self._config.cubicRate = kwargs.cubicRate
   self._config.linearGrowth = kwargs.linearGrowth
+  -- Regrowth components with the same rates share cached probabilities.
+  self._config.ratesKey = string.format(
+      '%.17g,%.17g,%s', kwargs.baseRate, kwargs.cubicRate,
+      tostring(kwargs.linearGrowth))
+  self._getProbabilityForNumBerries = function(numBerries)
+    if self._config.linearGrowth then
+      return self:_getLinearProbability(numBerries)
+    end
+    -- Default case is cubic growth.
+    return self:_getCubicProbability(numBerries)
+  end
+end
+
+function Regrowth:start()
+  local sceneObject = self.gameObject.simulation:getSceneObject()
+  self._globalBerryTracker = sceneObject:getComponent('GlobalBerryTracker')
+  self._berry = self.gameObject:getComponent('Berry')
 end
 
 function Regrowth:onStateChange(previousState)
@@ -241,10 +264,9 @@ function Regrowth:update()
   if self._countdown > 0 then
     return
   end
-  local berry = self.gameObject:getComponent('Berry')
   local probability = self:getProbability()
-  if random:uniformReal(0, 1) < probability and not berry:isRipe() then
-    berry:ripen()
+  if random:uniformReal(0, 1) < probability and not self._berry:isRipe() then
+    self._berry:ripen()
   end
 end
 
@@ -263,25 +285,9 @@ function Regrowth:_getLinearProbability(numBerries)
 end
 
 function Regrowth:getProbability()
-  -- Get global variable references.
-  local sceneObject = self.gameObject.simulation:getSceneObject()
-  local globalBerryTracker = sceneObject:getComponent('GlobalBerryTracker')
-  local ripeBerriesPerType = globalBerryTracker:getRipeBerriesPerType()
-  local unripeBerriesPerType = globalBerryTracker:getUnripeBerriesPerType()
-
-  -- Get the id of the current berry type.
-  local id = self.gameObject:getComponent('Berry'):getBerryColorId()
-
-  -- Calculate the respawn probability.
-  local numRipe = ripeBerriesPerType(id):val()
-  local numUnripe = unripeBerriesPerType(id):val()
-  local numBerries = numRipe + numUnripe
-
-  if self._config.linearGrowth then
-    return self:_getLinearProbability(numBerries)
-  end
-  -- Default case is cubic growth.
-  return self:_getCubicProbability(numBerries)
+  local probabilities = self._globalBerryTracker:getRegrowthProbabilities(
+      self._config.ratesKey, self._getProbabilityForNumBerries)
+  return probabilities[self._berry:getBerryColorId()]
 end
 
 
@@ -806,6 +812,48 @@ function GlobalBerryTracker:reset()
       self._config.numBerryTypes, self._config.numBerryTypes + 1):fill(0)
   self.berryTypesByTasteOfColorer = tensor.Int32Tensor(
       self._config.numBerryTypes, self._config.numBerryTypes):fill(0)
+
+  -- Regrowth probabilities of each berry type, keyed by the regrowth rates.
+  self._regrowthProbabilities = {}
+end
+
+--[[ Invalidates the cached regrowth probabilities.
+
+Must be called after changing the number of berries (ripe plus unripe) of a
+type. Ripening and unripening berries leave it unchanged.
+]]
+function GlobalBerryTracker:onNumBerriesPerTypeChanged()
+  if next(self._regrowthProbabilities) ~= nil then
+    self._regrowthProbabilities = {}
+  end
+end
+
+--[[ Returns the regrowth probability of each berry type, indexed by color id.
+
+The probabilities are only recomputed after the number of berries of a type
+changes (when berries are recolored), so all berries regrowing in a frame share
+them.
+
+Args:
+  ratesKey: identifies the regrowth rates that `getProbabilityForNumBerries`
+    uses, so the probabilities can be shared by components with the same rates.
+  getProbabilityForNumBerries: returns the regrowth probability of a berry of a
+    type that has the given number of ripe and unripe berries.
+]]
+function GlobalBerryTracker:getRegrowthProbabilities(
+    ratesKey, getProbabilityForNumBerries)
+  local probabilities = self._regrowthProbabilities[ratesKey]
+  if probabilities == nil then
+    local numRipe = self.ripeBerriesPerType:val()
+    local numUnripe = self.unripeBerriesPerType:val()
+    probabilities = {}
+    for id = 1, self._config.numBerryTypes do
+      local numBerries = numRipe[id] + numUnripe[id]
+      probabilities[id] = getProbabilityForNumBerries(numBerries)
+    end
+    self._regrowthProbabilities[ratesKey] = probabilities
+  end
+  return probabilities
 end
 
 function GlobalBerryTracker:getRipeBerriesPerType()
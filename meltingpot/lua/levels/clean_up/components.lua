@@ -30,6 +30,9 @@ local component_registry = require(meltingpot .. 'component_registry')
 --[[ AppleGrow is a component on each potential apple object that notifies scene
 components when it has been spawned or cleaned.
 
+If the scene has an `AppleGrowthManager`, it grows the apples of all AppleGrow
+components together. Otherwise each one draws its own growth on every frame.
+
 Arguments:
 `maxAppleGrowthRate` (float in [0, 1]): base rate of apple growth, to be
 multiplied by a value determined as a function of the amount of dirt in the
@@ -56,16 +59,49 @@ function AppleGrow:__init__(kwargs)
   self._config.thresholdRestoration = kwargs.thresholdRestoration
 end
 
+function AppleGrow:reset()
+  self._growthManager = nil
+end
+
 function AppleGrow:postStart()
   local sceneObject = self.gameObject.simulation:getSceneObject()
   self._riverMonitor = sceneObject:getComponent('RiverMonitor')
+  if sceneObject:hasComponent('AppleGrowthManager') then
+    self._growthManager = sceneObject:getComponent('AppleGrowthManager')
+    self._growthManager:addApple(self)
+    self.gameObject:setUpdatesEnabled(self, false)
+  else
+    self.gameObject:setUpdatesEnabled(self, true)
+  end
 end
 
-function AppleGrow:update()
-  local dirtCount = self._riverMonitor:getDirtCount()
-  local cleanCount = self._riverMonitor:getCleanCount()
-  local dirtFraction = dirtCount / (dirtCount + cleanCount)
+function AppleGrow:onStateChange(oldState)
+  if self._growthManager then
+    self._growthManager:updateApple(self)
+  end
+end
+
+--[[ Returns whether the apple can grow (i.e. is not already an apple).]]
+function AppleGrow:canGrow()
+  return self.gameObject:getState() ~= 'apple'
+end
+
+function AppleGrow:grow()
+  self.gameObject:setState('apple')
+end
 
+--[[ Returns the key of the growth parameters, shared by AppleGrow components
+that grow at the same rate.]]
+function AppleGrow:getGrowthKey()
+  return string.format('%.17g,%.17g,%.17g', self._config.maxAppleGrowthRate,
+                       self._config.thresholdDepletion,
+                       self._config.thresholdRestoration)
+end
+
+--[[ Returns the probability of growing on each frame, given the fraction of
+the river that is dirty. The result may be negative or NaN, in which case the
+apple does not grow.]]
+function AppleGrow:getGrowthProbability(dirtFraction)
   local depletion = self._config.thresholdDepletion
   local restoration = self._config.thresholdRestoration
   local interpolation = (dirtFraction - depletion) / (restoration - depletion)
@@ -73,9 +109,17 @@ function AppleGrow:update()
   -- the interpolation factor above 1.0, but we disallow that.
   interpolation = math.min(interpolation, 1.0)
 
-  local probability = self._config.maxAppleGrowthRate * interpolation
+  return self._config.maxAppleGrowthRate * interpolation
+end
+
+function AppleGrow:update()
+  local dirtCount = self._riverMonitor:getDirtCount()
+  local cleanCount = self._riverMonitor:getCleanCount()
+  local dirtFraction = dirtCount / (dirtCount + cleanCount)
+
+  local probability = self:getGrowthProbability(dirtFraction)
   if random:uniformReal(0.0, 1.0) < probability then
-    self.gameObject:setState('apple')
+    self:grow()
   end
 end
 
@@ -328,6 +372,125 @@ function DirtSpawner:addPieceToPotential(piece)
 end
 
 
+--[[ The AppleGrowthManager is a scene component that grows the apples of all
+AppleGrow components on each frame.
+
+Each apple that can grow still does so independently with the probability given
+by its AppleGrow component, so apples grow with the same distribution as if each
+had drawn its own growth. However, the probability is computed once per frame,
+nothing is done when it is not positive, and otherwise the apples that grow are
+found by sampling the gaps between them. A frame therefore costs one random draw
+per apple that grows, rather than one per potential apple.
+
+Requires a RiverMonitor component on the scene.
+]]
+local AppleGrowthManager = class.Class(component.Component)
+
+function AppleGrowthManager:__init__(kwargs)
+  kwargs = args.parse(kwargs, {
+      {'name', args.default('AppleGrowthManager')},
+  })
+  AppleGrowthManager.Base.__init__(self, kwargs)
+end
+
+function AppleGrowthManager:reset()
+  -- Apples are grouped by their growth parameters. Each group holds an indexed
+  -- set of the apples that can grow: a list, and the index of each apple in it.
+  self._groups = {}
+  self._groupsByKey = {}
+  self._groupOfApple = {}
+end
+
+function AppleGrowthManager:start()
+  self._riverMonitor = self.gameObject:getComponent('RiverMonitor')
+end
+
+function AppleGrowthManager:addApple(appleGrow)
+  local key = appleGrow:getGrowthKey()
+  local group = self._groupsByKey[key]
+  if group == nil then
+    group = {growth = appleGrow, canGrow = {}, indices = {}}
+    self._groupsByKey[key] = group
+    table.insert(self._groups, group)
+  end
+  self._groupOfApple[appleGrow] = group
+  self:updateApple(appleGrow)
+end
+
+--[[ Adds the apple to (or removes it from) the set of apples that can grow.]]
+function AppleGrowthManager:updateApple(appleGrow)
+  local group = self._groupOfApple[appleGrow]
+  local canGrow = group.canGrow
+  local indices = group.indices
+  local index = indices[appleGrow]
+  if appleGrow:canGrow() then
+    if index == nil then
+      table.insert(canGrow, appleGrow)
+      indices[appleGrow] = #canGrow
+    end
+  elseif index ~= nil then
+    -- Swap the last apple into the removed one's place.
+    local last = canGrow[#canGrow]
+    canGrow[index] = last
+    indices[last] = index
+    canGrow[#canGrow] = nil
+    indices[appleGrow] = nil
+  end
+end
+
+--[[ Returns the apples in `canGrow` that grow, each independently with the
+given probability.]]
+local function _sampleGrowth(canGrow, probability)
+  local grow = {}
+  -- Also true if the probability is NaN.
+  if not (probability > 0.0) then
+    return grow
+  end
+  if probability >= 1.0 then
+    for index = 1, #canGrow do
+      grow[index] = canGrow[index]
+    end
+    return grow
+  end
+  -- The number of apples skipped before each one that grows is geometrically
+  -- distributed, so can be sampled directly. log(1 - p) is computed as
+  -- log1p(-p), which stays accurate (and nonzero) when 1 - p rounds to 1.
+  local failure = 1.0 - probability
+  local logFailure
+  if failure == 1.0 then
+    logFailure = -probability
+  else
+    logFailure = math.log(failure) * -probability / (failure - 1.0)
+  end
+  local index = 0
+  while true do
+    local skipped = math.floor(
+        math.log(random:uniformReal(0.0, 1.0)) / logFailure)
+    index = index + skipped + 1
+    if index > #canGrow then
+      return grow
+    end
+    table.insert(grow, canGrow[index])
+  end
+end
+
+function AppleGrowthManager:update()
+  local dirtCount = self._riverMonitor:getDirtCount()
+  local cleanCount = self._riverMonitor:getCleanCount()
+  local dirtFraction = dirtCount / (dirtCount + cleanCount)
+
+  for _, group in ipairs(self._groups) do
+    local probability = group.growth:getGrowthProbability(dirtFraction)
+    if #group.canGrow > 0 then
+      -- Collect the apples first, as growing them changes `canGrow`.
+      for _, appleGrow in ipairs(_sampleGrowth(group.canGrow, probability)) do
+        appleGrow:grow()
+      end
+    end
+  end
+end
+
+
 -- An object that is edible switches state when an avatar touches it, and
 -- provides a reward. It can be used in combination to the FixedRateRegrow.
 local Edible = class.Class(component.Component)
@@ -438,6 +601,7 @@ local allComponents = {
     -- Scene components.
     RiverMonitor = RiverMonitor,
     DirtSpawner = DirtSpawner,
+    AppleGrowthManager = AppleGrowthManager,
 }
 
 component_registry.registerAllComponents(allComponents)
@@ -0,0 +1,187 @@
+--[[ Copyright 2020 DeepMind Technologies Limited.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+]]
+
+-- Tests for the clean_up `AppleGrowthManager`.
+
+local components = require 'meltingpot.lua.levels.clean_up.components'
+
+local random = require 'system.random'
+local asserts = require 'testing.asserts'
+local test_runner = require 'testing.test_runner'
+
+local _NUM_APPLES = 100
+local _NUM_FRAMES = 2000
+-- With the growth parameters of the clean_up config, a fifth of the river
+-- being dirty gives a growth probability of 0.025.
+local _DIRT_COUNT = 20
+local _CLEAN_COUNT = 80
+
+local function _growthManager(dirtCount, cleanCount)
+  local manager = components.AppleGrowthManager{}
+  local riverMonitor = {
+      getDirtCount = function() return dirtCount end,
+      getCleanCount = function() return cleanCount end,
+  }
+  manager.gameObject = {getComponent = function() return riverMonitor end}
+  manager:reset()
+  manager:start()
+  return manager
+end
+
+--[[ Returns AppleGrow components on stand-in game objects that notify
+`manager` of their state changes, as `AppleGrow:onStateChange` does.]]
+local function _apples(manager, numApples, maxAppleGrowthRate)
+  local apples = {}
+  for i = 1, numApples do
+    local appleGrow = components.AppleGrow{
+        maxAppleGrowthRate = maxAppleGrowthRate or 0.05,
+        thresholdDepletion = 0.4,
+        thresholdRestoration = 0.0,
+    }
+    local gameObject = {state = 'appleWait'}
+    function gameObject:getState()
+      return self.state
+    end
+    function gameObject:setState(state)
+      self.state = state
+      if manager then
+        manager:updateApple(appleGrow)
+      end
+    end
+    appleGrow.gameObject = gameObject
+    if manager then
+      manager:addApple(appleGrow)
+    end
+    apples[i] = appleGrow
+  end
+  return apples
+end
+
+local function _countAndEat(apples)
+  local numGrown = 0
+  for _, appleGrow in ipairs(apples) do
+    if not appleGrow:canGrow() then
+      numGrown = numGrown + 1
+      appleGrow.gameObject:setState('appleWait')
+    end
+  end
+  return numGrown
+end
+
+--[[ Checks that the indexed set of each group holds exactly the apples that
+can grow.]]
+local function _assertConsistent(manager, apples)
+  local numCanGrow = 0
+  for _, appleGrow in ipairs(apples) do
+    local group = manager._groupOfApple[appleGrow]
+    local index = group.indices[appleGrow]
+    if appleGrow:canGrow() then
+      numCanGrow = numCanGrow + 1
+      asserts.EQ(group.canGrow[index], appleGrow)
+    else
+      asserts.EQ(index, nil)
+    end
+  end
+  local numIndexed = 0
+  for _, group in ipairs(manager._groups) do
+    numIndexed = numIndexed + #group.canGrow
+  end
+  asserts.EQ(numIndexed, numCanGrow)
+end
+
+local tests = {}
+
+function tests.managerGrowsApplesAtTheRateOfEachApple()
+  local dirtFraction = _DIRT_COUNT / (_DIRT_COUNT + _CLEAN_COUNT)
+  random:seed(1)
+  local manager = _growthManager(_DIRT_COUNT, _CLEAN_COUNT)
+  local managed = _apples(manager, _NUM_APPLES)
+  local independent = _apples(nil, _NUM_APPLES)
+  local probability = independent[1]:getGrowthProbability(dirtFraction)
+  local managedTotal = 0
+  local independentTotal = 0
+  for _ = 1, _NUM_FRAMES do
+    manager:update()
+    managedTotal = managedTotal + _countAndEat(managed)
+    -- As `AppleGrow:update` draws for each apple.
+    for _, appleGrow in ipairs(independent) do
+      if random:uniformReal(0.0, 1.0) < probability then
+        appleGrow:grow()
+      end
+    end
+    independentTotal = independentTotal + _countAndEat(independent)
+  end
+
+  -- Every apple is eaten as it grows, so each can grow on every frame.
+  local trials = _NUM_APPLES * _NUM_FRAMES
+  local expected = trials * probability
+  local deviation = math.sqrt(trials * probability * (1 - probability))
+  asserts.LT(math.abs(managedTotal - expected), 5 * deviation)
+  asserts.LT(math.abs(independentTotal - expected), 5 * deviation)
+  asserts.LT(math.abs(managedTotal - independentTotal),
+             5 * math.sqrt(2) * deviation)
+end
+
+function tests.managerGrowsNothingWhenTheRiverIsTooDirty()
+  local manager = _growthManager(100, 0)
+  local apples = _apples(manager, _NUM_APPLES)
+  for _ = 1, 10 do
+    manager:update()
+  end
+  asserts.EQ(_countAndEat(apples), 0)
+end
+
+function tests.managerGrowsNothingAtZeroGrowthRate()
+  local manager = _growthManager(0, 100)
+  local apples = _apples(manager, _NUM_APPLES, 0.0)
+  for _ = 1, 10 do
+    manager:update()
+  end
+  asserts.EQ(_countAndEat(apples), 0)
+end
+
+function tests.managerSamplesTinyGrowthRates()
+  -- 1 - p rounds to 1, so log(1 - p) would be 0.
+  random:seed(3)
+  local manager = _growthManager(0, 100)
+  local apples = _apples(manager, _NUM_APPLES, 1e-20)
+  for _ = 1, 10 do
+    manager:update()
+  end
+  asserts.EQ(_countAndEat(apples), 0)
+end
+
+function tests.indexedSetStaysConsistentAsApplesAreEatenAndRegrow()
+  random:seed(2)
+  local manager = _growthManager(_DIRT_COUNT, _CLEAN_COUNT)
+  local apples = _apples(manager, _NUM_APPLES)
+  _assertConsistent(manager, apples)
+  for _ = 1, 200 do
+    manager:update()
+    _assertConsistent(manager, apples)
+    -- Eat some of the apples, and grow others directly.
+    for _, appleGrow in ipairs(apples) do
+      local draw = random:uniformReal(0.0, 1.0)
+      if draw < 0.3 then
+        appleGrow.gameObject:setState('appleWait')
+      elseif draw < 0.35 then
+        appleGrow:grow()
+      end
+    end
+    _assertConsistent(manager, apples)
+  end
+end
+
+return test_runner.run(tests)
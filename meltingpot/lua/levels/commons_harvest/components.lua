@@ -25,37 +25,37 @@ local component = require(meltingpot .. 'component')
 local component_registry = require(meltingpot .. 'component_registry')
 
 
-local function concat(table1, table2)
-  local resultTable = {}
-  for k, v in pairs(table1) do
-    table.insert(resultTable, v)
-  end
-  for k, v in pairs(table2) do
-    table.insert(resultTable, v)
-  end
-  return resultTable
-end
-
-local function extractPieceIdsFromObjects(gameObjects)
-  local result = {}
-  for k, v in ipairs(gameObjects) do
-    table.insert(result, v:getPiece())
-  end
-  return result
-end
-
-
+--[[ The Neighborhoods is a scene component that holds the number of live
+neighbors of each potential apple, and applies the resulting changes of
+regrowth group.
+
+The counts are maintained incrementally by the DensityRegrow components: when an
+apple is eaten or regrows, only the counts of the apples within its radius are
+updated, and only those apples are queued to switch regrowth group in the next
+`update`.
+
+Arguments:
+`checkCounts` (boolean, default false): whether to check on every frame that
+the count of each potential apple equals its number of live neighbors, recounted
+from the grid. This is slow, and only meant for debugging and testing.
+]]
 local Neighborhoods = class.Class(component.Component)
 
 function Neighborhoods:__init__(kwargs)
   kwargs = args.parse(kwargs, {
       {'name', args.default('Neighborhoods')},
+      {'checkCounts', args.default(false)},
   })
   Neighborhoods.Base.__init__(self, kwargs)
+  self._config.checkCounts = kwargs.checkCounts
 end
 
 function Neighborhoods:reset()
   self._variables.pieceToNumNeighbors = {}
+  -- DensityRegrow components whose regrowth group may need to change, in the
+  -- order they were queued.
+  self._variables.pendingUpdates = {}
+  self._variables.isPending = {}
 end
 
 function Neighborhoods:getPieceToNumNeighbors()
@@ -67,6 +67,46 @@ function Neighborhoods:getUpperBoundPossibleNeighbors()
   return self._config.upperBoundPossibleNeighbors
 end
 
+--[[ Queues a DensityRegrow component to update its regrowth group.]]
+function Neighborhoods:queueUpdate(densityRegrow)
+  if not self._variables.isPending[densityRegrow] then
+    self._variables.isPending[densityRegrow] = true
+    table.insert(self._variables.pendingUpdates, densityRegrow)
+  end
+end
+
+--[[ Asserts that the count of each potential apple is its number of live
+neighbors.]]
+function Neighborhoods:_checkCounts()
+  local pieceToNumNeighbors = self._variables.pieceToNumNeighbors
+  local simulation = self.gameObject.simulation
+  for _, gameObject in ipairs(
+      simulation:getAllGameObjectsWithComponent('DensityRegrow')) do
+    local densityRegrow = gameObject:getComponent('DensityRegrow')
+    local numNeighbors = pieceToNumNeighbors[gameObject:getPiece()]
+    local numLive = densityRegrow:countLiveNeighbors()
+    assert(numNeighbors == numLive, string.format(
+        'Apple at %s has %s live neighbors, but its count is %s.',
+        helpers.tostringOneLine(gameObject:getPosition()), numLive,
+        tostring(numNeighbors)))
+  end
+end
+
+function Neighborhoods:update()
+  if self._config.checkCounts then
+    self:_checkCounts()
+  end
+  local pendingUpdates = self._variables.pendingUpdates
+  if #pendingUpdates == 0 then
+    return
+  end
+  self._variables.pendingUpdates = {}
+  self._variables.isPending = {}
+  for _, densityRegrow in ipairs(pendingUpdates) do
+    densityRegrow:_updateWaitState()
+  end
+end
+
 
 local DensityRegrow = class.Class(component.Component)
 
@@ -138,20 +178,20 @@ end
 
 function DensityRegrow:start()
   local sceneObject = self.gameObject.simulation:getSceneObject()
-  local neighborhoods = sceneObject:getComponent('Neighborhoods')
-  self._variables.pieceToNumNeighbors = neighborhoods:getPieceToNumNeighbors()
+  self._neighborhoods = sceneObject:getComponent('Neighborhoods')
+  self._variables.pieceToNumNeighbors = (
+      self._neighborhoods:getPieceToNumNeighbors())
   self._variables.pieceToNumNeighbors[self.gameObject:getPiece()] = 0
 end
 
 function DensityRegrow:postStart()
-  self:_beginLive()
-  self._started = true
-end
-
-function DensityRegrow:update()
-  if self.gameObject:getLayer() == 'logic' then
-    self:_updateWaitState()
+  self._neighbors = self:_getNeighbors()
+  if self.gameObject:getState() == self._config.liveState then
+    self:_beginLive()
+  else
+    self._neighborhoods:queueUpdate(self)
   end
+  self._started = true
 end
 
 function DensityRegrow:onStateChange(oldState)
@@ -163,6 +203,9 @@ function DensityRegrow:onStateChange(oldState)
     elseif oldState == aliveState then
       self:_endLive()
     end
+    if newState ~= aliveState and newState ~= self:_getWaitStateForCount() then
+      self._neighborhoods:queueUpdate(self)
+    end
   end
 end
 
@@ -174,64 +217,78 @@ function DensityRegrow:getWaitState()
   return self._config.waitState
 end
 
+function DensityRegrow:_getWaitStateForCount()
+  local numClose = self._variables.pieceToNumNeighbors[
+      self.gameObject:getPiece()]
+  return self._config.waitState .. '_' .. tostring(numClose)
+end
+
 --[[ This function updates the state of a potential (wait) apple to correspond
 to the correct regrowth probability for its number of neighbors.]]
 function DensityRegrow:_updateWaitState()
   if self.gameObject:getState() ~= self._config.liveState then
-    local piece = self.gameObject:getPiece()
-    local numClose = self._variables.pieceToNumNeighbors[piece]
-    self.gameObject:setState(
-        self._config.waitState .. '_' .. tostring(numClose))
+    self.gameObject:setState(self:_getWaitStateForCount())
   end
 end
 
+--[[ Returns the DensityRegrow components of the other potential apples within
+the radius. Potential apples do not move, so this is only computed at start.]]
 function DensityRegrow:_getNeighbors()
   local transformComponent = self.gameObject:getComponent('Transform')
-  local waitNeighbors = extractPieceIdsFromObjects(
-      transformComponent:queryDisc('logic', self._config.radius))
-  local liveNeighbors = extractPieceIdsFromObjects(
-      transformComponent:queryDisc('lowerPhysical', self._config.radius))
-  local neighbors = concat(waitNeighbors, liveNeighbors)
-  return neighbors, liveNeighbors, waitNeighbors
+  local neighbors = {}
+  for _, layer in ipairs({'logic', 'lowerPhysical'}) do
+    local objects = transformComponent:queryDisc(layer, self._config.radius)
+    for _, object in ipairs(objects) do
+      if object ~= self.gameObject and object:hasComponent('DensityRegrow') then
+        table.insert(neighbors, object:getComponent('DensityRegrow'))
+      end
+    end
+  end
+  return neighbors
 end
 
---[[ Function that executes when state gets set to the `live` state.]]
-function DensityRegrow:_beginLive()
-  -- Increment respawn group assignment for all nearby waits.
-  local neighbors, liveNeighbors, waitNeighbors = self:_getNeighbors()
-  for _, neighborPiece in ipairs(waitNeighbors) do
-    if neighborPiece ~= self.gameObject:getPiece() then
-      local closeBy = self._variables.pieceToNumNeighbors[neighborPiece]
-      if not closeBy then
-        assert(false, 'Neighbors not found when they should exist.')
-      end
-      self._variables.pieceToNumNeighbors[neighborPiece] =
-          self._variables.pieceToNumNeighbors[neighborPiece] + 1
+--[[ Returns the number of live potential apples within the radius, found by
+querying the grid rather than from the maintained counts.]]
+function DensityRegrow:countLiveNeighbors()
+  local numLive = 0
+  for _, neighbor in ipairs(self:_getNeighbors()) do
+    if neighbor.gameObject:getState() == neighbor:getAliveState() then
+      numLive = numLive + 1
     end
   end
+  return numLive
 end
 
---[[ Function that executes when state changed to no longer be `live`.]]
-function DensityRegrow:_endLive()
-  -- Decrement respawn group assignment for all nearby waits.
-  local neighbors, liveNeighbors, waitNeighbors = self:_getNeighbors()
-  for _, neighborPiece in ipairs(waitNeighbors) do
-    if neighborPiece ~= self.gameObject:getPiece() then
-      local closeBy = self._variables.pieceToNumNeighbors[neighborPiece]
-      if not closeBy then
-        assert(false, 'Neighbors not found when they should exist.')
-      end
-      self._variables.pieceToNumNeighbors[neighborPiece] =
-          self._variables.pieceToNumNeighbors[neighborPiece] - 1
-    else
-      -- Case where neighbor piece is self.
-      self._variables.pieceToNumNeighbors[neighborPiece] = #liveNeighbors
+--[[ Adds `change` to the number of live neighbors of each neighbor.]]
+function DensityRegrow:_changeNeighborCounts(change)
+  local pieceToNumNeighbors = self._variables.pieceToNumNeighbors
+  for _, neighbor in ipairs(self._neighbors) do
+    local neighborPiece = neighbor.gameObject:getPiece()
+    local closeBy = pieceToNumNeighbors[neighborPiece]
+    if not closeBy then
+      assert(false, 'Neighbors not found when they should exist.')
+    end
+    pieceToNumNeighbors[neighborPiece] = closeBy + change
+    assert(pieceToNumNeighbors[neighborPiece] >= 0,
+           'Less than zero neighbors: Something has gone wrong.')
+    if neighbor.gameObject:getState() ~= neighbor:getAliveState() then
+      self._neighborhoods:queueUpdate(neighbor)
     end
-    assert(self._variables.pieceToNumNeighbors[neighborPiece] >= 0,
-             'Less than zero neighbors: Something has gone wrong.')
   end
 end
 
+--[[ Function that executes when state gets set to the `live` state.]]
+function DensityRegrow:_beginLive()
+  -- Increment respawn group assignment for all nearby apples.
+  self:_changeNeighborCounts(1)
+end
+
+--[[ Function that executes when state changed to no longer be `live`.]]
+function DensityRegrow:_endLive()
+  -- Decrement respawn group assignment for all nearby apples.
+  self:_changeNeighborCounts(-1)
+end
+
 local allComponents = {
     Neighborhoods = Neighborhoods,
     DensityRegrow = DensityRegrow,
@@ -22,6 +22,12 @@ local read_settings = require 'common.read_settings'
 local properties = require 'common.properties'
 local tile_set = require 'common.tile_set'
 
+local meltingpot = 'meltingpot.lua.modules.'
+local crop_render = require(meltingpot .. 'crop_render')
+local profiler = require(meltingpot .. 'profiler')
+local sprite_atlas = require(meltingpot .. 'sprite_atlas')
+local symbolic_observation = require(meltingpot .. 'symbolic_observation')
+
 
 local function apiFactory(env)
   local api = {
@@ -40,12 +46,32 @@ local function apiFactory(env)
           spriteSize = 16,
           simulation = env.Simulation.defaultSettings(),
           episodeLengthFrames = 3600,
-          topology = 'BOUNDED'
+          topology = 'BOUNDED',
+          -- Whether to profile the simulation, readable through the `profile`
+          -- property. A string, as Python booleans arrive as 'True'/'False'.
+          profile = 'false',
+          -- Whether to render player views by cropping the image of the map
+          -- (see crop_render.lua). A string, like `profile`.
+          cropRender = 'false',
+          -- Sprites prebuilt by sprite_atlas.py, if any. read_settings only
+          -- accepts the keys declared here, and no lists, so `sprites` holds a
+          -- line of '<tile> <name>' per sprite.
+          spriteAtlas = {
+              path = '',
+              numTiles = 0,
+              height = 0,
+              width = 0,
+              sprites = '',
+          },
       }
   }
 
   function api:_createSprites(size)
     local tileSet = tile_set.TileSet(self._world, {width = size, height = size})
+    if string.lower(tostring(self._settings.cropRender)) == 'true' then
+      crop_render.enable(tileSet)
+    end
+    sprite_atlas.load(self._settings.spriteAtlas)
     self.simulation:addSprites(tileSet)
     return tileSet:set()
   end
@@ -63,6 +89,23 @@ local function apiFactory(env)
     self._world = grid_world.World(worldConfig)
     local tileSet = self:_createSprites(self._settings.spriteSize)
     self.simulation:addObservations(tileSet, self._world, self._observations)
+    properties.addReadOnly('symbolicVocabulary', function()
+      local names = symbolic_observation.vocabulary(self._world)
+      return table.concat(names, '\n')
+    end)
+
+    if string.lower(tostring(self._settings.profile)) == 'true' then
+      self._profiler = profiler.Profiler()
+      self._profiler:instrumentComponents(self.simulation:getAllGameObjects())
+      self._profiler:instrumentObservations(self._observations)
+      self._simulationUpdate = self._profiler:wrap(
+          'frame/simulationUpdate',
+          function(grid) self.simulation:update(grid) end)
+      self._gridUpdate = self._profiler:wrap(
+          'frame/gridUpdate', function(grid) grid:update(random) end)
+      properties.addReadOnly(
+          'profile', function() return self._profiler:report() end)
+    end
   end
 
   function api:observationSpec()
@@ -88,6 +131,12 @@ local function apiFactory(env)
     random:seed(seed)
     local stateCallbacks = {}
     self.simulation:stateCallbacks(stateCallbacks)
+    if self._profiler then
+      -- The profile is of the current episode, also when a soft reset
+      -- restarts it in this Lua state.
+      self._profiler:clear()
+      self._profiler:instrumentUpdaters(stateCallbacks)
+    end
     local textMap = self.simulation:textMap()
     self._grid = self._world:createGrid{
       layout = textMap.layout,
@@ -98,11 +147,18 @@ local function apiFactory(env)
 
     self.simulation:start(self._grid)
     self._grid:update(random)
+    crop_render.newFrame()
   end
 
   function api:advance(steps)
-    self.simulation:update(self._grid)
-    self._grid:update(random)
+    if self._profiler then
+      self._simulationUpdate(self._grid)
+      self._gridUpdate(self._grid)
+    else
+      self.simulation:update(self._grid)
+      self._grid:update(random)
+    end
+    crop_render.newFrame()
     local simulationContinue = self.simulation:continue() ~= false
     local withinFrameLimit = steps < self._settings.episodeLengthFrames
     local continue = simulationContinue and withinFrameLimit
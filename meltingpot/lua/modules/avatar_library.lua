@@ -30,6 +30,8 @@ local events = require 'system.events'
 local meltingpot = 'meltingpot.lua.modules.'
 local component = require(meltingpot .. 'component')
 local component_registry = require(meltingpot .. 'component_registry')
+local crop_render = require(meltingpot .. 'crop_render')
+local symbolic_observation = require(meltingpot .. 'symbolic_observation')
 
 local _COMPASS = {'N', 'E', 'S', 'W'}
 
@@ -258,7 +260,29 @@ function Avatar:addObservations(tileSet, world, observations)
         return playerView:render(layer_observation)
       end
   }
+  if crop_render.enabled() and not playerViewConfig.centered then
+    local viewRenderer = crop_render.ViewRenderer{
+        world = world,
+        view = playerViewConfig,
+        set = tileSet,
+        spriteMap = self._config.spriteMap,
+        layerView = playerLayerView,
+        scene = playerView,
+    }
+    spec.func = function(grid)
+      return viewRenderer:render(grid, self.gameObject:getPiece())
+    end
+  end
   observations[#observations + 1] = spec
+
+  -- The view of `RGB`, as indices into the symbolic vocabulary.
+  observations[#observations + 1] = symbolic_observation.observationSpec(
+      stringId .. '.SYMBOLIC', world, playerLayerView, function(grid)
+        return playerLayerView:observation{
+            grid = grid,
+            piece = self.gameObject:getPiece(),
+        }
+      end)
 end
 
 function Avatar:reset()
@@ -27,6 +27,7 @@ local tile = require 'system.tile'
 local meltingpot = 'meltingpot.lua.modules.'
 local game_object = require(meltingpot .. 'game_object')
 local component_registry = require(meltingpot .. 'component_registry')
+local crop_render = require(meltingpot .. 'crop_render')
 local prefab_utils = require(meltingpot .. 'prefab_utils')
 local updater_registry = require(meltingpot .. 'updater_registry')
 
@@ -76,10 +77,18 @@ function BaseSimulation:__init__(kwargs)
   self._variables = {}
   self._variables.gameObjects = {}
   self._variables.avatarObjects = {}
+  -- The same game objects in the order they were built. Game objects are
+  -- always visited in this order, so that the order of calls (and hence of
+  -- random draws) depends only on the seed, not on how their ids hash.
+  self._variables.gameObjectList = {}
+  self._variables.avatarObjectList = {}
   -- This table contains the mapping from a dmlab2d piece to the game object
   -- that owns that piece.
   self._variables.pieceToGameObject = {}
   self._variables.nextGameObjectId = 1
+  -- Lists of the game objects with enabled `preUpdate` or `update` methods,
+  -- rebuilt when stale. See `invalidateActiveUpdates`.
+  self._variables.activeUpdatesStale = true
 
   -- Initialize avatar indexing tables to be populated in base avatar manager.
   self._variables.avatarPieceToIndex = {}
@@ -121,7 +130,7 @@ function BaseSimulation:__init__(kwargs)
 
   -- Check that we do have enough promised avatars
   local numAvatars = 0
-  for k, v in pairs(self._variables.avatarObjects) do
+  for k, v in ipairs(self._variables.avatarObjectList) do
     numAvatars = numAvatars + 1
   end
   assert(
@@ -223,8 +232,11 @@ function BaseSimulation:buildGameObjectFromSettings(gameObjectConfig)
 
   gameObject.simulation = self
   self._variables.gameObjects[gameObject._id] = gameObject
+  table.insert(self._variables.gameObjectList, gameObject)
+  self:invalidateActiveUpdates()
   if isAvatar then
     self._variables.avatarObjects[gameObject._id] = gameObject
+    table.insert(self._variables.avatarObjectList, gameObject)
   end
   return gameObject
 end
@@ -264,7 +276,7 @@ function BaseSimulation:worldConfig()
       states = {}
   }
   -- By this point, gameObjects already contain the avatar objects
-  for _, gameObject in pairs(self._variables.gameObjects) do
+  for _, gameObject in ipairs(self._variables.gameObjectList) do
     gameObject:registerUpdaters()
     gameObject:addStates(config.states)
     gameObject:addHits(config)
@@ -281,7 +293,7 @@ function BaseSimulation:worldConfig()
   end
   -- Notify all GameObjects of the hits and contacts table so they can register
   -- callbacks.
-  for _, gameObject in pairs(self._variables.gameObjects) do
+  for _, gameObject in ipairs(self._variables.gameObjectList) do
     gameObject:setHits(config.hits)
     gameObject:setContacts(self._contacts)
     -- Merge all updaters into the simulation registry.
@@ -294,21 +306,21 @@ end
 function BaseSimulation:addSprites(tileSet)
   tileSet:addColor('OutOfBounds', {0, 0, 0})
   tileSet:addColor('OutOfView', {80, 80, 80})
-  for _, gameObject in pairs(self._variables.gameObjects) do
+  for _, gameObject in ipairs(self._variables.gameObjectList) do
     gameObject:addSprites(tileSet)
   end
 end
 
 function BaseSimulation:discreteActionSpec()
   local act = {}
-  for _, avatarObject in pairs(self._variables.avatarObjects) do
+  for _, avatarObject in ipairs(self._variables.avatarObjectList) do
     avatarObject:discreteActionSpec(act)
   end
   return act
 end
 
 function BaseSimulation:discreteActions(actions)
-  for _, avatarObject in pairs(self._variables.avatarObjects) do
+  for _, avatarObject in ipairs(self._variables.avatarObjectList) do
     avatarObject:discreteActions(actions)
   end
 end
@@ -330,9 +342,15 @@ function BaseSimulation:addObservations(tileSet, world, observations)
         return worldView:render(worldLayerView:observation{grid = grid})
       end,
   }
+  if crop_render.enabled() then
+    -- Player views are cropped from the same image, rendered once per frame.
+    local mapImage = crop_render.setMapView(
+        worldLayerView, worldView, self._settings.worldSpriteMap)
+    spec.func = function(grid) return mapImage:render(grid) end
+  end
   observations[#observations + 1] = spec
   -- Add all observations from GameObjects, including avatars.
-  for _, gameObject in pairs(self._variables.gameObjects) do
+  for _, gameObject in ipairs(self._variables.gameObjectList) do
     gameObject:addObservations(tileSet, world, observations)
   end
 end
@@ -342,7 +360,7 @@ end
 
 function BaseSimulation:stateCallbacks(callbacks)
   -- By now we have the hits and the contacts lists.
-  for _, gameObject in pairs(self._variables.gameObjects) do
+  for _, gameObject in ipairs(self._variables.gameObjectList) do
     gameObject:addTypeCallbacks(callbacks)
     gameObject:addPlayerCallbacks(callbacks)
   end
@@ -367,20 +385,25 @@ function BaseSimulation:_avatarStart(grid)
   -- reason being that we need them both for computing how many will go to each
   -- group, and later to actually place them in the right group.
   local cachedAvatarSpawnGroups = {}
-  for key, avatarObject in pairs(self._variables.avatarObjects) do
+  -- Spawn groups in the order they are first seen, so they are sampled in an
+  -- order that does not depend on how their names hash.
+  local spawnGroups = {}
+  for key, avatarObject in ipairs(self._variables.avatarObjectList) do
     local spawnGroup = avatarObject:getComponent('Avatar'):getSpawnGroup()
     cachedAvatarSpawnGroups[key] = spawnGroup
     if avatarsPerSpawnGroup[spawnGroup] then
       avatarsPerSpawnGroup[spawnGroup] = avatarsPerSpawnGroup[spawnGroup] + 1
     else
       avatarsPerSpawnGroup[spawnGroup] = 1
+      table.insert(spawnGroups, spawnGroup)
     end
   end
 
   -- Sample the right number of points at which to spawn avatars in each group.
   local spawnPointsByGroup = {}
   local spawnCountersByGroup = {}
-  for spawnGroup, numAvatarsThisGroup in pairs(avatarsPerSpawnGroup) do
+  for _, spawnGroup in ipairs(spawnGroups) do
+    local numAvatarsThisGroup = avatarsPerSpawnGroup[spawnGroup]
     spawnPointsByGroup[spawnGroup] = grid:groupShuffledWithCount(
       random, spawnGroup, numAvatarsThisGroup)
     assert(#spawnPointsByGroup[spawnGroup] == numAvatarsThisGroup,
@@ -389,7 +412,7 @@ function BaseSimulation:_avatarStart(grid)
   end
 
   -- Create the avatars.
-  for key, avatarObject in pairs(self._variables.avatarObjects) do
+  for key, avatarObject in ipairs(self._variables.avatarObjectList) do
     local spawnGroup = cachedAvatarSpawnGroups[key]
     spawnCountersByGroup[spawnGroup] = spawnCountersByGroup[spawnGroup] + 1
     local idxInGroup = spawnCountersByGroup[spawnGroup]
@@ -404,7 +427,7 @@ function BaseSimulation:_avatarStart(grid)
     self._variables.pieceToGameObject[avatarPiece] = avatarObject
   end
 
-  for _, gameObject in pairs(self._variables.gameObjects) do
+  for _, gameObject in ipairs(self._variables.gameObjectList) do
     gameObject:postStart(grid)
   end
 end
@@ -415,13 +438,17 @@ end
 function BaseSimulation:start(grid)
   self._updaterRegistry:registerGrid(grid)
   self._variables.continueEpisodeAfterThisFrame = true
+  -- Pieces do not outlive their grid, so forget those of any earlier episode.
+  self._variables.pieceToGameObject = {}
+  self._variables.avatarPieceToIndex = {}
+  self._variables.avatarIndexToPiece = {}
   -- Call `reset` on all game objects before calling `start` on any of them.
-  for _, gameObject in pairs(self._variables.gameObjects) do
+  for _, gameObject in ipairs(self._variables.gameObjectList) do
     gameObject:reset()
   end
   -- Call `start` on all non-avatar game objects before calling `start` on any
   -- avatar game objects.
-  for _, gameObject in pairs(self._variables.gameObjects) do
+  for _, gameObject in ipairs(self._variables.gameObjectList) do
     if not gameObject:hasComponent("Avatar") then
       gameObject:start(grid)
       local piece = gameObject:getPiece()
@@ -435,13 +462,51 @@ end
 --[[ End of starting callbacks ]]
 --[[ The following callbacks are called during updating / advancing ]]
 
+--[[ Marks the lists of game objects to update as stale, so they are rebuilt
+before the next frame. Called when game objects are added, or their components
+or enabled updates change.
+]]
+function BaseSimulation:invalidateActiveUpdates()
+  self._variables.activeUpdatesStale = true
+end
+
+--[[ Rebuilds the lists of game objects to call `preUpdate` and `update` on.
+
+Objects are kept in the order they were built. Game objects used to be updated
+in the order of `pairs` over their ids, which is undefined, so this order of
+calls (and hence of random draws) differs from that of earlier versions, and
+episodes may differ from theirs for the same seed.
+]]
+function BaseSimulation:_refreshActiveUpdates()
+  local preUpdateObjects = {}
+  local updateObjects = {}
+  for _, gameObject in ipairs(self._variables.gameObjectList) do
+    if gameObject:hasPreUpdates() then
+      table.insert(preUpdateObjects, gameObject)
+    end
+    if gameObject:hasUpdates() then
+      table.insert(updateObjects, gameObject)
+    end
+  end
+  self._variables.preUpdateObjects = preUpdateObjects
+  self._variables.updateObjects = updateObjects
+  self._variables.activeUpdatesStale = false
+end
+
 function BaseSimulation:update(grid)
+  if self._variables.activeUpdatesStale then
+    self:_refreshActiveUpdates()
+  end
+  -- Only game objects with enabled `preUpdate` or `update` methods are called,
+  -- so the cost of a frame does not grow with the number of static objects.
   -- Call preUpdate on all gameObjects before calling update on any gameObjects.
-  for _, gameObject in pairs(self._variables.gameObjects) do
-    gameObject:preUpdate()
+  local preUpdateObjects = self._variables.preUpdateObjects
+  for i = 1, #preUpdateObjects do
+    preUpdateObjects[i]:preUpdate()
   end
-  for _, gameObject in pairs(self._variables.gameObjects) do
-    gameObject:update(grid)
+  local updateObjects = self._variables.updateObjects
+  for i = 1, #updateObjects do
+    updateObjects[i]:update(grid)
   end
 end
 
@@ -473,7 +538,7 @@ end
 -- Returns GameObjects that have the given name, as a list.
 function BaseSimulation:getGameObjectsByName(name)
   local objects = {}
-  for _, gameObject in pairs(self._variables.gameObjects) do
+  for _, gameObject in ipairs(self._variables.gameObjectList) do
     if name == gameObject.name then
       table.insert(objects, gameObject)
     end
@@ -490,7 +555,7 @@ end
 --[[ Return all game objects that have component `componentName`, as a list.]]
 function BaseSimulation:getAllGameObjectsWithComponent(componentName)
   local objects = {}
-  for _, gameObject in pairs(self._variables.gameObjects) do
+  for _, gameObject in ipairs(self._variables.gameObjectList) do
     if gameObject:hasComponent(componentName) then
       table.insert(objects, gameObject)
     end
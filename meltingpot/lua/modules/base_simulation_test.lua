@@ -17,6 +17,7 @@ limitations under the License.
 
 local meltingpot = 'meltingpot.lua.modules.'
 local base_simulation = require(meltingpot .. 'base_simulation')
+local component = require(meltingpot .. 'component')
 local component_library = require(meltingpot .. 'component_library')
 local game_object = require(meltingpot .. 'game_object')
 
@@ -143,4 +144,46 @@ function tests.getGameObjectFromPiece()
   asserts.EQ(returnedGameObject:getOrientation(), 'W')
 end
 
+function tests.updatesOnlyActiveGameObjects()
+  local baseSimulation = makeTestSimulation()
+  -- A static game object, which should not be updated.
+  baseSimulation:buildGameObjectFromSettings(getTestGameObjectConfig())
+  local active = baseSimulation:buildGameObjectFromSettings(
+      getTestGameObjectConfig())
+  local counter = component.Component{name = 'Counter'}
+  local numUpdates = 0
+  counter.update = function(_self) numUpdates = numUpdates + 1 end
+  active:addComponent(counter)
+  local grid = simulateUsage(baseSimulation)
+
+  baseSimulation:update(grid)
+  asserts.EQ(numUpdates, 1)
+  asserts.EQ(#baseSimulation._variables.updateObjects, 1)
+  asserts.EQ(baseSimulation._variables.updateObjects[1], active)
+
+  active:setUpdatesEnabled(counter, false)
+  baseSimulation:update(grid)
+  asserts.EQ(numUpdates, 1)
+  asserts.EQ(#baseSimulation._variables.updateObjects, 0)
+
+  active:setUpdatesEnabled(counter, true)
+  baseSimulation:update(grid)
+  asserts.EQ(numUpdates, 2)
+end
+
+function tests.visitsGameObjectsInBuildOrder()
+  local baseSimulation = makeTestSimulation()
+  local built = {}
+  for i = 1, 20 do
+    table.insert(built, baseSimulation:buildGameObjectFromSettings(
+        getTestGameObjectConfig()))
+  end
+
+  local visited = baseSimulation:getAllGameObjectsWithComponent('Transform')
+  asserts.EQ(#visited, #built)
+  for i, gameObject in ipairs(built) do
+    asserts.EQ(visited[i], gameObject)
+  end
+end
+
 return test_runner.run(tests)
@@ -58,6 +58,10 @@ Updates to a component on every frame can be handled in two compatible ways:
     executed before updates in a lower priority. Within a priority, no
     guarantees are provided on execution order.
 
+Game objects are only updated if they have a component with a `preUpdate` or
+`update` method. A component that has nothing to do for a while can stop (and
+later resume) these calls with `self.gameObject:setUpdatesEnabled(self, false)`.
+
 The following might exist in the future:
 
 *   onDestroy()
@@ -32,6 +32,7 @@ local unpack = unpack or table.unpack
 local meltingpot = 'meltingpot.lua.modules.'
 local component = require(meltingpot .. 'component')
 local component_registry = require(meltingpot .. 'component_registry')
+local sprite_atlas = require(meltingpot .. 'sprite_atlas')
 
 local _COMPASS = {'N', 'E', 'S', 'W'}
 local _ORIENTATION_TO_INT = {N = 0, E = 1, S = 2, W = 3}
@@ -582,7 +583,8 @@ function _addShapesToTileSet(
               text = spriteShapes[i][j],
               noRotate = noRotates[i]
           }
-          tileSet:addShape(name .. '.' .. _COMPASS[j], spriteData)
+          sprite_atlas.addShape(
+              tileSet, name .. '.' .. _COMPASS[j], spriteData)
         end
       else
         local spriteData = {
@@ -590,7 +592,7 @@ function _addShapesToTileSet(
             text = spriteShapes[i],
             noRotate = noRotates[i]
         }
-        tileSet:addShape(name, spriteData)
+        sprite_atlas.addShape(tileSet, name, spriteData)
       end
     end
   end
@@ -0,0 +1,271 @@
+--[[ Copyright 2020 DeepMind Technologies Limited.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+]]
+
+--[[ Renders player views by cropping the image of the whole map.
+
+When the `cropRender` setting is true, the map is rendered once per frame (as
+in `WORLD.RGB`), and the `RGB` observation of each player copies the block of
+that image under its view, rotated to the player's orientation. Only the cells
+whose pixels can differ from the map image are then rendered from the player's
+layer observation:
+
+*   cells holding a `noRotate` sprite, which keeps its orientation in the view
+    instead of turning with the view,
+*   cells holding a sprite remapped in the player's view or in `WORLD.RGB`
+    (including the player's own "self" sprite), and
+*   cells of the view that fall outside the map.
+
+The result is pixel-identical to rendering the whole view. Views that cannot be
+cropped (centered views, or players off the grid) are rendered in full.
+]]
+
+local class = require 'common.class'
+local tensor = require 'system.tensor'
+local tile = require 'system.tile'
+
+-- The right and backward directions of a view in each orientation, as {x, y}.
+local _AXES = {
+    N = {right = {1, 0}, back = {0, 1}},
+    E = {right = {0, 1}, back = {-1, 0}},
+    S = {right = {-1, 0}, back = {0, -1}},
+    W = {right = {0, -1}, back = {1, 0}},
+}
+
+-- State of the environment in this Lua state.
+local _enabled = false
+local _noRotate = {}
+local _worldSpriteMap = {}
+local _mapImage = nil
+local _frame = 0
+
+--[[ Enables crop rendering, recording the `noRotate` sprites of `tileSet`.
+
+Must be called before sprites are added to `tileSet`.
+]]
+local function enable(tileSet)
+  _enabled = true
+  _noRotate = {}
+  _mapImage = nil
+  -- `addShape` and `addSpritePath` both set their sprites through `setSprite`.
+  local setSprite = tileSet.setSprite
+  function tileSet:setSprite(name, sprite, noRotate)
+    if noRotate then
+      _noRotate[name] = true
+    end
+    return setSprite(self, name, sprite, noRotate)
+  end
+end
+
+local function enabled()
+  return _enabled
+end
+
+--[[ Marks the start of a new frame, after which the map is rendered again.]]
+local function newFrame()
+  _frame = _frame + 1
+end
+
+--[[ The image of the whole map, rendered at most once per frame.]]
+local MapImage = class.Class()
+
+function MapImage:__init__(kwargs)
+  self._layerView = kwargs.layerView
+  self._scene = kwargs.scene
+  local gridSize = self._layerView:gridSize()
+  self.width = gridSize.width
+  self.height = gridSize.height
+  self._frame = nil
+  self._image = nil
+end
+
+function MapImage:render(grid)
+  if self._frame ~= _frame then
+    self._image = self._scene:render(self._layerView:observation{grid = grid})
+    self._frame = _frame
+  end
+  return self._image
+end
+
+--[[ Sets the view of the whole map, as used by `WORLD.RGB`.
+
+Returns the MapImage, whose `render(grid)` returns the image of the map.
+]]
+local function setMapView(layerView, scene, worldSpriteMap)
+  _worldSpriteMap = worldSpriteMap or {}
+  _mapImage = MapImage{layerView = layerView, scene = scene}
+  return _mapImage
+end
+
+--[[ Renders the `RGB` view of a player from the image of the map.]]
+local ViewRenderer = class.Class()
+
+--[[ Args (as a table):
+  world: the world of the view.
+  view: the config of the view, with `left`, `right`, `forward` and
+      `backward`.
+  set: the tile set of the view.
+  spriteMap: the sprites remapped in the view, if any.
+  layerView: the layer view of the player.
+  scene: the Scene rendering the whole view.
+]]
+function ViewRenderer:__init__(kwargs)
+  self._left = kwargs.view.left
+  self._forward = kwargs.view.forward
+  self._width = kwargs.view.left + kwargs.view.right + 1
+  self._height = kwargs.view.forward + kwargs.view.backward + 1
+  self._layerView = kwargs.layerView
+  self._scene = kwargs.scene
+  self._cellScene = tile.Scene{
+      shape = {width = 1, height = 1},
+      set = kwargs.set,
+  }
+  self._shape = self._scene:shape()
+  self._spriteSize = math.floor(self._shape[1] / self._height)
+
+  local remapped = {}
+  for _, spriteMap in ipairs{kwargs.spriteMap or {}, _worldSpriteMap} do
+    for source, target in pairs(spriteMap) do
+      remapped[source] = true
+      remapped[target] = true
+    end
+  end
+  -- Sprite ids are zero-based, and id 0 is an empty layer.
+  self._redraw = {}
+  for i, name in ipairs(kwargs.world:spriteNames()) do
+    local baseName = name:match('^(.*)%.[NESW]$') or name
+    if _noRotate[name] or _noRotate[baseName] or
+        remapped[name] or remapped[baseName] then
+      self._redraw[i - 1] = true
+    end
+  end
+end
+
+--[[ Returns the position in the map of cell (`row`, `col`) of the view.
+
+`row` and `col` are zero-based, from the top left of the view.
+]]
+function ViewRenderer:_mapPosition(position, axes, row, col)
+  local right = col - self._left
+  local back = row - self._forward
+  return position[1] + right * axes.right[1] + back * axes.back[1],
+      position[2] + right * axes.right[2] + back * axes.back[2]
+end
+
+--[[ Returns the cell of the view (zero-based row and column) showing (x, y).]]
+function ViewRenderer:_viewCell(position, axes, x, y)
+  local dx, dy = x - position[1], y - position[2]
+  local right = dx * axes.right[1] + dy * axes.right[2]
+  local back = dx * axes.back[1] + dy * axes.back[2]
+  return back + self._forward, right + self._left
+end
+
+--[[ Copies the block of the map image under the view into `image`.
+
+Returns the zero-based rows and columns of the view covered by the block, as
+rowMin, rowMax, colMin, colMax, or nil if the view does not overlap the map.
+]]
+function ViewRenderer:_copyMapBlock(image, grid, position, orientation)
+  local axes = _AXES[orientation]
+  local x1, y1 = self:_mapPosition(position, axes, 0, 0)
+  local x2, y2 = self:_mapPosition(
+      position, axes, self._height - 1, self._width - 1)
+  local xMin = math.max(math.min(x1, x2), 0)
+  local xMax = math.min(math.max(x1, x2), _mapImage.width - 1)
+  local yMin = math.max(math.min(y1, y2), 0)
+  local yMax = math.min(math.max(y1, y2), _mapImage.height - 1)
+  if xMin > xMax or yMin > yMax then
+    return nil
+  end
+
+  local s = self._spriteSize
+  local block = _mapImage:render(grid)
+      :narrow(1, yMin * s + 1, (yMax - yMin + 1) * s)
+      :narrow(2, xMin * s + 1, (xMax - xMin + 1) * s)
+  -- Turn the block so that the direction the player faces is up.
+  if orientation == 'E' then
+    block = block:transpose(1, 2):reverse(1)
+  elseif orientation == 'S' then
+    block = block:reverse(1):reverse(2)
+  elseif orientation == 'W' then
+    block = block:transpose(1, 2):reverse(2)
+  end
+
+  local rowA, colA = self:_viewCell(position, axes, xMin, yMin)
+  local rowB, colB = self:_viewCell(position, axes, xMax, yMax)
+  local rowMin, rowMax = math.min(rowA, rowB), math.max(rowA, rowB)
+  local colMin, colMax = math.min(colA, colB), math.max(colA, colB)
+  image:narrow(1, rowMin * s + 1, (rowMax - rowMin + 1) * s)
+      :narrow(2, colMin * s + 1, (colMax - colMin + 1) * s)
+      :copy(block)
+  return rowMin, rowMax, colMin, colMax
+end
+
+--[[ Returns whether cell `cell` of a layer observation must be rendered.]]
+function ViewRenderer:_mustRedraw(cell)
+  if type(cell) == 'number' then
+    return self._redraw[cell] == true
+  end
+  for _, id in ipairs(cell) do
+    if self._redraw[id] then
+      return true
+    end
+  end
+  return false
+end
+
+--[[ Returns the `RGB` observation of the view of `piece`.]]
+function ViewRenderer:render(grid, piece)
+  local layerObservation = self._layerView:observation{
+      grid = grid,
+      piece = piece,
+  }
+  -- A piece without a layer (e.g. a player waiting to respawn) sees nothing.
+  local position = _mapImage and grid:layer(piece) and grid:position(piece)
+  if not position then
+    return self._scene:render(layerObservation)
+  end
+  local orientation = grid:transform(piece).orientation
+
+  local image = tensor.ByteTensor(unpack(self._shape))
+  local rowMin, rowMax, colMin, colMax = self:_copyMapBlock(
+      image, grid, position, orientation)
+  if not rowMin then
+    return self._scene:render(layerObservation)
+  end
+
+  local s = self._spriteSize
+  local cells = layerObservation:val()
+  for row = 0, self._height - 1 do
+    local inRows = row >= rowMin and row <= rowMax
+    for col = 0, self._width - 1 do
+      local inMap = inRows and col >= colMin and col <= colMax
+      if not inMap or self:_mustRedraw(cells[row + 1][col + 1]) then
+        local cellObservation = layerObservation
+            :narrow(1, row + 1, 1):narrow(2, col + 1, 1):clone()
+        image:narrow(1, row * s + 1, s):narrow(2, col * s + 1, s)
+            :copy(self._cellScene:render(cellObservation))
+      end
+    end
+  end
+  return image
+end
+
+return {
+    enable = enable,
+    enabled = enabled,
+    newFrame = newFrame,
+    setMapView = setMapView,
+    ViewRenderer = ViewRenderer,
+}
@@ -65,6 +65,8 @@ components:
     list.
 *   GameObject:getState(): Returns the current state of the game object
     (e.g. its current state, as a string).
+*   GameObject:setUpdatesEnabled(component, enabled): Starts or stops calling
+    the `preUpdate` and `update` methods of one of its components.
 ]]
 function GameObject:__init__(kwargs)
   assert(kwargs.id ~= nil, 'GameObject\'s id cannot be nil')
@@ -74,6 +76,13 @@ function GameObject:__init__(kwargs)
   -- Components will be a mapping between the component name and a list of
   -- components with that name.
   self._components = {}
+  -- The names of the components in the order they were first added, which is
+  -- the order in which components are called.
+  self._componentNames = {}
+  -- Components whose `preUpdate` and `update` calls are disabled.
+  self._updatesDisabled = {}
+  -- Lists of the components to call on each frame, rebuilt when stale.
+  self._updateListsStale = true
   for _, component in ipairs(kwargs.components) do
     self:addComponent(component)
   end
@@ -102,8 +111,10 @@ function GameObject:addComponent(component)
   component.gameObject = self
   if self._components[component.name] == nil then
     self._components[component.name] = {}
+    table.insert(self._componentNames, component.name)
   end
   table.insert(self._components[component.name], component)
+  self:_invalidateUpdateLists()
   -- Store a dedicated reference to certain essential (and unique) components.
   if component.name == 'StateManager' then
     self._stateManager = component
@@ -118,8 +129,8 @@ end
 
 function GameObject:_doOnAllComponents(func)
   local returns = {}
-  for k, component_list in pairs(self._components) do
-    for _, component in ipairs(component_list) do
+  for _, name in ipairs(self._componentNames) do
+    for _, component in ipairs(self._components[name]) do
       local retValue = func(component)
       if retValue then
         table.insert(returns, retValue)
@@ -378,23 +389,85 @@ function GameObject:postStart(grid)
     end)
 end
 
---[[ preUpdate is called for all gameObjects before update is called for any.]]
-function GameObject:preUpdate()
+function GameObject:_invalidateUpdateLists()
+  self._updateListsStale = true
+  if self.simulation then
+    self.simulation:invalidateActiveUpdates()
+  end
+end
+
+--[[ Rebuilds the lists of components with enabled `preUpdate` and `update`
+methods, in the same order as `_doOnAllComponents`.]]
+function GameObject:_refreshUpdateLists()
+  self._preUpdateComponents = {}
+  self._updateComponents = {}
   self:_doOnAllComponents(
     function(component)
-      if component.preUpdate then
-        component:preUpdate()
+      if not self._updatesDisabled[component] then
+        if component.preUpdate then
+          table.insert(self._preUpdateComponents, component)
+        end
+        if component.update then
+          table.insert(self._updateComponents, component)
+        end
       end
     end)
+  self._updateListsStale = false
+end
+
+--[[ Returns whether any component has an enabled `preUpdate` method.]]
+function GameObject:hasPreUpdates()
+  if self._updateListsStale then
+    self:_refreshUpdateLists()
+  end
+  return #self._preUpdateComponents > 0
+end
+
+--[[ Returns whether any component has an enabled `update` method.]]
+function GameObject:hasUpdates()
+  if self._updateListsStale then
+    self:_refreshUpdateLists()
+  end
+  return #self._updateComponents > 0
+end
+
+--[[ Enables or disables calls to the `preUpdate` and `update` methods of
+`component`, which must belong to this GameObject.
+
+Updates are enabled by default. The simulation only dispatches updates to game
+objects with at least one enabled component, so components that only have work
+to do some of the time (e.g. while a timer runs) can disable their updates when
+idle. Changes take effect no later than the next frame.
+]]
+function GameObject:setUpdatesEnabled(component, enabled)
+  assert(component.gameObject == self,
+         'Can only set updates of components of this GameObject.')
+  local disabled = not enabled or nil
+  if self._updatesDisabled[component] ~= disabled then
+    self._updatesDisabled[component] = disabled
+    self:_invalidateUpdateLists()
+  end
+end
+
+--[[ preUpdate is called for all gameObjects before update is called for any.]]
+function GameObject:preUpdate()
+  if self._updateListsStale then
+    self:_refreshUpdateLists()
+  end
+  local components = self._preUpdateComponents
+  for i = 1, #components do
+    components[i]:preUpdate()
+  end
 end
 
 function GameObject:update(grid)
-  self:_doOnAllComponents(
-    function(component)
-      if component.update then
-        component:update()
-      end
-    end)
+  if self._updateListsStale then
+    self:_refreshUpdateLists()
+  end
+  local components = self._updateComponents
+  for i = 1, #components do
+    components[i]:update()
+  end
 end
 
 function GameObject:hasComponent(name)
@@ -429,8 +502,8 @@ function GameObject:getComponents(name)
     return self._components[name]
   end
   local result = {}
-  for _, componentsWithSameName in pairs(self._components) do
-    for _, component in pairs(componentsWithSameName) do
+  for _, componentName in ipairs(self._componentNames) do
+    for _, component in ipairs(self._components[componentName]) do
       table.insert(result, component)
     end
   end
@@ -608,6 +681,9 @@ function GameObject:reset()
     end
   end)
   self._grid = nil
+  -- The state the object was in when its piece was last removed, if any, was
+  -- in the previous episode.
+  self._previousState = nil
 end
 
 return {GameObject = GameObject}
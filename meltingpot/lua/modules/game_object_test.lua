@@ -149,6 +149,26 @@ function tests.addComponentCallsAwake()
   asserts.EQ(awoken, 1)
 end
 
+function tests.setUpdatesEnabled()
+  local gameObject = makeTestGameObject()
+  local counter = component.Component{name = 'Counter'}
+  local numUpdates = 0
+  counter.update = function(_self) numUpdates = numUpdates + 1 end
+  gameObject:addComponent(counter)
+  asserts.EQ(gameObject:hasUpdates(), true)
+  gameObject:update()
+  asserts.EQ(numUpdates, 1)
+
+  gameObject:setUpdatesEnabled(counter, false)
+  asserts.EQ(gameObject:hasUpdates(), false)
+  gameObject:update()
+  asserts.EQ(numUpdates, 1)
+
+  gameObject:setUpdatesEnabled(counter, true)
+  gameObject:update()
+  asserts.EQ(numUpdates, 2)
+end
+
 function tests.getComponent()
   local gameObject = makeTestGameObject()
   local blocker1 = component_library.BeamBlocker{
@@ -410,5 +430,26 @@ function tests.reset()
   asserts.EQ(gameObject:getState(), 'state1')
 end
 
+function tests.getComponentsInOrderAdded()
+  local gameObject = makeTestGameObject()
+  local names = {}
+  for _, component in ipairs(gameObject:getComponents()) do
+    table.insert(names, component.name)
+  end
+  asserts.tablesEQ(
+      names, {'StateManager', 'Transform', 'Appearance', 'LocationObserver'})
+end
+
+function tests.resetForgetsPreviousState()
+  local gameObject = makeTestGameObject()
+  local grid = simulateUsage(gameObject)
+  gameObject:setState('state2')
+  updateGrid(grid)
+  asserts.EQ(gameObject._previousState, 'state1')
+
+  gameObject:reset()
+  asserts.EQ(gameObject._previousState, nil)
+end
+
 
 return test_runner.run(tests)
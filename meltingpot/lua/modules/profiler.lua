@@ -0,0 +1,137 @@
+--[[ Copyright 2020 DeepMind Technologies Limited.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+]]
+
+--[[ The Profiler accumulates the time taken by, and number of calls to, the
+functions of a simulation that run on every frame.
+
+It is enabled by setting `profile = true` in the lab2d settings, in which case
+the api instruments:
+
+*   `component/<name>:<method>`: the per-frame methods of every component (e.g.
+    `update`, `onHit`), summed over the components with that name.
+*   `updater/<name>`: the updaters registered with the UpdaterRegistry.
+*   `observation/<name>`: the functions computing each observation.
+*   `frame/simulationUpdate` and `frame/gridUpdate`: the two phases of a frame.
+
+Times are measured with `os.clock` (processor time) and include the time spent
+in nested calls, so e.g. an `update` that sets a state includes the resulting
+`onStateChange` calls.
+]]
+
+local class = require 'common.class'
+
+local clock = os.clock
+
+-- Component methods that can be called on every frame.
+local _COMPONENT_METHODS = {
+    'preUpdate',
+    'update',
+    'discreteActions',
+    'onBlocked',
+    'onEnter',
+    'onExit',
+    'onHit',
+    'onStateChange',
+}
+
+local Profiler = class.Class()
+
+function Profiler:__init__()
+  self._calls = {}
+  self._seconds = {}
+end
+
+--[[ Returns a function that calls `fn` and records the call under `key`.]]
+function Profiler:wrap(key, fn)
+  local calls = self._calls
+  local seconds = self._seconds
+  calls[key] = calls[key] or 0
+  seconds[key] = seconds[key] or 0
+  local function record(start, ...)
+    seconds[key] = seconds[key] + (clock() - start)
+    calls[key] = calls[key] + 1
+    return ...
+  end
+  return function(...)
+    local start = clock()
+    return record(start, fn(...))
+  end
+end
+
+--[[ Resets the calls and time of every key to zero, e.g. on a new episode.]]
+function Profiler:clear()
+  -- Wrapped functions hold these tables, so they are zeroed in place.
+  for key, _ in pairs(self._calls) do
+    self._calls[key] = 0
+    self._seconds[key] = 0
+  end
+end
+
+--[[ Instruments the per-frame methods of all components of `gameObjects`.
+
+The instrumented methods are set on each component instance, shadowing the
+methods of its class.
+]]
+function Profiler:instrumentComponents(gameObjects)
+  for _, gameObject in pairs(gameObjects) do
+    for _, component in ipairs(gameObject:getComponents()) do
+      for _, method in ipairs(_COMPONENT_METHODS) do
+        if component[method] then
+          component[method] = self:wrap(
+              'component/' .. component.name .. ':' .. method, component[method])
+        end
+      end
+    end
+  end
+end
+
+--[[ Instruments the updaters in the state callbacks table.]]
+function Profiler:instrumentUpdaters(stateCallbacks)
+  for _, callbacks in pairs(stateCallbacks) do
+    if callbacks.onUpdate then
+      for name, updateFn in pairs(callbacks.onUpdate) do
+        callbacks.onUpdate[name] = self:wrap('updater/' .. name, updateFn)
+      end
+    end
+  end
+end
+
+--[[ Instruments the functions of a list of observation specs.]]
+function Profiler:instrumentObservations(observations)
+  for _, spec in ipairs(observations) do
+    spec.func = self:wrap('observation/' .. spec.name, spec.func)
+  end
+end
+
+--[[ Returns the accumulated profile, as one line per key.
+
+Each line holds the key, the number of calls and the total time in seconds,
+separated by tabs. Lines are sorted by key.
+]]
+function Profiler:report()
+  local keys = {}
+  for key, _ in pairs(self._calls) do
+    table.insert(keys, key)
+  end
+  table.sort(keys)
+  local lines = {}
+  for _, key in ipairs(keys) do
+    table.insert(lines, string.format(
+        '%s\t%d\t%.9f', key, self._calls[key], self._seconds[key]))
+  end
+  return table.concat(lines, '\n')
+end
+
+return {Profiler = Profiler}
@@ -0,0 +1,67 @@
+--[[ Copyright 2020 DeepMind Technologies Limited.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+]]
+
+-- Tests for the `profiler` module.
+
+local meltingpot = 'meltingpot.lua.modules.'
+local profiler = require(meltingpot .. 'profiler')
+
+local asserts = require 'testing.asserts'
+local test_runner = require 'testing.test_runner'
+
+local tests = {}
+
+function tests.wrapReturnsResults()
+  local profile = profiler.Profiler()
+  local add = profile:wrap('add', function(a, b) return a + b, a - b end)
+  local sum, difference = add(3, 2)
+  asserts.EQ(sum, 5)
+  asserts.EQ(difference, 1)
+end
+
+function tests.reportCountsCalls()
+  local profile = profiler.Profiler()
+  local first = profile:wrap('first', function() end)
+  local second = profile:wrap('second', function() end)
+  first()
+  first()
+  second()
+  local calls = {}
+  for line in profile:report():gmatch('[^\n]+') do
+    local key, numCalls = line:match('^([^\t]+)\t(%d+)\t')
+    calls[key] = tonumber(numCalls)
+  end
+  asserts.tablesEQ(calls, {first = 2, second = 1})
+end
+
+function tests.clearResetsCounts()
+  local profile = profiler.Profiler()
+  local fn = profile:wrap('fn', function() end)
+  fn()
+  profile:clear()
+  asserts.EQ(profile:report():match('^fn\t0\t') ~= nil, true)
+  fn()
+  asserts.EQ(profile:report():match('^fn\t1\t') ~= nil, true)
+end
+
+function tests.instrumentObservations()
+  local profile = profiler.Profiler()
+  local observations = {{name = 'OBS', func = function(grid) return grid end}}
+  profile:instrumentObservations(observations)
+  asserts.EQ(observations[1].func(7), 7)
+  asserts.EQ(profile:report():match('^observation/OBS\t1\t') ~= nil, true)
+end
+
+return test_runner.run(tests)
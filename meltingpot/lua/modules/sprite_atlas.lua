@@ -0,0 +1,75 @@
+--[[ Copyright 2020 DeepMind Technologies Limited.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+]]
+
+--[[ Sprites prebuilt from ASCII art by `sprite_atlas.py`.
+
+The `spriteAtlas` setting names a file holding the RGBA images of the
+`ascii_shape` sprites of the substrate, packed into one ByteTensor of shape
+{numTiles, height, width, 4}. The `sprites` setting gives the tile of each
+sprite name, as a line of '<tile> <name>' per sprite. Once the atlas is loaded,
+`addShape` sets the prebuilt image of a sprite instead of parsing its text.
+Sprites missing from the atlas are parsed as before.
+]]
+
+local log = require 'common.log'
+local tensor = require 'system.tensor'
+
+-- The prebuilt image of each sprite name, for the environment in this Lua state.
+local _images = {}
+
+--[[ Loads the atlas described by the `spriteAtlas` setting.
+
+If the setting is empty, or the file cannot be read, no sprites are prebuilt.
+]]
+local function load(settings)
+  _images = {}
+  if settings == nil or settings.path == nil or settings.path == '' then
+    return
+  end
+  local numTiles = tonumber(settings.numTiles)
+  local height = tonumber(settings.height)
+  local width = tonumber(settings.width)
+  local ok, tiles = pcall(tensor.ByteTensor, {
+      file = {name = settings.path, numElements = numTiles * height * width * 4}
+  })
+  if not ok then
+    log.warn('Could not read sprite atlas ' .. settings.path .. ': ' ..
+             tostring(tiles))
+    return
+  end
+  tiles = tiles:reshape{numTiles, height, width, 4}
+  for index, name in string.gmatch(settings.sprites or '', '(%d+) ([^\n]+)') do
+    _images[name] = tiles:select(1, tonumber(index))
+  end
+end
+
+--[[ Adds sprite `name` to `tileSet`, as `tileSet:addShape(name, spriteData)`.
+
+The prebuilt image is set if the atlas has one, which skips parsing
+`spriteData.text`.
+]]
+local function addShape(tileSet, name, spriteData)
+  local image = _images[name]
+  if image and tileSet.setSprite then
+    tileSet:setSprite(name, image, spriteData.noRotate)
+  else
+    tileSet:addShape(name, spriteData)
+  end
+end
+
+return {
+    load = load,
+    addShape = addShape,
+}
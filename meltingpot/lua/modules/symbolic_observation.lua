@@ -0,0 +1,125 @@
+--[[ Copyright 2020 DeepMind Technologies Limited.
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    https://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+]]
+
+--[[ Symbolic observations: grids of sprite ids instead of rendered images.
+
+A symbolic observation covers the same cells as the corresponding `RGB`
+observation, with one uint8 per cell and layer. Each value is an index into the
+vocabulary of the world: the names of its sprites without their orientation
+(e.g. 'Wall' for 'Wall.N'). Index 0 (the name '') marks an empty layer.
+]]
+
+-- The vocabulary of each world, keyed weakly so that worlds can be collected.
+local _vocabularies = setmetatable({}, {__mode = 'k'})
+
+-- Symbolic observations are ByteTensors.
+local _MAX_VOCABULARY_SIZE = 256
+
+local _ORIENTATIONS = {'N', 'E', 'S', 'W'}
+
+--[[ Returns the name of a sprite without its orientation suffix.]]
+local function _baseName(spriteName)
+  return spriteName:match('^(.*)%.[NESW]$') or spriteName
+end
+
+--[[ Returns whether sprite ids are grouped by name in orientation order.
+
+The world usually names sprite `id` (for `id` >= 1) as
+`name .. '.' .. _ORIENTATIONS[(id - 1) % 4 + 1]`, in which case the index of
+its name is `floor((id + 3) / 4)`. That index is computed with tensor operations,
+which is much faster than looking up each id.
+]]
+local function _hasOrientationGroups(spriteNames, names)
+  for i = 2, #spriteNames do
+    local id = i - 1
+    local expected = names[math.floor((id + 3) / 4) + 1] .. '.' ..
+        _ORIENTATIONS[(id - 1) % 4 + 1]
+    if spriteNames[i] ~= expected then
+      return false
+    end
+  end
+  return true
+end
+
+--[[ Returns the vocabulary of `world` and a function converting observations.
+
+Returns:
+  names: the array of names in the vocabulary, starting with ''.
+  toIndices: function(layerObservation) returning the ByteTensor of the
+      indices in names (which are zero-based) of the sprites in the
+      Int32Tensor of a layer observation. It may modify its argument.
+]]
+local function vocabulary(world)
+  local cached = _vocabularies[world]
+  if not cached then
+    local spriteNames = world:spriteNames()
+    local names = {''}
+    local indexByName = {[''] = 0}
+    local indices = {}
+    -- Sprite ids are zero-based, and id 0 (named '') is an empty layer.
+    for i, spriteName in ipairs(spriteNames) do
+      local name = _baseName(spriteName)
+      if indexByName[name] == nil then
+        indexByName[name] = #names
+        table.insert(names, name)
+      end
+      indices[i - 1] = indexByName[name]
+    end
+    assert(#names <= _MAX_VOCABULARY_SIZE,
+           'Too many sprites for symbolic observations: ' .. #names)
+    local toIndices
+    if _hasOrientationGroups(spriteNames, names) then
+      toIndices = function(layerObservation)
+        return layerObservation:add(3):div(4):byte()
+      end
+    else
+      local function toIndex(spriteId)
+        return indices[spriteId]
+      end
+      toIndices = function(layerObservation)
+        return layerObservation:apply(toIndex):byte()
+      end
+    end
+    cached = {names = names, toIndices = toIndices}
+    _vocabularies[world] = cached
+  end
+  return cached.names, cached.toIndices
+end
+
+--[[ Returns an observation spec of the symbolic form of a layer view.
+
+Args:
+  name: the name of the observation.
+  world: the world that created `layerView`.
+  layerView: the view to observe.
+  observe: function(grid) returning the layer observation of `layerView`.
+]]
+local function observationSpec(name, world, layerView, observe)
+  local _, toIndices = vocabulary(world)
+  local spec = layerView:observationSpec(name)
+  return {
+      name = name,
+      type = 'tensor.ByteTensor',
+      shape = spec.shape,
+      func = function(grid)
+        return toIndices(observe(grid))
+      end,
+  }
+end
+
+return {
+    vocabulary = vocabulary,
+    observationSpec = observationSpec,
+}
@@ -16,18 +16,25 @@
 import abc
 import os
 import re
-from typing import Mapping, Tuple
+import threading
+from typing import TYPE_CHECKING, Dict, Hashable, List, Mapping, Sequence, Tuple
 
 import dm_env
 from ml_collections import config_dict
 import numpy as np
-import tensorflow as tf
 import tree
 
 from meltingpot.python.configs import bots as bot_config
+from meltingpot.python.utils.bots import batcher
+from meltingpot.python.utils.bots import model_registry
 from meltingpot.python.utils.bots import permissive_model
 from meltingpot.python.utils.bots import puppeteer_functions
 
+if TYPE_CHECKING:
+    # TensorFlow is slow to import, so is only imported once the first saved
+    # model is loaded. Users that only need substrates never import it.
+    import tensorflow as tf
+
 _MODELS_ROOT = re.sub(
     "meltingpot/python/.*", "meltingpot/assets/saved_models", __file__
 )
@@ -59,6 +66,64 @@ class Policy(metaclass=abc.ABCMeta):
     """
         raise NotImplementedError()
 
+    def step_batch(
+        self, timesteps: Sequence[dm_env.TimeStep], prev_states: Sequence[State]
+    ) -> Tuple[Sequence[int], Sequence[State]]:
+        """Steps several independent copies of the agent.
+
+    Subclasses that can run inference on a batch should override this. The
+    default implementation calls `step` for each copy in turn.
+
+    Args:
+      timesteps: information from the environment for each copy.
+      prev_states: the previous state of each copy.
+
+    Returns:
+      actions: the action of each copy to send to the environment.
+      next_states: the state of each copy for the next step_batch call.
+    """
+        actions = []
+        next_states = []
+        for timestep, prev_state in zip(timesteps, prev_states):
+            action, next_state = self.step(timestep=timestep, prev_state=prev_state)
+            actions.append(action)
+            next_states.append(next_state)
+        return actions, next_states
+
+    def warmup(
+        self,
+        observation_spec: tree.Structure[dm_env.specs.Array],
+        batch_sizes: Sequence[int] = (1,),
+    ) -> None:
+        """Prepares the policy to step on observations matching observation_spec.
+
+    Steps copies of the policy through the first two steps of an episode, from
+    their initial state, on observations generated from the spec, and discards
+    the results. One-off costs of stepping (e.g. tracing functions, initializing
+    tables and setting up kernels for each batch size) are then paid here rather
+    than during an episode. Later steps are unaffected.
+
+    Args:
+      observation_spec: the spec of the observations the policy will be stepped
+        on.
+      batch_sizes: the numbers of copies that will be stepped together with
+        `step_batch`. A batch size of 1 also prepares `step`.
+    """
+        observation = tree.map_structure(
+            lambda spec: spec.generate_value(), observation_spec
+        )
+        first = dm_env.TimeStep(
+            step_type=dm_env.StepType.FIRST,
+            reward=0.0,
+            discount=0.0,
+            observation=observation,
+        )
+        mid = dm_env.transition(reward=0.0, observation=observation)
+        for batch_size in batch_sizes:
+            states = [self.initial_state() for _ in range(batch_size)]
+            for timestep in (first, mid):
+                _, states = self.step_batch([timestep] * batch_size, states)
+
     @abc.abstractmethod
     def close(self) -> None:
         """Closes the policy."""
@@ -72,7 +137,9 @@ class Policy(metaclass=abc.ABCMeta):
         self.close()
 
 
-def _tensor_to_numpy(tensors: tree.Structure[tf.Tensor]) -> tree.Structure[np.ndarray]:
+def _tensor_to_numpy(
+    tensors: "tree.Structure[tf.Tensor]",
+) -> tree.Structure[np.ndarray]:
     """Converts tensors to numpy arrays.
 
   Args:
@@ -81,6 +148,8 @@ def _tensor_to_numpy(tensors: tree.Structure[tf.Tensor]) -> tree.Structure[np.nd
   Returns:
     The values of the tensors.
   """
+    import tensorflow as tf  # pylint: disable=g-import-not-at-top
+
     if tf.executing_eagerly():
         return tree.map_structure(lambda x: x.numpy(), tensors)
     else:
@@ -88,6 +157,136 @@ def _tensor_to_numpy(tensors: tree.Structure[tf.Tensor]) -> tree.Structure[np.nd
             return sess.run(tensors)
 
 
+def _stack(*values: np.ndarray) -> np.ndarray:
+    return np.stack(values)
+
+
+def _concatenate(*values: np.ndarray) -> np.ndarray:
+    return np.concatenate(values)
+
+
+def _batched_model_step(
+    model: permissive_model.PermissiveModel,
+    inputs: Sequence[Tuple[dm_env.TimeStep, State]],
+) -> Sequence[Tuple[int, State]]:
+    """Steps the model once on a batch of (timestep, prev_state) inputs.
+
+  Args:
+    model: the model to step.
+    inputs: the timestep and unbatched (batch size 1) state of each copy.
+
+  Returns:
+    The action and next state (batch size 1) of each copy.
+  """
+    timesteps, prev_states = zip(*inputs)
+    step_type = np.array([t.step_type for t in timesteps], dtype=np.int64)
+    reward = np.array([t.reward for t in timesteps], dtype=np.float32)
+    discount = np.array([t.discount for t in timesteps], dtype=np.float32)
+    observation = tree.map_structure(_stack, *[t.observation for t in timesteps])
+    prev_state = tree.map_structure(_concatenate, *prev_states)
+    output, next_state = model.step(
+        step_type=step_type,
+        reward=reward,
+        discount=discount,
+        observation=observation,
+        prev_state=prev_state,
+    )
+    if isinstance(output.action, Mapping):
+        # Legacy bots trained with older action spec.
+        action = output.action["environment_action"]
+    else:
+        action = output.action
+    action = _tensor_to_numpy(action)
+    next_state = _tensor_to_numpy(next_state)
+    return [
+        (int(action[n]), tree.map_structure(lambda x: x[n : n + 1], next_state))
+        for n in range(len(inputs))
+    ]
+
+
+def _observation_layout(timestep: dm_env.TimeStep) -> Hashable:
+    """Returns a hashable description of the observation's structure."""
+    return tuple(
+        (path, np.shape(value), np.asarray(value).dtype.str)
+        for path, value in tree.flatten_with_path(timestep.observation)
+    )
+
+
+def _grouped_model_step(
+    model: permissive_model.PermissiveModel,
+    inputs: Sequence[Tuple[dm_env.TimeStep, State]],
+) -> Sequence[Tuple[int, State]]:
+    """Steps the model once per distinct observation layout in inputs."""
+    groups: Dict[Hashable, List[int]] = {}
+    for n, (timestep, _) in enumerate(inputs):
+        groups.setdefault(_observation_layout(timestep), []).append(n)
+    outputs = [None] * len(inputs)
+    for indices in groups.values():
+        group_outputs = _batched_model_step(model, [inputs[n] for n in indices])
+        for n, output in zip(indices, group_outputs):
+            outputs[n] = output
+    return outputs
+
+
+def _load_model(
+    model_path: str, jit_compile: bool = False
+) -> permissive_model.PermissiveModel:
+    """Loads the saved model at model_path."""
+    import tensorflow as tf  # pylint: disable=g-import-not-at-top
+
+    model = tf.saved_model.load(model_path)
+    return permissive_model.PermissiveModel(model, jit_compile=jit_compile)
+
+
+# The saved models of all SavedModelPolicy instances in the process. See
+# `model_registry` for its memory budget and statistics.
+MODEL_REGISTRY: model_registry.ModelRegistry[
+    permissive_model.PermissiveModel
+] = model_registry.ModelRegistry(_load_model)
+
+
+class _SharedBatchers:
+    """Process-wide batchers for saved models, keyed by model path.
+
+  All SavedModelPolicy instances loaded from the same path share a batcher, so
+  that concurrent steps from different bots (and different scenarios) are run as
+  a single call to the model.
+  """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._batchers: Dict[str, batcher.Batcher] = {}
+        self._users: Dict[str, int] = {}
+
+    def acquire(
+        self, model_path: str, model: permissive_model.PermissiveModel
+    ) -> batcher.Batcher:
+        """Returns the batcher for model_path, creating it from model if needed."""
+        key = os.path.realpath(model_path)
+        with self._lock:
+            if key not in self._batchers:
+                self._batchers[key] = batcher.Batcher(
+                    lambda inputs: _grouped_model_step(model, inputs)
+                )
+                self._users[key] = 0
+            self._users[key] += 1
+            return self._batchers[key]
+
+    def release(self, model_path: str) -> None:
+        """Releases a batcher, closing it when it is no longer in use."""
+        key = os.path.realpath(model_path)
+        with self._lock:
+            self._users[key] -= 1
+            if self._users[key]:
+                return
+            del self._users[key]
+            model_batcher = self._batchers.pop(key)
+        model_batcher.close()
+
+
+_SHARED_BATCHERS = _SharedBatchers()
+
+
 class SavedModelPolicy(Policy):
     """Policy wrapping a saved model for inference.
 
@@ -95,39 +294,39 @@ class SavedModelPolicy(Policy):
   1. `initial_state(batch_size, trainable)`
   2. `step(step_type, reward, discount, observation, prev_state)`
   that accept batched inputs and produce batched outputs.
+
+  Policies using the same saved model share one copy of it, held in
+  `MODEL_REGISTRY`, and their steps are batched together when they are made
+  concurrently.
   """
 
-    def __init__(self, model_path: str) -> None:
+    def __init__(self, model_path: str, jit_compile: bool = False) -> None:
         """Initialize a policy instance.
 
     Args:
       model_path: Path to the SavedModel.
+      jit_compile: whether to compile the model's functions with XLA. Ignored if
+        the model is already loaded in `MODEL_REGISTRY`.
     """
-        model = tf.saved_model.load(model_path)
-        self._model = permissive_model.PermissiveModel(model)
+        self._model = MODEL_REGISTRY.acquire(model_path, jit_compile=jit_compile)
+        self._model_path = model_path
+        self._batcher = _SHARED_BATCHERS.acquire(model_path, self._model)
+        self._closed = False
 
     def step(self, timestep: dm_env.TimeStep, prev_state: State) -> Tuple[int, State]:
         """See base class."""
-        step_type = np.array(timestep.step_type, dtype=np.int64)[None]
-        reward = np.asarray(timestep.reward, dtype=np.float32)[None]
-        discount = np.asarray(timestep.discount, dtype=np.float32)[None]
-        observation = tree.map_structure(lambda x: x[None], timestep.observation)
-        output, next_state = self._model.step(
-            step_type=step_type,
-            reward=reward,
-            discount=discount,
-            observation=observation,
-            prev_state=prev_state,
-        )
-        if isinstance(output.action, Mapping):
-            # Legacy bots trained with older action spec.
-            action = output.action["environment_action"]
-        else:
-            action = output.action
-        action = int(_tensor_to_numpy(action[0]))
-        next_state = _tensor_to_numpy(next_state)
+        ((action, next_state),) = self._batcher([(timestep, prev_state)])
         return action, next_state
 
+    def step_batch(
+        self, timesteps: Sequence[dm_env.TimeStep], prev_states: Sequence[State]
+    ) -> Tuple[Sequence[int], Sequence[State]]:
+        """See base class."""
+        outputs = self._batcher(list(zip(timesteps, prev_states)))
+        actions = [action for action, _ in outputs]
+        next_states = [next_state for _, next_state in outputs]
+        return actions, next_states
+
     def initial_state(self) -> State:
         """See base class."""
         state = self._model.initial_state(batch_size=1, trainable=None)
@@ -135,7 +334,10 @@ class SavedModelPolicy(Policy):
 
     def close(self) -> None:
         """See base class."""
-        pass
+        if not self._closed:
+            self._closed = True
+            _SHARED_BATCHERS.release(self._model_path)
+            MODEL_REGISTRY.release(self._model_path)
 
 
 _GOAL_OBS_NAME = "GOAL"
@@ -183,6 +385,27 @@ class PuppetPolicy(Policy):
         }
         return action, next_state
 
+    def step_batch(
+        self, timesteps: Sequence[dm_env.TimeStep], prev_states: Sequence[State]
+    ) -> Tuple[Sequence[int], Sequence[State]]:
+        """See base class."""
+        puppet_timesteps = []
+        puppeteer_states = []
+        for timestep, prev_state in zip(timesteps, prev_states):
+            puppet_timestep, puppeteer_state = self._puppeteer_step(
+                timestep, prev_state["puppeteer"]
+            )
+            puppet_timesteps.append(puppet_timestep)
+            puppeteer_states.append(puppeteer_state)
+        actions, puppet_states = self._puppet.step_batch(
+            puppet_timesteps, [prev_state["puppet"] for prev_state in prev_states]
+        )
+        next_states = [
+            {"puppeteer": puppeteer_state, "puppet": puppet_state}
+            for puppeteer_state, puppet_state in zip(puppeteer_states, puppet_states)
+        ]
+        return actions, next_states
+
     def initial_state(self) -> State:
         """See base class."""
         return {
@@ -92,6 +92,30 @@ class BotTest(parameterized.TestCase):
                 action, _ = policy.step(timestep, prev_state)
                 env.step(action)
 
+    @parameterized.named_parameters(
+        ("saved_model", "arena_rws_free_0"),
+        ("puppet", "cleanup_puppet_alternate_clean_first"),
+    )
+    def test_warmup_without_error(self, bot_name):
+        bot_config = bot_factory.get_config(bot_name)
+        with bot_factory.build(bot_config) as policy:
+            with build_environment(bot_config.substrate) as env:
+                policy.warmup(env.observation_spec())
+                timestep = env.reset()
+                policy.step(timestep, policy.initial_state())
+
+
+class SavedModelPolicyTest(absltest.TestCase):
+    def test_policies_share_model(self):
+        bot_config = bot_factory.get_config("arena_rws_free_0")
+        stats = bot_factory.MODEL_REGISTRY.stats()
+        with bot_factory.build(bot_config) as policy1:
+            with bot_factory.build(bot_config) as policy2:
+                with self.subTest("shared"):
+                    self.assertIs(policy1._model, policy2._model)
+        with self.subTest("hit"):
+            self.assertGreater(bot_factory.MODEL_REGISTRY.stats().hits, stats.hits)
+
 
 if __name__ == "__main__":
     absltest.main()
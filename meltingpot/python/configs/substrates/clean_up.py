@@ -370,6 +370,7 @@ def create_scene():
                     "delayStartOfDirtSpawning": 50,
                 },
             },
+            {"component": "AppleGrowthManager", "kwargs": {},},
         ],
     }
     return scene
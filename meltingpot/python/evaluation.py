@@ -0,0 +1,395 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Evaluates a focal policy on scenarios, in parallel and resumably.
+
+Every episode of every scenario is a separate task, and the tasks are run by a
+pool of worker processes that each take the next task from a shared queue when
+they finish one. Scenarios of uneven cost are thereby balanced across the
+workers, as they would be by stealing work. Each worker builds the focal policy
+once, and keeps its last scenario for as long as the tasks it takes are from
+that scenario.
+
+The result of each episode is appended to a results file, one JSON object per
+line, as soon as it completes. Evaluating again with the same file only runs
+the episodes that have no result, so an interrupted evaluation can be resumed.
+
+Usage:
+  python evaluation.py --policy=my_package.my_module:build_policy \
+      --results=/tmp/results.jsonl --num_episodes=10
+"""
+
+import argparse
+import atexit
+import collections
+import concurrent.futures
+import importlib
+import json
+import multiprocessing
+import os
+import time
+from typing import (
+    Callable,
+    Collection,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+
+from absl import logging
+import dm_env
+
+from meltingpot.python import bot as bot_factory
+from meltingpot.python import scenario as scenario_factory
+
+PolicyFactory = Callable[[], bot_factory.Policy]
+
+# The focal policy and the current scenario of a worker process.
+_worker_policy: Optional[bot_factory.Policy] = None
+_worker_scenario: Optional[Tuple[str, scenario_factory.Scenario]] = None
+
+
+class EpisodeResult(NamedTuple):
+    """The result of an episode of a scenario.
+
+  Attributes:
+    scenario: the name of the scenario.
+    episode: the index of the episode in the evaluation of the scenario.
+    focal_returns: the return of each focal player.
+    num_steps: the number of steps in the episode.
+    seconds: the time taken to run the episode, including building the scenario
+      if it was built for it.
+  """
+
+    scenario: str
+    episode: int
+    focal_returns: Tuple[float, ...]
+    num_steps: int
+    seconds: float
+
+    @property
+    def per_capita_focal_return(self) -> float:
+        """The mean return of the focal players."""
+        return sum(self.focal_returns) / len(self.focal_returns)
+
+
+def read_results(path: str) -> List[EpisodeResult]:
+    """Returns the results in a results file, or none if it does not exist.
+
+  Lines that cannot be parsed, such as a line left incomplete by a crash, are
+  ignored.
+
+  Args:
+    path: the results file.
+  """
+    results = []
+    try:
+        with open(path) as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return results
+    for line in lines:
+        try:
+            fields = json.loads(line)
+            result = EpisodeResult(**fields)
+        except (TypeError, ValueError):
+            logging.warning("Ignoring malformed result: %r", line)
+            continue
+        results.append(result._replace(focal_returns=tuple(result.focal_returns)))
+    return results
+
+
+def per_capita_focal_returns(results: Iterable[EpisodeResult]) -> Dict[str, float]:
+    """Returns the mean per-capita focal return of each scenario in results.
+
+  If an episode has several results, only the first is used.
+
+  Args:
+    results: the results of episodes.
+  """
+    returns = collections.defaultdict(list)
+    seen = set()
+    for result in results:
+        key = (result.scenario, result.episode)
+        if key not in seen:
+            seen.add(key)
+            returns[result.scenario].append(result.per_capita_focal_return)
+    return {
+        scenario: sum(values) / len(values) for scenario, values in returns.items()
+    }
+
+
+def _append_result(f, result: EpisodeResult) -> None:
+    """Appends result to the results file f, durably."""
+    f.write(json.dumps(result._asdict()) + "\n")
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def _open_results(path: str):
+    """Opens the results file for appending after its last complete line."""
+    f = open(path, "a")
+    if f.tell() > 0:
+        with open(path, "rb") as existing:
+            existing.seek(-1, os.SEEK_END)
+            if existing.read(1) != b"\n":
+                # Terminate a line left incomplete by a crash, so it is ignored.
+                f.write("\n")
+    return f
+
+
+def _order_tasks(
+    scenario_names: Sequence[str],
+    num_episodes: int,
+    results: Sequence[EpisodeResult],
+) -> List[Tuple[str, int]]:
+    """Returns the episodes without a result, the most expensive first.
+
+  Scenarios are ordered by their mean episode time in results, with scenarios
+  that have no results first, so that long episodes are not left until the end
+  of the evaluation. The episodes of a scenario are consecutive, so that a
+  worker is likely to take several of them in turn.
+
+  Args:
+    scenario_names: the scenarios to evaluate.
+    num_episodes: the number of episodes of each scenario.
+    results: the results of episodes already run.
+  """
+    done = {(result.scenario, result.episode) for result in results}
+    seconds = collections.defaultdict(list)
+    for result in results:
+        seconds[result.scenario].append(result.seconds)
+
+    def cost(scenario_name):
+        times = seconds.get(scenario_name)
+        if not times:
+            return float("inf")
+        return sum(times) / len(times)
+
+    ordered = sorted(scenario_names, key=cost, reverse=True)
+    return [
+        (name, episode)
+        for name in ordered
+        for episode in range(num_episodes)
+        if (name, episode) not in done
+    ]
+
+
+def _initialize_worker(policy_factory: PolicyFactory) -> None:
+    """Builds the focal policy of a worker process."""
+    global _worker_policy
+    _worker_policy = policy_factory()
+    atexit.register(_close_worker)
+
+
+def _get_scenario(scenario_name: str) -> scenario_factory.Scenario:
+    """Returns the scenario of this worker, building it if it is a new one."""
+    global _worker_scenario
+    if _worker_scenario is not None:
+        name, env = _worker_scenario
+        if name == scenario_name:
+            return env
+        _worker_scenario = None
+        env.close()
+    env = scenario_factory.build(scenario_factory.get_config(scenario_name))
+    _worker_scenario = (scenario_name, env)
+    return env
+
+
+def _run_episode(scenario_name: str, episode: int) -> EpisodeResult:
+    """Runs an episode of a scenario with the focal policy of this worker."""
+    start = time.perf_counter()
+    policy = _worker_policy
+    env = _get_scenario(scenario_name)
+    num_focal = len(env.action_spec())
+    states = [policy.initial_state() for _ in range(num_focal)]
+    returns = [0.0] * num_focal
+    num_steps = 0
+    timestep, _ = env.reset()
+    while not timestep.last():
+        player_timesteps = [
+            dm_env.TimeStep(
+                step_type=timestep.step_type,
+                reward=reward,
+                discount=timestep.discount,
+                observation=observation,
+            )
+            for observation, reward in zip(timestep.observation, timestep.reward)
+        ]
+        actions, states = policy.step_batch(player_timesteps, states)
+        timestep, _ = env.step(actions)
+        returns = [
+            total + float(reward) for total, reward in zip(returns, timestep.reward)
+        ]
+        num_steps += 1
+    return EpisodeResult(
+        scenario=scenario_name,
+        episode=episode,
+        focal_returns=tuple(returns),
+        num_steps=num_steps,
+        seconds=time.perf_counter() - start,
+    )
+
+
+def _close_worker() -> None:
+    """Closes the focal policy and the scenario of this process."""
+    global _worker_policy, _worker_scenario
+    if _worker_scenario is not None:
+        _worker_scenario[1].close()
+        _worker_scenario = None
+    if _worker_policy is not None:
+        _worker_policy.close()
+        _worker_policy = None
+
+
+def evaluate(
+    policy_factory: PolicyFactory,
+    results_path: str,
+    scenario_names: Optional[Collection[str]] = None,
+    num_episodes: int = 1,
+    max_workers: Optional[int] = None,
+) -> Dict[str, float]:
+    """Evaluates a focal policy on scenarios.
+
+  Runs the episodes of each scenario that have no result in results_path, and
+  appends their results to it as they complete.
+
+  Args:
+    policy_factory: builds the focal policy, which plays every focal player of
+      a scenario. It is called once in each worker process, so must be
+      picklable (e.g. a module-level function).
+    results_path: the results file, created if missing.
+    scenario_names: the scenarios to evaluate. Defaults to all of
+      `scenario.AVAILABLE_SCENARIOS`.
+    num_episodes: the number of episodes of each scenario.
+    max_workers: the number of worker processes. Defaults to the number of
+      CPUs. If 0, the episodes are run one at a time in this process.
+
+  Returns:
+    The mean per-capita focal return of each scenario, over all its results.
+
+  Raises:
+    RuntimeError: if any episode failed. The results of the others are still
+      recorded, so evaluating again retries only the failed episodes.
+  """
+    if scenario_names is None:
+        scenario_names = scenario_factory.AVAILABLE_SCENARIOS
+    unknown = set(scenario_names) - scenario_factory.AVAILABLE_SCENARIOS
+    if unknown:
+        raise ValueError(f"Unknown scenarios {sorted(unknown)}.")
+    scenario_names = sorted(scenario_names)
+
+    results = read_results(results_path)
+    tasks = _order_tasks(scenario_names, num_episodes, results)
+    logging.info(
+        "Running %d episodes, %d already have results.",
+        len(tasks),
+        len(scenario_names) * num_episodes - len(tasks),
+    )
+    failed = []
+    with _open_results(results_path) as f:
+        if max_workers == 0:
+            _initialize_worker(policy_factory)
+            try:
+                for task in tasks:
+                    try:
+                        result = _run_episode(*task)
+                    except Exception:  # pylint: disable=broad-except
+                        logging.exception("Episode %s failed.", task)
+                        failed.append(task)
+                        continue
+                    _append_result(f, result)
+                    results.append(result)
+            finally:
+                _close_worker()
+        else:
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_initialize_worker,
+                initargs=(policy_factory,),
+            ) as executor:
+                futures = {
+                    executor.submit(_run_episode, *task): task for task in tasks
+                }
+                for future in concurrent.futures.as_completed(futures):
+                    try:
+                        result = future.result()
+                    except Exception:  # pylint: disable=broad-except
+                        logging.exception("Episode %s failed.", futures[future])
+                        failed.append(futures[future])
+                        continue
+                    _append_result(f, result)
+                    results.append(result)
+
+    if failed:
+        raise RuntimeError(f"{len(failed)} episodes failed: {sorted(failed)}")
+    returns = per_capita_focal_returns(results)
+    return {name: returns[name] for name in scenario_names if name in returns}
+
+
+def _import_policy_factory(path: str) -> PolicyFactory:
+    """Returns the policy factory named by 'package.module:attribute'."""
+    module_name, _, attribute = path.partition(":")
+    if not attribute:
+        raise ValueError(f"Expected 'module:attribute', got {path!r}.")
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--policy",
+        required=True,
+        help="Focal policy factory, as 'package.module:function'",
+    )
+    parser.add_argument(
+        "--results", required=True, help="Results file to append to and resume from"
+    )
+    parser.add_argument(
+        "--scenarios",
+        nargs="+",
+        default=None,
+        choices=sorted(scenario_factory.AVAILABLE_SCENARIOS),
+        help="Scenarios to evaluate (default: all)",
+    )
+    parser.add_argument(
+        "--num_episodes", type=int, default=1, help="Episodes per scenario"
+    )
+    parser.add_argument(
+        "--max_workers",
+        type=int,
+        default=None,
+        help="Number of worker processes (default: number of CPUs)",
+    )
+    args = parser.parse_args()
+
+    returns = evaluate(
+        _import_policy_factory(args.policy),
+        results_path=args.results,
+        scenario_names=args.scenarios,
+        num_episodes=args.num_episodes,
+        max_workers=args.max_workers,
+    )
+    for scenario_name, value in returns.items():
+        print(f"{scenario_name}: {value:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests of evaluation."""
+
+import json
+import os
+import tempfile
+from unittest import mock
+
+from absl.testing import absltest
+
+from meltingpot.python import evaluation
+from meltingpot.python import scenario as scenario_factory
+
+_SCENARIOS = tuple(sorted(scenario_factory.AVAILABLE_SCENARIOS)[:2])
+
+
+def _result(scenario, episode, focal_returns=(1.0, 3.0), seconds=1.0):
+    return evaluation.EpisodeResult(
+        scenario=scenario,
+        episode=episode,
+        focal_returns=focal_returns,
+        num_steps=10,
+        seconds=seconds,
+    )
+
+
+def _fake_run_episode(scenario_name, episode):
+    return _result(scenario_name, episode, focal_returns=(float(episode),))
+
+
+class EvaluationTest(absltest.TestCase):
+    def _results_path(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return os.path.join(directory.name, "results.jsonl")
+
+    def test_read_missing_results(self):
+        self.assertEmpty(evaluation.read_results(self._results_path()))
+
+    def test_read_results_ignores_incomplete_lines(self):
+        path = self._results_path()
+        with open(path, "w") as f:
+            f.write(json.dumps(_result("a", 0)._asdict()) + "\n")
+            f.write('{"scenario": "a", "epis')
+        self.assertEqual(evaluation.read_results(path), [_result("a", 0)])
+
+    def test_per_capita_focal_returns(self):
+        results = [
+            _result("a", 0, focal_returns=(1.0, 3.0)),
+            _result("a", 1, focal_returns=(4.0, 4.0)),
+            _result("a", 1, focal_returns=(0.0, 0.0)),
+            _result("b", 0, focal_returns=(5.0,)),
+        ]
+        self.assertEqual(
+            evaluation.per_capita_focal_returns(results), {"a": 3.0, "b": 5.0}
+        )
+
+    def test_orders_most_expensive_first(self):
+        results = [
+            _result("cheap", 0, seconds=1.0),
+            _result("expensive", 0, seconds=5.0),
+        ]
+        tasks = evaluation._order_tasks(["cheap", "expensive", "new"], 2, results)
+        self.assertEqual(
+            tasks, [("new", 0), ("new", 1), ("expensive", 1), ("cheap", 1)]
+        )
+
+    @mock.patch.object(evaluation, "_run_episode", side_effect=_fake_run_episode)
+    def test_resumes_from_results(self, run_episode):
+        path = self._results_path()
+        with open(path, "w") as f:
+            f.write(json.dumps(_result(_SCENARIOS[0], 0, (0.0,))._asdict()) + "\n")
+            f.write('{"scenario": ')
+        policy_factory = mock.Mock()
+        returns = evaluation.evaluate(
+            policy_factory,
+            results_path=path,
+            scenario_names=_SCENARIOS,
+            num_episodes=2,
+            max_workers=0,
+        )
+
+        with self.subTest("runs_missing_episodes"):
+            self.assertCountEqual(
+                [call.args for call in run_episode.call_args_list],
+                [(_SCENARIOS[0], 1), (_SCENARIOS[1], 0), (_SCENARIOS[1], 1)],
+            )
+        with self.subTest("appends_results"):
+            self.assertLen(evaluation.read_results(path), 4)
+        with self.subTest("returns"):
+            self.assertEqual(returns, {_SCENARIOS[0]: 0.5, _SCENARIOS[1]: 0.5})
+        with self.subTest("closes_policy"):
+            policy_factory.return_value.close.assert_called_once()
+
+    def test_unknown_scenario_raises(self):
+        with self.assertRaises(ValueError):
+            evaluation.evaluate(
+                mock.Mock(), results_path=self._results_path(), scenario_names=["x"]
+            )
+
+
+if __name__ == "__main__":
+    absltest.main()
@@ -0,0 +1,79 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks the time taken to import the substrate and scenario modules.
+
+Each import is timed in a fresh interpreter, so nothing is already loaded.
+Reports the import time, the peak resident memory of the interpreter, and
+whether TensorFlow was imported.
+
+Usage: python import_benchmark.py --repeats=5
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+_MODULES = ("meltingpot.python.substrate", "meltingpot.python.scenario")
+
+_SCRIPT = """
+import importlib
+import json
+import resource
+import sys
+import time
+
+start = time.perf_counter()
+importlib.import_module({module!r})
+seconds = time.perf_counter() - start
+print(json.dumps({{
+    "seconds": seconds,
+    "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    "tensorflow": "tensorflow" in sys.modules,
+}}))
+"""
+
+
+def _measure(module: str):
+    """Returns the measurements of importing module in a fresh interpreter."""
+    output = subprocess.run(
+        [sys.executable, "-c", _SCRIPT.format(module=module)],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--repeats", type=int, default=5, help="Number of imports to time"
+    )
+    args = parser.parse_args()
+
+    for module in _MODULES:
+        results = [_measure(module) for _ in range(args.repeats)]
+        seconds = statistics.median(result["seconds"] for result in results)
+        max_rss_kb = max(result["max_rss_kb"] for result in results)
+        tensorflow = any(result["tensorflow"] for result in results)
+        print(
+            f"{module}: {seconds:.3f} s (median), {max_rss_kb / 1024:.0f} MiB "
+            f"max RSS, TensorFlow imported: {tensorflow}"
+        )
+
+
+if __name__ == "__main__":
+    main()
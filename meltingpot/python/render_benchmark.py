@@ -0,0 +1,122 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks the time taken to render observations against the player count.
+
+Steps each substrate with uniformly random actions, first computing no
+observations, then only each player's RGB, then each player's RGB and SYMBOLIC,
+then only WORLD.RGB, and then only each player's RGB again with the views cropped
+from the image of the map (see `crop_render.enable`). Reports the time each of
+those adds to a step, in total and per player, with the substrates ordered by
+their number of players. Episodes are reset as they end, but resets are not
+timed.
+
+Usage: python render_benchmark.py --substrates clean_up commons_harvest_open
+"""
+
+import argparse
+import time
+from typing import Collection
+
+from ml_collections import config_dict
+import numpy as np
+
+from meltingpot.python import substrate
+from meltingpot.python.utils.substrates import crop_render
+
+_DEFAULT_SUBSTRATES = (
+    "running_with_scissors_in_the_matrix",
+    "collaborative_cooking_passable",
+    "clean_up",
+    "territory_rooms",
+    "commons_harvest_open",
+    "allelopathic_harvest",
+)
+
+
+def _with_symbolic(config: config_dict.ConfigDict) -> config_dict.ConfigDict:
+    """Returns a copy of config that also provides SYMBOLIC observations."""
+    config = config.copy_and_resolve_references()
+    with config.unlocked():
+        config.individual_observation_names = list(
+            config.individual_observation_names
+        ) + ["SYMBOLIC"]
+    return config
+
+
+def _measure(
+    config: config_dict.ConfigDict,
+    observations: Collection[str],
+    num_steps: int,
+    seed: int,
+) -> float:
+    """Returns the mean time in seconds of a step computing observations."""
+    rng = np.random.default_rng(seed)
+    with substrate.build(config, observations=observations) as env:
+        num_actions = [spec.num_values for spec in env.action_spec()]
+        timestep = env.reset()
+        seconds = 0.0
+        for _ in range(num_steps):
+            if timestep.last():
+                timestep = env.reset()
+            actions = [rng.integers(n) for n in num_actions]
+            start = time.perf_counter()
+            timestep = env.step(actions)
+            seconds += time.perf_counter() - start
+    return seconds / num_steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--substrates",
+        nargs="+",
+        default=_DEFAULT_SUBSTRATES,
+        choices=sorted(substrate.AVAILABLE_SUBSTRATES),
+        help="Substrates to benchmark",
+    )
+    parser.add_argument(
+        "--num_steps", type=int, default=1000, help="Number of steps to time"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the actions")
+    args = parser.parse_args()
+
+    configs = [_with_symbolic(substrate.get_config(name)) for name in args.substrates]
+    print(
+        "players  RGB ms (per player)  +SYMBOLIC ms (per player)  WORLD.RGB ms"
+        "  cropped RGB ms (per player)"
+    )
+    for name, config in sorted(
+        zip(args.substrates, configs), key=lambda item: item[1].num_players
+    ):
+        seconds = {
+            observations: _measure(config, observations, args.num_steps, args.seed)
+            for observations in ((), ("RGB",), ("RGB", "SYMBOLIC"), ("WORLD.RGB",))
+        }
+        cropped_config = crop_render.enable(config)
+        cropped = _measure(cropped_config, ("RGB",), args.num_steps, args.seed)
+        num_players = config.num_players
+        rgb = seconds[("RGB",)] - seconds[()]
+        symbolic = seconds[("RGB", "SYMBOLIC")] - seconds[("RGB",)]
+        world = seconds[("WORLD.RGB",)] - seconds[()]
+        crop = cropped - seconds[()]
+        print(
+            f"{num_players:7d}  {rgb * 1e3:6.3f} ({rgb / num_players * 1e3:.3f})"
+            f"         {symbolic * 1e3:6.3f} ({symbolic / num_players * 1e3:.3f})"
+            f"               {world * 1e3:6.3f}"
+            f"  {crop * 1e3:6.3f} ({crop / num_players * 1e3:.3f})  {name}"
+        )
+
+
+if __name__ == "__main__":
+    main()
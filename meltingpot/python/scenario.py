@@ -13,17 +13,20 @@
 # limitations under the License.
 """Scenario factory."""
 
-import concurrent
+import concurrent.futures
 import random
 from typing import (
-    Callable,
     Collection,
+    Dict,
     Iterable,
     List,
     Mapping,
+    Optional,
     Sequence,
+    Set,
     Tuple,
     TypeVar,
+    Union,
 )
 
 from absl import logging
@@ -37,6 +40,9 @@ from meltingpot.python.utils.scenarios.wrappers import agent_slot_wrapper
 from meltingpot.python.utils.scenarios.wrappers import all_observations_wrapper
 from meltingpot.python.utils.scenarios.wrappers import base
 from meltingpot.python.utils.scenarios.wrappers import default_observation_wrapper
+from meltingpot.python.utils.scenarios.wrappers import fused_wrapper
+from meltingpot.python.utils.substrates import builder
+from meltingpot.python.utils.substrates.wrappers import multiplayer_wrapper
 
 AVAILABLE_SCENARIOS = frozenset(scenario_config.SCENARIOS)
 
@@ -49,6 +55,7 @@ PERMITTED_OBSERVATIONS = frozenset(
         "INVENTORY",
         "READY_TO_SHOOT",
         "RGB",
+        "SYMBOLIC",
         "WORLD.RGB",
         "LAYER",
         "POSITION",
@@ -57,26 +64,13 @@ PERMITTED_OBSERVATIONS = frozenset(
     }
 )
 
-T = TypeVar("T")
-
-
-def _step_fn(policy: bot_factory.Policy) -> Callable[[dm_env.TimeStep], int]:
-    """Returns a stateful step function where the state is encapsulated.
-
-  Args:
-    policy: the underlying policy to use.
-
-  Returns:
-    A step function that returns an action in response to a timestep.
-  """
-    state = policy.initial_state()
+# Observations of all players that are shared with bots.
+_SHARED_OBSERVATIONS = ("POSITION",)
 
-    def step(timestep: dm_env.TimeStep) -> int:
-        nonlocal state
-        action, state = policy.step(timestep=timestep, prev_state=state)
-        return action
+T = TypeVar("T")
 
-    return step
+# A bot, or a future resolving to one once it is loaded.
+BotOrFuture = Union[bot_factory.Policy, "concurrent.futures.Future[bot_factory.Policy]"]
 
 
 def _restrict_observation(
@@ -121,27 +115,53 @@ def _merge(
     return [next(focal_values if focal else background_values) for focal in is_focal]
 
 
+def _as_future(bot: BotOrFuture) -> "concurrent.futures.Future[bot_factory.Policy]":
+    """Returns bot if it is a future, or a future resolved to it otherwise."""
+    if isinstance(bot, concurrent.futures.Future):
+        return bot
+    future = concurrent.futures.Future()
+    future.set_result(bot)
+    return future
+
+
+def _close_bots(
+    bots: Mapping[str, "concurrent.futures.Future[bot_factory.Policy]"]
+) -> None:
+    """Closes bots, waiting for those still loading and cancelling the rest."""
+    for future in bots.values():
+        future.cancel()
+    for future in bots.values():
+        if not future.cancelled() and future.exception() is None:
+            future.result().close()
+
+
 class Scenario(base.Wrapper):
     """An substrate where a number of player slots are filled by bots."""
 
     def __init__(
         self,
         substrate,
-        bots: Mapping[str, bot_factory.Policy],
+        bots: Mapping[str, BotOrFuture],
         is_focal: Sequence[bool],
         permitted_observations: Collection[str] = PERMITTED_OBSERVATIONS,
+        warmup_observation_spec: Optional[Mapping[str, dm_env.specs.Array]] = None,
     ) -> None:
         """Initializes the scenario.
 
     Args:
       substrate: the substrate to add bots to.
-      bots: the bots to sample from (with replacement) each episode.
+      bots: the bots to sample from (with replacement) each episode. Each is a
+        policy, or a future resolving to one (e.g. while it loads). Reset only
+        waits for the bots sampled for the episode.
       is_focal: which player slots are allocated to focal players.
       permitted_observations: the observations exposed by the scenario to focal
         agents.
+      warmup_observation_spec: if given, each sampled bot is warmed up (see
+        `Policy.warmup`) on this spec for the number of slots it fills, the
+        first time it is sampled for that number.
     """
         super().__init__(substrate)
-        self._bots = dict(bots)
+        self._bots = {name: _as_future(bot) for name, bot in bots.items()}
         num_players = len(substrate.action_spec())
         if len(is_focal) != num_players:
             raise ValueError(
@@ -155,36 +175,90 @@ class Scenario(base.Wrapper):
         self._executor = concurrent.futures.ThreadPoolExecutor(
             max_workers=self._num_bots
         )
-        self._bot_step_fns: List[Callable[[dm_env.TimeStep], int]] = []
-        self._action_futures: List[concurrent.futures.Future] = []
+        # The sampled bots, the background player slots using each of them, and
+        # their states.
+        self._active_bots: Dict[str, bot_factory.Policy] = {}
+        self._bot_slots: Dict[str, List[int]] = {}
+        self._bot_states: List[bot_factory.State] = []
+        self._action_futures: Dict[str, concurrent.futures.Future] = {}
+        self._warmup_observation_spec = warmup_observation_spec
+        # The batch sizes each bot has been warmed up for.
+        self._warm_batch_sizes: Dict[str, Set[int]] = {}
 
     def close(self):
         """See base class."""
-        for bot in self._bots.values():
-            bot.close()
+        _close_bots(self._bots)
         self._executor.shutdown(wait=False)
         super().close()
 
     def _resample_bots(self):
         """Resamples the currently active bots."""
         sampled_names = random.choices(tuple(self._bots), k=self._num_bots)
-        logging.info("Resampled bots: {sampled_bot_names}")
-        self._bot_step_fns = [_step_fn(self._bots[name]) for name in sampled_names]
-        for future in self._action_futures:
+        logging.info("Resampled bots: %s", sampled_names)
+        self._bot_slots = {}
+        for slot, name in enumerate(sampled_names):
+            self._bot_slots.setdefault(name, []).append(slot)
+        # Bots that were not sampled may still be loading.
+        self._active_bots = {
+            name: self._bots[name].result() for name in self._bot_slots
+        }
+        self._bot_states = [
+            self._active_bots[name].initial_state() for name in sampled_names
+        ]
+        for future in self._action_futures.values():
             future.cancel()
+        # Bots may read shared observation buffers that the next reset overwrites.
+        concurrent.futures.wait(self._action_futures.values())
         self._action_futures.clear()
+        if self._warmup_observation_spec is not None:
+            self._warmup_bots()
+
+    def _warmup_bots(self) -> None:
+        """Warms up the active bots for batch sizes they were not warmed for.
+
+    Bots are batched by name, so each is only stepped in batches of the number
+    of slots it was sampled for.
+    """
+        futures = []
+        for name, slots in self._bot_slots.items():
+            warm_batch_sizes = self._warm_batch_sizes.setdefault(name, set())
+            if len(slots) not in warm_batch_sizes:
+                warm_batch_sizes.add(len(slots))
+                futures.append(
+                    self._executor.submit(
+                        self._active_bots[name].warmup,
+                        self._warmup_observation_spec,
+                        [len(slots)],
+                    )
+                )
+        for future in futures:
+            future.result()
 
     def _send_timesteps(self, timesteps: Sequence[dm_env.TimeStep]) -> None:
-        """Sends timesteps to bots for asynchronous processing."""
+        """Sends timesteps to bots for asynchronous processing.
+
+    All slots filled by the same bot are stepped together in a single batch.
+    """
         assert not self._action_futures
-        for bot_step, timestep in zip(self._bot_step_fns, timesteps):
-            future = self._executor.submit(bot_step, timestep=timestep)
-            self._action_futures.append(future)
+        for name, slots in self._bot_slots.items():
+            future = self._executor.submit(
+                self._active_bots[name].step_batch,
+                timesteps=[timesteps[slot] for slot in slots],
+                prev_states=[self._bot_states[slot] for slot in slots],
+            )
+            self._action_futures[name] = future
 
     def _await_actions(self) -> Sequence[int]:
         """Waits for the bots actions form the last timestep sent."""
         assert self._action_futures
-        actions = [future.result() for future in self._action_futures]
+        actions = [None] * self._num_bots
+        for name, future in self._action_futures.items():
+            bot_actions, bot_states = future.result()
+            for slot, action, state in zip(
+                self._bot_slots[name], bot_actions, bot_states
+            ):
+                actions[slot] = action
+                self._bot_states[slot] = state
         self._action_futures.clear()
         return actions
 
@@ -202,6 +276,12 @@ class Scenario(base.Wrapper):
                 agent_observations, self._permitted_observations
             ),
         )
+        if isinstance(timestep, multiplayer_wrapper.TimeStep):
+            agent_timestep = agent_timestep._replace(
+                global_observation=_restrict_observation(
+                    timestep.global_observation, self._permitted_observations
+                )
+            )
         bot_timesteps = [
             timestep._replace(observation=observation, reward=reward)
             for observation, reward in zip(bot_observations, bot_rewards)
@@ -240,6 +320,12 @@ class Scenario(base.Wrapper):
             agent_observation_spec, self._permitted_observations
         )
 
+    def global_observation_spec(self) -> Mapping[str, dm_env.specs.Array]:
+        """See base class."""
+        return _restrict_observation(
+            super().global_observation_spec(), self._permitted_observations
+        )
+
     def reward_spec(self) -> Sequence[dm_env.specs.Array]:
         """See base class."""
         # TODO(b/192925212): better typing to avoid pytype disables.
@@ -273,35 +359,190 @@ def get_config(scenario_name: str) -> config_dict.ConfigDict:
     return config.lock()
 
 
-def build(config: config_dict.ConfigDict) -> Scenario:
+def _substrate_observations(
+    config: config_dict.ConfigDict, focal_observations: Collection[str]
+) -> Collection[str]:
+    """Returns the substrate observations needed by the players of a scenario.
+
+  Bots were trained on the individual observations of their substrate, so these
+  are always computed when there are bots. Focal players only need their
+  permitted observations. Shared observations are always computed.
+
+  Args:
+    config: config resulting from `get_config`.
+    focal_observations: the observations of focal players.
+  """
+    substrate_config = config.substrate
+    provided = set(substrate_config.individual_observation_names) | set(
+        substrate_config.global_observation_names
+    )
+    needed = provided & set(focal_observations)
+    needed.update(_SHARED_OBSERVATIONS)
+    if not all(config.is_focal):
+        needed.update(substrate_config.individual_observation_names)
+    return needed
+
+
+def _build_fast_substrate(
+    config: config_dict.ConfigDict,
+    separate_global_observations: bool,
+    observations: Collection[str],
+) -> base.Substrate:
+    """Builds the substrate of a scenario with a fused wrapper stack."""
+    individual_names, global_names = substrate_factory.get_observation_names(
+        config, observations
+    )
+    return fused_wrapper.Wrapper(
+        builder.builder(
+            **config,
+            observation_names=substrate_factory.get_lab2d_observation_names(
+                config, individual_names, global_names
+            ),
+        ),
+        individual_observation_names=individual_names,
+        global_observation_names=global_names,
+        action_table=config.action_set,
+        observations_to_share=_SHARED_OBSERVATIONS,
+        share_actions=True,
+        default_observations={"INVENTORY": np.zeros([1])},
+        separate_global_observations=separate_global_observations,
+    )
+
+
+def _load_bots(
+    bot_configs: Mapping[str, config_dict.ConfigDict]
+) -> Mapping[str, "concurrent.futures.Future[bot_factory.Policy]"]:
+    """Starts building bots concurrently, returning a future for each one."""
+    executor = concurrent.futures.ThreadPoolExecutor(
+        max_workers=max(len(bot_configs), 1), thread_name_prefix="BotLoader"
+    )
+    bots = {
+        name: executor.submit(bot_factory.build, bot_config)
+        for name, bot_config in bot_configs.items()
+    }
+    # Submitted bots are still built.
+    executor.shutdown(wait=False)
+    return bots
+
+
+def _wait_for_bots(
+    bots: Mapping[str, "concurrent.futures.Future[bot_factory.Policy]"]
+) -> Mapping[str, bot_factory.Policy]:
+    """Returns the built bots, closing them all if any failed to build."""
+    concurrent.futures.wait(bots.values())
+    for future in bots.values():
+        if future.exception() is not None:
+            _close_bots(bots)
+            raise future.exception()
+    return {name: future.result() for name, future in bots.items()}
+
+
+def build(
+    config: config_dict.ConfigDict,
+    separate_global_observations: bool = False,
+    fast: bool = False,
+    observations: Optional[Collection[str]] = None,
+    lazy_bots: bool = False,
+    warmup_bots: bool = False,
+) -> Scenario:
     """Builds a scenario for the given config.
 
   Args:
     config: config resulting from `get_config`.
+    separate_global_observations: if True, global observations (e.g. WORLD.RGB)
+      are returned once per timestep in the `global_observation` field of a
+      `multiplayer_wrapper.TimeStep` instead of in each player's observations.
+    fast: if True, the wrappers between the substrate and the scenario are
+      replaced by a single `fused_wrapper.Wrapper` that reuses preallocated
+      containers. Timesteps are the same, but their containers are updated in
+      place by the next reset or step, so copy anything that needs to be kept.
+    observations: the observations of focal players, from
+      PERMITTED_OBSERVATIONS. Only these and the observations needed by bots
+      are computed by the substrate, so e.g. leaving out "WORLD.RGB" saves
+      rendering it. If None, all permitted observations are returned.
+    lazy_bots: if True, returns without waiting for the bots to load. They load
+      in the background, and each reset only waits for the bots sampled for its
+      episode. Otherwise, returns once all the bots are loaded (or raises if one
+      fails to load). Either way, the bots are loaded concurrently with each
+      other and with the substrate.
+    warmup_bots: if True, each reset warms up (see `Policy.warmup`) the bots
+      sampled for the episode, for the number of slots each fills, unless they
+      were already warmed up for it. Stepping bots is then no slower on the
+      first step than on later ones.
 
   Returns:
     The test scenario.
+
+  Raises:
+    ValueError: if observations includes names that are not permitted.
   """
-    substrate = substrate_factory.build(config.substrate)
-    bots = {
-        bot_name: bot_factory.build(bot_config)
-        for bot_name, bot_config in config.bots.items()
-    }
+    if observations is None:
+        focal_observations = PERMITTED_OBSERVATIONS
+    else:
+        focal_observations = frozenset(observations)
+        if not focal_observations <= PERMITTED_OBSERVATIONS:
+            raise ValueError(
+                "Observations "
+                f"{sorted(focal_observations - PERMITTED_OBSERVATIONS)} are not "
+                f"permitted. Permitted observations are "
+                f"{sorted(PERMITTED_OBSERVATIONS)}."
+            )
+    substrate_observations = _substrate_observations(config, focal_observations)
 
-    # Add observations needed by some bots. These are removed for focal players.
-    substrate = all_observations_wrapper.Wrapper(
-        substrate, observations_to_share=["POSITION"], share_actions=True
-    )
-    substrate = agent_slot_wrapper.Wrapper(substrate)
-    add_inventory = "INVENTORY" not in substrate.observation_spec()[0]
-    if add_inventory:
-        substrate = default_observation_wrapper.Wrapper(
-            substrate, key="INVENTORY", default_value=np.zeros([1])
+    bots = _load_bots(config.bots)
+    try:
+        substrate = _build_scenario_substrate(
+            config, separate_global_observations, fast, substrate_observations
         )
-
+    except BaseException:
+        _close_bots(bots)
+        raise
+    warmup_observation_spec = None
+    if warmup_bots and not all(config.is_focal):
+        _, bot_observation_specs = _partition(
+            substrate.observation_spec(), config.is_focal
+        )
+        warmup_observation_spec = bot_observation_specs[0]
+    if not lazy_bots:
+        bots = _wait_for_bots(bots)
     return Scenario(
         substrate=substrate,
         bots=bots,
         is_focal=config.is_focal,
-        permitted_observations=PERMITTED_OBSERVATIONS,
+        permitted_observations=focal_observations,
+        warmup_observation_spec=warmup_observation_spec,
     )
+
+
+def _build_scenario_substrate(
+    config: config_dict.ConfigDict,
+    separate_global_observations: bool,
+    fast: bool,
+    substrate_observations: Collection[str],
+) -> base.Substrate:
+    """Returns the substrate of a scenario, with the observations of its bots."""
+    if fast:
+        substrate = _build_fast_substrate(
+            config.substrate, separate_global_observations, substrate_observations
+        )
+    else:
+        substrate = substrate_factory.build(
+            config.substrate,
+            separate_global_observations=separate_global_observations,
+            observations=substrate_observations,
+        )
+        # Add observations needed by some bots. These are removed for focal
+        # players.
+        substrate = all_observations_wrapper.Wrapper(
+            substrate,
+            observations_to_share=_SHARED_OBSERVATIONS,
+            share_actions=True,
+            read_only=True,
+        )
+        substrate = agent_slot_wrapper.Wrapper(substrate)
+        add_inventory = "INVENTORY" not in substrate.observation_spec()[0]
+        if add_inventory:
+            substrate = default_observation_wrapper.Wrapper(
+                substrate, key="INVENTORY", default_value=np.zeros([1])
+            )
+    return substrate
@@ -13,7 +13,11 @@
 # limitations under the License.
 """Tests of bots."""
 
+import concurrent.futures
+import functools
 import random
+import subprocess
+import sys
 from unittest import mock
 
 from absl.testing import absltest
@@ -24,6 +28,7 @@ import immutabledict
 from meltingpot.python import bot as bot_factory
 from meltingpot.python import scenario as scenario_factory
 from meltingpot.python import substrate as substrate_factory
+from meltingpot.python.utils.substrates.wrappers import multiplayer_wrapper
 
 
 class ScenarioTest(parameterized.TestCase):
@@ -37,6 +42,79 @@ class ScenarioTest(parameterized.TestCase):
             scenario.reset()
             scenario.step([0] * num_players)
 
+    def test_fast_matches_specs(self):
+        scenario_config = scenario_factory.get_config("clean_up_0")
+        num_players = scenario_config.num_players
+        with scenario_factory.build(scenario_config) as scenario:
+            expected_observation_spec = scenario.observation_spec()
+            expected_action_spec = scenario.action_spec()
+        with scenario_factory.build(scenario_config, fast=True) as scenario:
+            observation_spec = scenario.observation_spec()
+            action_spec = scenario.action_spec()
+            scenario.reset()
+            scenario.step([0] * num_players)
+
+        with self.subTest("observation_spec"):
+            self.assertEqual(observation_spec, expected_observation_spec)
+        with self.subTest("action_spec"):
+            self.assertEqual(action_spec, expected_action_spec)
+
+    @parameterized.parameters(False, True)
+    def test_observations_restrict_focal_players(self, fast):
+        scenario_config = scenario_factory.get_config("clean_up_0")
+        num_players = scenario_config.num_players
+        with scenario_factory.build(
+            scenario_config, fast=fast, observations=["RGB", "READY_TO_SHOOT"]
+        ) as scenario:
+            observation_spec = scenario.observation_spec()
+            scenario.reset()
+            timestep, _ = scenario.step([0] * num_players)
+
+        with self.subTest("observation_spec"):
+            for spec in observation_spec:
+                self.assertCountEqual(spec, ["RGB", "READY_TO_SHOOT"])
+        with self.subTest("observations"):
+            for observation in timestep.observation:
+                self.assertCountEqual(observation, ["RGB", "READY_TO_SHOOT"])
+
+    def test_unpermitted_observations_raise(self):
+        scenario_config = scenario_factory.get_config("clean_up_0")
+        with self.assertRaises(ValueError):
+            scenario_factory.build(scenario_config, observations=["RGB", "REWARD"])
+
+    @parameterized.parameters(False, True)
+    def test_warmup_bots(self, lazy_bots):
+        scenario_config = scenario_factory.get_config("clean_up_0")
+        num_players = scenario_config.num_players
+        with scenario_factory.build(
+            scenario_config, lazy_bots=lazy_bots, warmup_bots=True
+        ) as scenario:
+            scenario.reset()
+            scenario.step([0] * num_players)
+
+    def test_lazy_bots(self):
+        scenario_config = scenario_factory.get_config("clean_up_0")
+        num_players = scenario_config.num_players
+        with scenario_factory.build(scenario_config, lazy_bots=True) as scenario:
+            scenario.reset()
+            scenario.step([0] * num_players)
+            scenario.reset()
+            scenario.step([0] * num_players)
+
+
+class ImportTest(absltest.TestCase):
+    def test_does_not_import_tensorflow(self):
+        # Run in a fresh interpreter, as this test process may have imported it.
+        script = (
+            "import sys\n"
+            "from meltingpot.python import scenario\n"
+            "print('tensorflow' in sys.modules)\n"
+        )
+        output = subprocess.run(
+            [sys.executable, "-c", script], check=True, capture_output=True, text=True
+        ).stdout
+        self.assertEqual(output.strip(), "False")
+
 
 @parameterized.parameters(
     ([], [], [], []),
@@ -90,6 +168,9 @@ class ScenarioWrapperTest(absltest.TestCase):
             bot = mock.Mock(spec_set=bot_factory.Policy)
             bot.initial_state.return_value = f"bot_state_{n}"
             bot.step.return_value = (n + 10, f"bot_state_{n}")
+            bot.step_batch.side_effect = functools.partial(
+                bot_factory.Policy.step_batch, bot
+            )
             bots[f"bot_{n}"] = bot
 
         with scenario_factory.Scenario(
@@ -158,6 +239,149 @@ class ScenarioWrapperTest(absltest.TestCase):
             )
             self.assertEqual(actual, expected)
 
+    def test_bots_sharing_a_policy_are_batched(self):
+        substrate = mock.Mock(spec_set=substrate_factory.Substrate)
+        substrate.reset.return_value = dm_env.restart(
+            observation=(dict(ok=10), dict(ok=20), dict(ok=30))
+        )._replace(reward=(10, 20, 30))
+        substrate.step.return_value = dm_env.transition(
+            reward=(11, 21, 31), observation=(dict(ok=11), dict(ok=21), dict(ok=31)),
+        )
+        substrate.action_spec.return_value = tuple(f"action_spec_{n}" for n in range(3))
+        bot = mock.Mock(spec_set=bot_factory.Policy)
+        bot.initial_state.return_value = "initial_state"
+        bot.step_batch.return_value = ([5, 6], ["state_1", "state_2"])
+
+        with scenario_factory.Scenario(
+            substrate,
+            {"bot": bot},
+            is_focal=[False, True, False],
+            permitted_observations={"ok"},
+        ) as scenario:
+            scenario.reset()
+            scenario.step([0])
+            scenario.step([0])
+
+        with self.subTest(name="substrate_step"):
+            substrate.step.assert_called_with([5, 0, 6])
+        with self.subTest(name="first_step_batch"):
+            actual = bot.step_batch.call_args_list[0]
+            expected = mock.call(
+                timesteps=[
+                    dm_env.restart(observation=dict(ok=10))._replace(reward=10),
+                    dm_env.restart(observation=dict(ok=30))._replace(reward=30),
+                ],
+                prev_states=["initial_state", "initial_state"],
+            )
+            self.assertEqual(actual, expected)
+        with self.subTest(name="second_step_batch"):
+            actual = bot.step_batch.call_args_list[1]
+            expected = mock.call(
+                timesteps=[
+                    dm_env.transition(reward=11, observation=dict(ok=11)),
+                    dm_env.transition(reward=31, observation=dict(ok=31)),
+                ],
+                prev_states=["state_1", "state_2"],
+            )
+            self.assertEqual(actual, expected)
+
+    def test_reset_waits_only_for_sampled_bots(self):
+        substrate = mock.Mock(spec_set=substrate_factory.Substrate)
+        substrate.reset.return_value = dm_env.restart(
+            observation=(dict(ok=10), dict(ok=20))
+        )._replace(reward=(10, 20))
+        substrate.step.return_value = dm_env.transition(
+            reward=(11, 21), observation=(dict(ok=11), dict(ok=21)),
+        )
+        substrate.action_spec.return_value = ("action_spec_0", "action_spec_1")
+        loaded_bot = mock.Mock(spec_set=bot_factory.Policy)
+        loaded_bot.step_batch.return_value = ([5], ["state"])
+        loading_bot = concurrent.futures.Future()
+
+        scenario = scenario_factory.Scenario(
+            substrate,
+            {"loaded": loaded_bot, "loading": loading_bot},
+            is_focal=[False, True],
+            permitted_observations={"ok"},
+        )
+        with mock.patch.object(random, "choices", return_value=["loaded"]):
+            scenario.reset()
+        scenario.step([0])
+        late_bot = mock.Mock(spec_set=bot_factory.Policy)
+        loading_bot.set_result(late_bot)
+        scenario.close()
+
+        with self.subTest(name="substrate_step"):
+            substrate.step.assert_called_with([5, 0])
+        with self.subTest(name="closed"):
+            loaded_bot.close.assert_called_once()
+            late_bot.close.assert_called_once()
+
+    def test_warms_up_bots_for_their_slot_counts(self):
+        substrate = mock.Mock(spec_set=substrate_factory.Substrate)
+        substrate.reset.return_value = dm_env.restart(
+            observation=tuple(dict(ok=n) for n in range(4))
+        )._replace(reward=(0, 0, 0, 0))
+        substrate.action_spec.return_value = tuple(f"action_spec_{n}" for n in range(4))
+        bots = {name: mock.Mock(spec_set=bot_factory.Policy) for name in ("a", "b")}
+
+        with scenario_factory.Scenario(
+            substrate,
+            bots,
+            is_focal=[True, False, False, False],
+            permitted_observations={"ok"},
+            warmup_observation_spec="spec",
+        ) as scenario:
+            for names in (["a", "b", "a"], ["a", "a", "a"], ["b", "a", "a"]):
+                with mock.patch.object(random, "choices", return_value=names):
+                    scenario.reset()
+
+        with self.subTest(name="a"):
+            self.assertEqual(
+                bots["a"].warmup.call_args_list,
+                [mock.call("spec", [2]), mock.call("spec", [3])],
+            )
+        with self.subTest(name="b"):
+            self.assertEqual(bots["b"].warmup.call_args_list, [mock.call("spec", [1])])
+
+    def test_separate_global_observations(self):
+        substrate = mock.Mock(spec_set=substrate_factory.Substrate)
+        substrate.reset.return_value = multiplayer_wrapper.TimeStep(
+            step_type=dm_env.StepType.FIRST,
+            discount=0,
+            reward=(10, 20),
+            observation=(dict(ok=10), dict(ok=20)),
+            global_observation=dict(ok=0, not_ok=1),
+        )
+        substrate.action_spec.return_value = tuple(f"action_spec_{n}" for n in range(2))
+        substrate.global_observation_spec.return_value = dict(
+            ok="ok_spec", not_ok="not_ok_spec"
+        )
+        bot = mock.Mock(spec_set=bot_factory.Policy)
+        bot.initial_state.return_value = "initial_state"
+        bot.step_batch.return_value = ([5], ["state"])
+
+        with scenario_factory.Scenario(
+            substrate, {"bot": bot}, is_focal=[True, False], permitted_observations={"ok"},
+        ) as scenario:
+            global_observation_spec = scenario.global_observation_spec()
+            timestep, _ = scenario.reset()
+
+        with self.subTest(name="global_observation_spec"):
+            self.assertEqual(global_observation_spec, dict(ok="ok_spec"))
+        with self.subTest(name="timestep"):
+            expected = multiplayer_wrapper.TimeStep(
+                step_type=dm_env.StepType.FIRST,
+                discount=0,
+                reward=[10],
+                observation=[dict(ok=10)],
+                global_observation=dict(ok=0),
+            )
+            self.assertEqual(timestep, expected)
+        with self.subTest(name="bot_timestep"):
+            (bot_timestep,) = bot.step_batch.call_args.kwargs["timesteps"]
+            self.assertEqual(bot_timestep.global_observation, dict(ok=0, not_ok=1))
+
 
 if __name__ == "__main__":
     absltest.main()
@@ -13,13 +13,17 @@
 # limitations under the License.
 """Substrate builder."""
 
-from typing import Mapping, Sequence
+import functools
+from typing import Collection, Mapping, Optional, Sequence, Tuple
 
 import dm_env
 from ml_collections import config_dict
+import numpy as np
 
 from meltingpot.python.configs import substrates as substrate_configs
 from meltingpot.python.utils.substrates import builder
+from meltingpot.python.utils.substrates import process_substrate
+from meltingpot.python.utils.substrates import vector_substrate
 from meltingpot.python.utils.substrates.wrappers import base
 from meltingpot.python.utils.substrates.wrappers import discrete_action_wrapper
 from meltingpot.python.utils.substrates.wrappers import multiplayer_wrapper
@@ -42,6 +46,10 @@ class Substrate(base.Wrapper):
         """See base class."""
         return self._env.action_spec()
 
+    def global_observation_spec(self) -> Mapping[str, dm_env.specs.Array]:
+        """See base class."""
+        return self._env.global_observation_spec()
+
 
 def get_config(substrate_name: str) -> config_dict.ConfigDict:
     """Returns the configs for the substrate.
@@ -54,20 +62,192 @@ def get_config(substrate_name: str) -> config_dict.ConfigDict:
     return substrate_configs.get_config(substrate_name).lock()
 
 
-def build(config: config_dict.ConfigDict) -> Substrate:
+def get_observation_names(
+    config: config_dict.ConfigDict, observations: Optional[Collection[str]] = None
+) -> Tuple[Sequence[str], Sequence[str]]:
+    """Returns the individual and global observation names to compute.
+
+  Args:
+    config: config resulting from `get_config`.
+    observations: the observations to compute, or None for all of them.
+
+  Returns:
+    The names in `config.individual_observation_names` and
+    `config.global_observation_names` that are in observations.
+
+  Raises:
+    ValueError: if observations includes names the substrate does not provide.
+  """
+    individual_names = list(config.individual_observation_names)
+    global_names = list(config.global_observation_names)
+    if observations is None:
+        return individual_names, global_names
+    unknown = set(observations) - set(individual_names) - set(global_names)
+    if unknown:
+        raise ValueError(
+            f"Unknown observations {sorted(unknown)}. The substrate provides "
+            f"{individual_names + global_names}."
+        )
+    return (
+        [name for name in individual_names if name in observations],
+        [name for name in global_names if name in observations],
+    )
+
+
+def get_lab2d_observation_names(
+    config: config_dict.ConfigDict,
+    individual_observation_names: Sequence[str],
+    global_observation_names: Sequence[str],
+) -> Sequence[str]:
+    """Returns the names to pass to `builder.builder` to compute observations.
+
+  Args:
+    config: config resulting from `get_config`.
+    individual_observation_names: the individual observations to compute.
+    global_observation_names: the global observations to compute.
+
+  Returns:
+    The Lab2d names of the observations (e.g. "1.RGB") and of the rewards.
+  """
+    player_names = ["REWARD", *individual_observation_names]
+    num_players = int(config.lab2d_settings.numPlayers)
+    return [
+        f"{player_index + 1}.{name}"
+        for player_index in range(num_players)
+        for name in player_names
+    ] + list(global_observation_names)
+
+
+def build(
+    config: config_dict.ConfigDict,
+    separate_global_observations: bool = False,
+    observations: Optional[Collection[str]] = None,
+) -> Substrate:
     """Builds the substrate given the config.
 
+  Only the observations of the substrate are computed by Lab2d each step, so
+  e.g. debug layers and metric reporters cost nothing unless a config names
+  them. Dropping observations that are not needed (e.g. "WORLD.RGB" when
+  training) saves rendering them.
+
   Args:
     config: config resulting from `get_config`.
+    separate_global_observations: if True, global observations (e.g. WORLD.RGB)
+      are returned once per timestep in the `global_observation` field of a
+      `multiplayer_wrapper.TimeStep` instead of in each player's observations.
+    observations: the observations to compute, from
+      `config.individual_observation_names` and
+      `config.global_observation_names`. If None, all of them are computed.
 
   Returns:
     The training substrate.
   """
-    env = builder.builder(**config)
+    individual_names, global_names = get_observation_names(config, observations)
+    env = builder.builder(
+        **config,
+        observation_names=get_lab2d_observation_names(
+            config, individual_names, global_names
+        ),
+    )
     env = multiplayer_wrapper.Wrapper(
         env,
-        individual_observation_names=config.individual_observation_names,
-        global_observation_names=config.global_observation_names,
+        individual_observation_names=individual_names,
+        global_observation_names=global_names,
+        separate_global_observations=separate_global_observations,
     )
     env = discrete_action_wrapper.Wrapper(env, action_table=config.action_set)
     return Substrate(env)
+
+
+def build_in_subprocess(
+    config: config_dict.ConfigDict,
+    separate_global_observations: bool = False,
+    observations: Optional[Collection[str]] = None,
+) -> process_substrate.ProcessSubstrate:
+    """Builds the substrate in a worker process.
+
+  Observations are passed back through shared memory rather than pickled. The
+  observations in each timestep are read-only views that are overwritten by the
+  next call to `reset` or `step`.
+
+  Args:
+    config: config resulting from `get_config`.
+    separate_global_observations: see `build`.
+    observations: see `build`.
+
+  Returns:
+    The substrate, running in a worker process.
+  """
+    return process_substrate.ProcessSubstrate(
+        functools.partial(
+            build,
+            config,
+            separate_global_observations=separate_global_observations,
+            observations=observations,
+        )
+    )
+
+
+def _vector_configs(
+    config: config_dict.ConfigDict, num_envs: int
+) -> Sequence[config_dict.ConfigDict]:
+    """Returns the config of each copy in a vector substrate.
+
+  If config sets an env_seed, each copy is given a distinct seed derived from it
+  so that copies do not play identical episodes.
+
+  Args:
+    config: config resulting from `get_config`.
+    num_envs: the number of copies.
+  """
+    env_seed = config.get("env_seed")
+    if env_seed is None:
+        return [config] * num_envs
+    configs = []
+    for index in range(num_envs):
+        copy_config = config.copy_and_resolve_references()
+        with copy_config.unlocked():
+            # Seed zero is avoided by the builder when choosing random seeds.
+            seed_sequence = np.random.SeedSequence([env_seed, index])
+            copy_config.env_seed = int(seed_sequence.generate_state(1)[0]) or 1
+        configs.append(copy_config)
+    return configs
+
+
+def build_vector(
+    config: config_dict.ConfigDict,
+    num_envs: int,
+    backend: str = "serial",
+    separate_global_observations: bool = False,
+    observations: Optional[Collection[str]] = None,
+    copy_observations: bool = False,
+) -> vector_substrate.VectorSubstrate:
+    """Builds several copies of the substrate that are stepped together.
+
+  Args:
+    config: config resulting from `get_config`.
+    num_envs: the number of copies of the substrate to run.
+    backend: how to run the copies, one of `vector_substrate.BACKENDS`.
+    separate_global_observations: see `build`. Global observations are then
+      batched with leading dimension [num_envs] only.
+    observations: see `build`.
+    copy_observations: whether each timestep holds copies of the observations.
+      Otherwise it holds read-only views that are overwritten by the next call
+      to `reset` or `step`.
+
+  Returns:
+    The vectorized substrate. Its timesteps hold arrays with leading dimensions
+    [num_envs, num_players] and each copy resets automatically after LAST.
+  """
+    build_substrates = [
+        functools.partial(
+            build,
+            copy_config,
+            separate_global_observations=separate_global_observations,
+            observations=observations,
+        )
+        for copy_config in _vector_configs(config, num_envs)
+    ]
+    return vector_substrate.VectorSubstrate(
+        build_substrates, backend=backend, copy_observations=copy_observations
+    )
@@ -0,0 +1,90 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks the time taken to step substrates.
+
+Steps each substrate with uniformly random actions and reports the mean time
+per step, both with all observations and without the global observations (e.g.
+WORLD.RGB), which are then not rendered. Episodes are reset as they end, but
+resets are not timed.
+
+Usage: python substrate_benchmark.py --substrates clean_up commons_harvest_open
+"""
+
+import argparse
+import time
+from typing import Collection, Optional
+
+import numpy as np
+
+from meltingpot.python import substrate
+
+_DEFAULT_SUBSTRATES = ("commons_harvest_open", "clean_up", "allelopathic_harvest")
+
+
+def _measure(
+    substrate_name: str,
+    num_steps: int,
+    seed: int,
+    observations: Optional[Collection[str]] = None,
+) -> float:
+    """Returns the mean time in seconds of a step of the substrate."""
+    config = substrate.get_config(substrate_name)
+    rng = np.random.default_rng(seed)
+    with substrate.build(config, observations=observations) as env:
+        num_actions = [spec.num_values for spec in env.action_spec()]
+        timestep = env.reset()
+        seconds = 0.0
+        for _ in range(num_steps):
+            if timestep.last():
+                timestep = env.reset()
+            actions = [rng.integers(n) for n in num_actions]
+            start = time.perf_counter()
+            timestep = env.step(actions)
+            seconds += time.perf_counter() - start
+    return seconds / num_steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--substrates",
+        nargs="+",
+        default=_DEFAULT_SUBSTRATES,
+        choices=sorted(substrate.AVAILABLE_SUBSTRATES),
+        help="Substrates to benchmark",
+    )
+    parser.add_argument(
+        "--num_steps", type=int, default=1000, help="Number of steps to time"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the actions")
+    args = parser.parse_args()
+
+    for substrate_name in args.substrates:
+        config = substrate.get_config(substrate_name)
+        seconds = _measure(substrate_name, args.num_steps, args.seed)
+        local_seconds = _measure(
+            substrate_name,
+            args.num_steps,
+            args.seed,
+            observations=config.individual_observation_names,
+        )
+        print(
+            f"{substrate_name}: {seconds * 1e3:.3f} ms/step, "
+            f"{local_seconds * 1e3:.3f} ms/step without "
+            f"{', '.join(config.global_observation_names)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Prints which parts of the Lua simulation of substrates take the most time.
+
+Steps each substrate with uniformly random actions, with profiling enabled, and
+prints its component methods, updaters and observation functions ranked by the
+time they took. Times include nested calls (see lua_profiler).
+
+Usage: python substrate_profile.py --substrates clean_up --num_steps=1000
+"""
+
+import argparse
+
+import numpy as np
+
+from meltingpot.python import substrate
+from meltingpot.python.utils.substrates import lua_profiler
+
+
+def _profile(substrate_name: str, num_steps: int, seed: int):
+    """Returns the profile of stepping the substrate, summed over episodes."""
+    config = lua_profiler.enable(substrate.get_config(substrate_name))
+    rng = np.random.default_rng(seed)
+    profiles = []
+    with substrate.build(config) as env:
+        num_actions = [spec.num_values for spec in env.action_spec()]
+        timestep = env.reset()
+        for _ in range(num_steps):
+            if timestep.last():
+                profiles.append(lua_profiler.read(env))
+                timestep = env.reset()
+            timestep = env.step([rng.integers(n) for n in num_actions])
+        profiles.append(lua_profiler.read(env))
+    return lua_profiler.merge(*profiles)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--substrates",
+        nargs="+",
+        default=("commons_harvest_open", "clean_up"),
+        choices=sorted(substrate.AVAILABLE_SUBSTRATES),
+        help="Substrates to profile",
+    )
+    parser.add_argument(
+        "--num_steps", type=int, default=1000, help="Number of steps to profile"
+    )
+    parser.add_argument(
+        "--top", type=int, default=20, help="Number of entries to print"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the actions")
+    args = parser.parse_args()
+
+    for substrate_name in args.substrates:
+        profile = _profile(substrate_name, args.num_steps, args.seed)
+        print(f"{substrate_name} ({args.num_steps} steps):")
+        print(f"  {'rank':>4}  {'ms/step':>8}  {'calls/step':>10}  name")
+        for rank, entry in enumerate(lua_profiler.ranked(profile)[: args.top]):
+            print(
+                f"  {rank + 1:>4}  {entry.seconds * 1e3 / args.num_steps:>8.3f}  "
+                f"{entry.calls / args.num_steps:>10.1f}  {entry.name}"
+            )
+        print()
+
+
+if __name__ == "__main__":
+    main()
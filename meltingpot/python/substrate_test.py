@@ -13,12 +13,22 @@
 # limitations under the License.
 """Tests for substrate."""
 
+import copy
+import os
+import tempfile
+from unittest import mock
+
 from absl.testing import absltest
 from absl.testing import parameterized
 import dm_env
 import numpy as np
 
 from meltingpot.python import substrate
+from meltingpot.python.utils.substrates import builder
+from meltingpot.python.utils.substrates import crop_render
+from meltingpot.python.utils.substrates import vector_substrate
+from meltingpot.python.utils.substrates.wrappers import multiplayer_wrapper
+from meltingpot.python.utils.substrates.wrappers import symbolic_observation_wrapper
 
 REWARD_SPEC = dm_env.specs.Array(shape=[], dtype=np.float64, name="REWARD")
 ACTION_SPEC = dm_env.specs.DiscreteArray(num_values=1, dtype=np.int32, name="action")
@@ -70,6 +80,57 @@ class SubstrateTest(parameterized.TestCase):
             ):
                 np.testing.assert_equal(last_obs, obs)
 
+    @parameterized.product(seed=[42, 123], prefetch_depth=[1, 3])
+    def test_prefetch_preserves_episodes(self, seed, prefetch_depth):
+        config = substrate.get_config("running_with_scissors_in_the_matrix")
+        with config.unlocked():
+            config.env_seed = seed
+            config.lab2d_settings.simulation.map = _LUA_RANDOMIZATION_MAP
+        prefetch_config = config.copy_and_resolve_references()
+        with prefetch_config.unlocked():
+            prefetch_config.prefetch_depth = prefetch_depth
+
+        with substrate.build(config) as env1, substrate.build(prefetch_config) as env2:
+            for episode in range(5):
+                obs1 = env1.reset().observation[0]["WORLD.RGB"]
+                obs2 = env2.reset().observation[0]["WORLD.RGB"]
+                np.testing.assert_equal(
+                    obs1, obs2, f"Episode {episode} mismatch: {obs1} != {obs2} "
+                )
+
+    @parameterized.product(seed=[42, 123])
+    def test_soft_reset_matches_rebuild(self, seed):
+        config = substrate.get_config("clean_up")
+        with config.unlocked():
+            config.env_seed = seed
+        soft_config = config.copy_and_resolve_references()
+        with soft_config.unlocked():
+            soft_config.soft_reset = True
+
+        actions = np.random.RandomState(seed).randint(
+            0, len(config.action_set), size=(3, 20, config.num_players)
+        )
+        with substrate.build(config) as env1, substrate.build(soft_config) as env2:
+            for episode, episode_actions in enumerate(actions):
+                timestep1 = env1.reset()
+                timestep2 = env2.reset()
+                for step, action in enumerate(episode_actions):
+                    np.testing.assert_equal(
+                        timestep1,
+                        timestep2,
+                        f"Episode {episode} step {step} mismatch",
+                    )
+                    timestep1 = env1.step(action)
+                    timestep2 = env2.step(action)
+
+    def test_soft_reset_with_prefetch_raises(self):
+        config = substrate.get_config("clean_up")
+        with config.unlocked():
+            config.soft_reset = True
+            config.prefetch_depth = 1
+        with self.assertRaises(ValueError):
+            substrate.build(config)
+
     def test_no_seed_causes_nondeterminism(self):
         config = substrate.get_config("running_with_scissors_in_the_matrix")
         with config.unlocked():
@@ -142,6 +203,225 @@ class SubstrateTest(parameterized.TestCase):
         with self.subTest("reward_spec"):
             self.assertEqual(reward_spec, [REWARD_SPEC] * config.num_players)
 
+    def test_cached_settings_match_compiled(self):
+        config = substrate.get_config("allelopathic_harvest")
+        expected = builder.compile_lab2d_settings(config.lab2d_settings)
+        with self.subTest("first_build"):
+            actual = builder.cached_compile_lab2d_settings(config.lab2d_settings)
+            self.assertEqual(actual, expected)
+        with self.subTest("cached"):
+            actual = builder.cached_compile_lab2d_settings(config.lab2d_settings)
+            self.assertEqual(actual, expected)
+
+    @parameterized.parameters("clean_up", "commons_harvest_open")
+    def test_sprite_atlas_matches_lua_sprites(self, substrate_name):
+        config = substrate.get_config(substrate_name)
+        with config.unlocked():
+            config.env_seed = 42
+        num_players = config.num_players
+        num_actions = len(config.action_set)
+        self.addCleanup(builder._SETTINGS_CACHE.clear_memory)
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        timesteps = {}
+        settings = {}
+        # The atlas is only built when the on-disk cache is enabled.
+        for name, directory in (
+            ("atlas", cache_dir.name),
+            ("lua", ""),
+        ):
+            builder._SETTINGS_CACHE.clear_memory()
+            with mock.patch.dict(os.environ, {"MELTINGPOT_CACHE_DIR": directory}):
+                settings[name] = builder.cached_compile_lab2d_settings(
+                    config.lab2d_settings
+                )
+                with substrate.build(config) as env:
+                    timesteps[name] = [copy.deepcopy(env.reset())]
+                    for step in range(1, 10):
+                        actions = [(step + i) % num_actions for i in range(num_players)]
+                        timesteps[name].append(copy.deepcopy(env.step(actions)))
+
+        with self.subTest("atlas_used"):
+            self.assertIn("spriteAtlas.path", settings["atlas"])
+            self.assertNotIn("spriteAtlas.path", settings["lua"])
+        for step, (expected, actual) in enumerate(
+            zip(timesteps["lua"], timesteps["atlas"])
+        ):
+            for player in range(num_players):
+                for key in ("RGB", "WORLD.RGB"):
+                    np.testing.assert_array_equal(
+                        actual.observation[player][key],
+                        expected.observation[player][key],
+                        f"Step {step} player {player} {key} mismatch.",
+                    )
+
+    @parameterized.parameters(
+        # clean_up and commons_harvest_open have noRotate sprites. Two builds
+        # of allelopathic_harvest with the same seed can differ, so it is left
+        # out.
+        "clean_up",
+        "commons_harvest_open",
+        "collaborative_cooking_passable",
+        "territory_rooms",
+    )
+    def test_crop_render_matches_full_render(self, substrate_name):
+        config = substrate.get_config(substrate_name)
+        with config.unlocked():
+            config.env_seed = 42
+        num_players = config.num_players
+        num_actions = len(config.action_set)
+        timesteps = {}
+        for name, env_config in (
+            ("full", config),
+            ("crop", crop_render.enable(config)),
+        ):
+            with substrate.build(env_config) as env:
+                timesteps[name] = [copy.deepcopy(env.reset())]
+                # Cycle through every action, so that players move and turn.
+                for step in range(1, 30):
+                    actions = [(step + i) % num_actions for i in range(num_players)]
+                    timesteps[name].append(copy.deepcopy(env.step(actions)))
+
+        for step, (expected, actual) in enumerate(
+            zip(timesteps["full"], timesteps["crop"])
+        ):
+            for player in range(num_players):
+                for key in ("RGB", "WORLD.RGB"):
+                    np.testing.assert_array_equal(
+                        actual.observation[player][key],
+                        expected.observation[player][key],
+                        f"Step {step} player {player} {key} mismatch.",
+                    )
+
+    @parameterized.parameters(
+        "commons_harvest_open",
+        "commons_harvest_closed",
+        "commons_harvest_partnership",
+    )
+    def test_commons_harvest_neighbor_counts(self, substrate_name):
+        config = substrate.get_config(substrate_name)
+        with config.unlocked():
+            config.env_seed = 42
+            # Neighborhoods then asserts on every frame that the maintained
+            # neighbor counts match a recount from the grid.
+            for component in config.lab2d_settings.simulation.scene.components:
+                if component["component"] == "Neighborhoods":
+                    component["kwargs"]["checkCounts"] = True
+        rng = np.random.default_rng(0)
+        num_actions = len(config.action_set)
+        with substrate.build(config) as env:
+            env.reset()
+            for _ in range(300):
+                env.step(rng.integers(num_actions, size=config.num_players))
+
+    def test_build_in_subprocess_matches_build(self):
+        config = substrate.get_config("running_with_scissors_in_the_matrix")
+        with config.unlocked():
+            config.env_seed = 42
+        num_players = config.num_players
+        with substrate.build(config) as env1:
+            with substrate.build_in_subprocess(config) as env2:
+                with self.subTest("observation_spec"):
+                    self.assertEqual(env1.observation_spec(), env2.observation_spec())
+                for step in range(5):
+                    if step == 0:
+                        timestep1 = env1.reset()
+                        timestep2 = env2.reset()
+                    else:
+                        timestep1 = env1.step([step % 2] * num_players)
+                        timestep2 = env2.step([step % 2] * num_players)
+                    np.testing.assert_equal(
+                        timestep1, timestep2, f"Step {step} mismatch."
+                    )
+
+    def test_separate_global_observations_match_build(self):
+        config = substrate.get_config("running_with_scissors_in_the_matrix")
+        with config.unlocked():
+            config.env_seed = 42
+        with substrate.build(config) as env1:
+            with substrate.build(config, separate_global_observations=True) as env2:
+                timestep1 = env1.reset()
+                timestep2 = env2.reset()
+                global_observation_spec = env2.global_observation_spec()
+
+        with self.subTest("global_observation_spec"):
+            self.assertCountEqual(
+                global_observation_spec, config.global_observation_names
+            )
+        with self.subTest("player_observations"):
+            np.testing.assert_equal(
+                multiplayer_wrapper.player_observations(timestep2),
+                timestep1.observation,
+            )
+
+    def test_observations_restrict_build(self):
+        config = substrate.get_config("running_with_scissors_in_the_matrix")
+        with substrate.build(config, observations=["RGB"]) as env:
+            observation_spec = env.observation_spec()
+            timestep = env.reset()
+
+        with self.subTest("observation_spec"):
+            for spec in observation_spec:
+                self.assertCountEqual(spec, ["RGB"])
+        with self.subTest("observations"):
+            for observation, spec in zip(timestep.observation, observation_spec):
+                self.assertCountEqual(observation, ["RGB"])
+                self.assertEqual(observation["RGB"].shape, spec["RGB"].shape)
+
+    def test_unknown_observations_raise(self):
+        config = substrate.get_config("running_with_scissors_in_the_matrix")
+        with self.assertRaises(ValueError):
+            substrate.build(config, observations=["RGB", "NOT_AN_OBSERVATION"])
+
+    def test_symbolic_observations(self):
+        config = substrate.get_config("running_with_scissors_in_the_matrix")
+        with config.unlocked():
+            config.individual_observation_names.append("SYMBOLIC")
+        with substrate.build(config, observations=["SYMBOLIC"]) as env:
+            observation_spec = env.observation_spec()
+            timestep = env.reset()
+
+        for spec, observation in zip(observation_spec, timestep.observation):
+            spec = spec["SYMBOLIC"]
+            with self.subTest("spec"):
+                self.assertIsInstance(
+                    spec, symbolic_observation_wrapper.SymbolicArray
+                )
+                self.assertEqual(spec.vocabulary[0], "")
+            with self.subTest("observation"):
+                spec.validate(observation["SYMBOLIC"])
+            with self.subTest("sees_self"):
+                self.assertIn(spec.vocabulary.index("Self"), observation["SYMBOLIC"])
+
+    @parameterized.parameters(*vector_substrate.BACKENDS)
+    def test_build_vector(self, backend):
+        config = substrate.get_config("running_with_scissors_in_the_matrix")
+        with config.unlocked():
+            config.env_seed = 42
+        num_envs = 2
+        # The timesteps are checked after the copies are closed, and the reset
+        # timestep after the step, so they must hold copies of the observations.
+        with substrate.build_vector(
+            config, num_envs, backend=backend, copy_observations=True
+        ) as env:
+            observation_spec = env.observation_spec()
+            reset_timestep = env.reset()
+            actions = np.zeros([num_envs, config.num_players], dtype=np.int32)
+            step_timestep = env.step(actions)
+
+        with self.subTest("observation_shapes"):
+            for timestep in (reset_timestep, step_timestep):
+                for key, spec in observation_spec.items():
+                    self.assertEqual(timestep.observation[key].shape, spec.shape)
+        with self.subTest("reward_shape"):
+            self.assertEqual(
+                step_timestep.reward.shape, (num_envs, config.num_players)
+            )
+        with self.subTest("copies_are_seeded_differently"):
+            world_rgb = reset_timestep.observation["WORLD.RGB"]
+            with self.assertRaises(AssertionError):
+                np.testing.assert_equal(world_rgb[0], world_rgb[1])
+
 
 if __name__ == "__main__":
     absltest.main()
@@ -0,0 +1,276 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks the throughput of every substrate and scenario.
+
+Each substrate and scenario is measured in a fresh process, which reports:
+
+*   build_seconds: the time taken by `substrate.build` or `scenario.build`.
+*   first_reset_seconds: the time taken by the first reset.
+*   reset_seconds: the mean time taken by later resets, which rebuild the
+    environment (through `ResetWrapper`).
+*   steps_per_second: the number of steps per second with uniformly random
+    actions, after warming up. Episodes are reset as they end, but resets are
+    not timed.
+*   step_p50_ms, step_p90_ms, step_p99_ms: percentiles of the step latency.
+*   max_rss_mib: the peak resident memory of the process.
+
+Compiled settings are read from the on-disk cache if present (see
+`builder.builder`), so build times are those of a warm cache unless
+$MELTINGPOT_CACHE_DIR is set to an empty string.
+
+The results are written to a JSON file. Given a baseline written by an earlier
+run, the results are compared against it and the command fails if any metric
+regressed by more than a tolerance.
+
+Usage:
+  python throughput_benchmark.py --output=/tmp/benchmark.json
+  python throughput_benchmark.py --substrates clean_up --scenarios \
+      --baseline=/tmp/benchmark.json
+"""
+
+import argparse
+import concurrent.futures
+import json
+import multiprocessing
+import platform
+import resource
+import sys
+import time
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from meltingpot.python import scenario
+from meltingpot.python import substrate
+
+SUBSTRATE = "substrate"
+SCENARIO = "scenario"
+
+# Metrics for which larger values are better. Smaller values are better for the
+# others.
+_LARGER_IS_BETTER = frozenset({"steps_per_second"})
+
+Metrics = Dict[str, Optional[float]]
+
+
+def _build(kind: str, name: str):
+    """Returns the environment of the substrate or scenario."""
+    if kind == SUBSTRATE:
+        return substrate.build(substrate.get_config(name))
+    else:
+        return scenario.build(scenario.get_config(name))
+
+
+def _focal_timestep(kind: str, result):
+    """Returns the timestep of a reset or step of a substrate or scenario."""
+    if kind == SUBSTRATE:
+        return result
+    else:
+        # Scenarios also return the timesteps of their bots.
+        timestep, _ = result
+        return timestep
+
+
+def _measure(
+    kind: str,
+    name: str,
+    num_steps: int,
+    num_warmup_steps: int,
+    num_resets: int,
+    seed: int,
+) -> Metrics:
+    """Returns the metrics of a substrate or scenario, measured in this process."""
+    rng = np.random.default_rng(seed)
+    start = time.perf_counter()
+    env = _build(kind, name)
+    build_seconds = time.perf_counter() - start
+    with env:
+        start = time.perf_counter()
+        timestep = _focal_timestep(kind, env.reset())
+        first_reset_seconds = time.perf_counter() - start
+
+        reset_seconds = []
+        for _ in range(num_resets):
+            start = time.perf_counter()
+            timestep = _focal_timestep(kind, env.reset())
+            reset_seconds.append(time.perf_counter() - start)
+
+        num_actions = [spec.num_values for spec in env.action_spec()]
+        step_seconds = []
+        for i in range(num_warmup_steps + num_steps):
+            if timestep.last():
+                timestep = _focal_timestep(kind, env.reset())
+            actions = [rng.integers(n) for n in num_actions]
+            start = time.perf_counter()
+            timestep = _focal_timestep(kind, env.step(actions))
+            if i >= num_warmup_steps:
+                step_seconds.append(time.perf_counter() - start)
+
+    p50, p90, p99 = np.percentile(step_seconds, [50, 90, 99]) * 1e3
+    return {
+        "build_seconds": build_seconds,
+        "first_reset_seconds": first_reset_seconds,
+        "reset_seconds": float(np.mean(reset_seconds)) if reset_seconds else None,
+        "steps_per_second": len(step_seconds) / sum(step_seconds),
+        "step_p50_ms": float(p50),
+        "step_p90_ms": float(p90),
+        "step_p99_ms": float(p99),
+        # ru_maxrss is in KiB on Linux.
+        "max_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def _measure_in_subprocess(kind: str, name: str, **kwargs) -> Metrics:
+    """Returns the metrics of a substrate or scenario, measured in a new process."""
+    context = multiprocessing.get_context("spawn")
+    with concurrent.futures.ProcessPoolExecutor(1, mp_context=context) as executor:
+        return executor.submit(_measure, kind, name, **kwargs).result()
+
+
+def compare(
+    results: Mapping[str, Metrics],
+    baseline: Mapping[str, Metrics],
+    tolerance: float,
+) -> List[str]:
+    """Returns descriptions of the metrics that regressed against a baseline.
+
+  Args:
+    results: the metrics of each benchmark.
+    baseline: the metrics of each benchmark in the baseline. Benchmarks and
+      metrics missing from either are not compared.
+    tolerance: the relative change in a metric, in its worse direction, above
+      which it is a regression.
+  """
+    regressions = []
+    for key in sorted(results.keys() & baseline.keys()):
+        for metric, value in sorted(results[key].items()):
+            base_value = baseline[key].get(metric)
+            if value is None or not base_value:
+                continue
+            change = value / base_value - 1
+            if metric in _LARGER_IS_BETTER:
+                change = -change
+            if change > tolerance:
+                regressions.append(
+                    f"{key} {metric}: {base_value:.4g} -> {value:.4g} "
+                    f"({change:+.0%} worse)"
+                )
+    return regressions
+
+
+def run(
+    substrate_names: Sequence[str],
+    scenario_names: Sequence[str],
+    **kwargs,
+) -> Dict[str, Metrics]:
+    """Returns the metrics of substrates and scenarios, keyed by 'kind/name'.
+
+  Args:
+    substrate_names: the substrates to measure.
+    scenario_names: the scenarios to measure.
+    **kwargs: forwarded to `_measure`.
+  """
+    results = {}
+    benchmarks = [(SUBSTRATE, name) for name in substrate_names]
+    benchmarks += [(SCENARIO, name) for name in scenario_names]
+    for kind, name in benchmarks:
+        key = f"{kind}/{name}"
+        results[key] = _measure_in_subprocess(kind, name, **kwargs)
+        print(
+            f"{key}: {results[key]['steps_per_second']:.1f} steps/s, "
+            f"p99 {results[key]['step_p99_ms']:.2f} ms/step, "
+            f"build {results[key]['build_seconds']:.2f} s, "
+            f"max RSS {results[key]['max_rss_mib']:.0f} MiB",
+            flush=True,
+        )
+    return results
+
+
+def _metadata(args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "python": sys.version,
+        "platform": platform.platform(),
+        "num_steps": args.num_steps,
+        "num_warmup_steps": args.num_warmup_steps,
+        "num_resets": args.num_resets,
+        "seed": args.seed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--substrates",
+        nargs="*",
+        default=sorted(substrate.AVAILABLE_SUBSTRATES),
+        choices=sorted(substrate.AVAILABLE_SUBSTRATES),
+        help="Substrates to benchmark (default: all)",
+    )
+    parser.add_argument(
+        "--scenarios",
+        nargs="*",
+        default=sorted(scenario.AVAILABLE_SCENARIOS),
+        choices=sorted(scenario.AVAILABLE_SCENARIOS),
+        help="Scenarios to benchmark (default: all)",
+    )
+    parser.add_argument(
+        "--num_steps", type=int, default=1000, help="Number of steps to time"
+    )
+    parser.add_argument(
+        "--num_warmup_steps",
+        type=int,
+        default=100,
+        help="Number of steps before timing steps",
+    )
+    parser.add_argument(
+        "--num_resets", type=int, default=2, help="Number of later resets to time"
+    )
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the actions")
+    parser.add_argument("--output", help="JSON file to write the results to")
+    parser.add_argument("--baseline", help="JSON file of results to compare to")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="Relative change in a metric that counts as a regression",
+    )
+    args = parser.parse_args()
+
+    results = run(
+        args.substrates,
+        args.scenarios,
+        num_steps=args.num_steps,
+        num_warmup_steps=args.num_warmup_steps,
+        num_resets=args.num_resets,
+        seed=args.seed,
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"metadata": _metadata(args), "results": results}, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests of throughput_benchmark."""
+
+from absl.testing import absltest
+from absl.testing import parameterized
+
+from meltingpot.python import throughput_benchmark
+
+_KEY = "substrate/clean_up"
+
+
+class CompareTest(parameterized.TestCase):
+    @parameterized.named_parameters(
+        ("larger_is_better_regresses", "steps_per_second", 100.0, 80.0, True),
+        ("larger_is_better_improves", "steps_per_second", 100.0, 150.0, False),
+        ("larger_is_better_within_tolerance", "steps_per_second", 100.0, 95.0, False),
+        ("smaller_is_better_regresses", "step_p99_ms", 10.0, 12.0, True),
+        ("smaller_is_better_improves", "step_p99_ms", 10.0, 5.0, False),
+        ("smaller_is_better_within_tolerance", "step_p99_ms", 10.0, 10.5, False),
+    )
+    def test_compares_metric(self, metric, base_value, value, regressed):
+        regressions = throughput_benchmark.compare(
+            {_KEY: {metric: value}}, {_KEY: {metric: base_value}}, tolerance=0.1
+        )
+        if regressed:
+            self.assertLen(regressions, 1)
+            self.assertStartsWith(regressions[0], f"{_KEY} {metric}:")
+        else:
+            self.assertEmpty(regressions)
+
+    @parameterized.named_parameters(
+        ("none_value", 10.0, None),
+        ("none_baseline", None, 10.0),
+        ("zero_baseline", 0.0, 10.0),
+    )
+    def test_skips_metric(self, base_value, value):
+        regressions = throughput_benchmark.compare(
+            {_KEY: {"reset_seconds": value}},
+            {_KEY: {"reset_seconds": base_value}},
+            tolerance=0.1,
+        )
+        self.assertEmpty(regressions)
+
+    def test_skips_keys_in_only_one_file(self):
+        regressions = throughput_benchmark.compare(
+            {_KEY: {"step_p99_ms": 10.0}, "scenario/new": {"step_p99_ms": 99.0}},
+            {_KEY: {"step_p99_ms": 10.0}, "scenario/old": {"step_p99_ms": 1.0}},
+            tolerance=0.1,
+        )
+        self.assertEmpty(regressions)
+
+    def test_skips_metrics_in_only_one_file(self):
+        regressions = throughput_benchmark.compare(
+            {_KEY: {"step_p99_ms": 10.0, "max_rss_mib": 500.0}},
+            {_KEY: {"step_p99_ms": 10.0, "step_p50_ms": 1.0}},
+            tolerance=0.1,
+        )
+        self.assertEmpty(regressions)
+
+    def test_reports_each_regression(self):
+        regressions = throughput_benchmark.compare(
+            {
+                "substrate/b": {"steps_per_second": 50.0, "build_seconds": 2.0},
+                "substrate/a": {"build_seconds": 2.0},
+            },
+            {
+                "substrate/b": {"steps_per_second": 100.0, "build_seconds": 1.0},
+                "substrate/a": {"build_seconds": 1.0},
+            },
+            tolerance=0.1,
+        )
+        self.assertEqual(
+            regressions,
+            [
+                "substrate/a build_seconds: 1 -> 2 (+100% worse)",
+                "substrate/b build_seconds: 1 -> 2 (+100% worse)",
+                "substrate/b steps_per_second: 100 -> 50 (+50% worse)",
+            ],
+        )
+
+
+if __name__ == "__main__":
+    absltest.main()
@@ -0,0 +1,119 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Merges work submitted concurrently from many threads into batched calls.
+
+Requests are executed on a single worker thread. Whenever the worker becomes
+free it takes *all* pending requests and runs them as one batch, so no request
+ever waits for a batch to fill up: batching only happens when callers are
+already contending for the worker. Items submitted together in one call to
+`submit` are always executed in the same batch.
+"""
+
+import concurrent.futures
+import queue
+import threading
+from typing import Callable, Generic, List, Optional, Sequence, Tuple, TypeVar
+
+T = TypeVar("T")
+U = TypeVar("U")
+
+_Request = Tuple[Sequence[T], concurrent.futures.Future]
+
+
+class Batcher(Generic[T, U]):
+    """Runs batch_fn over the union of all concurrently pending requests."""
+
+    def __init__(self, batch_fn: Callable[[Sequence[T]], Sequence[U]]) -> None:
+        """Initializes the batcher.
+
+    Args:
+      batch_fn: function mapping a sequence of inputs to a sequence of outputs of
+        the same length. Only ever called from the batcher's worker thread.
+    """
+        self._batch_fn = batch_fn
+        self._requests: "queue.SimpleQueue[Optional[_Request]]" = queue.SimpleQueue()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, items: Sequence[T]) -> concurrent.futures.Future:
+        """Submits items for batched processing.
+
+    Args:
+      items: the inputs to process. These are guaranteed to be processed in the
+        same call to batch_fn.
+
+    Returns:
+      A future resolving to the outputs corresponding to items.
+    """
+        if self._closed:
+            raise ValueError("Batcher is closed.")
+        future = concurrent.futures.Future()
+        self._requests.put((tuple(items), future))
+        return future
+
+    def __call__(self, items: Sequence[T]) -> Sequence[U]:
+        """Processes items, blocking until the outputs are available."""
+        return self.submit(items).result()
+
+    def close(self) -> None:
+        """Stops the worker once all pending requests are processed."""
+        if not self._closed:
+            self._closed = True
+            self._requests.put(None)
+            self._thread.join()
+
+    def _next_batch(self) -> Tuple[List[_Request], bool]:
+        """Returns all pending requests and whether the batcher was closed."""
+        requests = [self._requests.get()]
+        while True:
+            try:
+                requests.append(self._requests.get_nowait())
+            except queue.Empty:
+                break
+        stop = any(request is None for request in requests)
+        return [request for request in requests if request is not None], stop
+
+    def _process(self, requests: Sequence[_Request]) -> None:
+        """Processes a batch of requests and resolves their futures."""
+        requests = [
+            (items, future)
+            for items, future in requests
+            if future.set_running_or_notify_cancel()
+        ]
+        if not requests:
+            return
+        inputs = [item for items, _ in requests for item in items]
+        try:
+            outputs = self._batch_fn(inputs) if inputs else ()
+            if len(outputs) != len(inputs):
+                raise ValueError(
+                    f"batch_fn returned {len(outputs)} outputs for {len(inputs)} "
+                    "inputs."
+                )
+        except Exception as e:  # pylint: disable=broad-except
+            for _, future in requests:
+                future.set_exception(e)
+            return
+        start = 0
+        for items, future in requests:
+            future.set_result(tuple(outputs[start : start + len(items)]))
+            start += len(items)
+
+    def _run(self) -> None:
+        """Worker loop."""
+        stop = False
+        while not stop:
+            requests, stop = self._next_batch()
+            self._process(requests)
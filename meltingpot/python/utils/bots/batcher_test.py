@@ -0,0 +1,86 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for batcher."""
+
+import threading
+
+from absl.testing import absltest
+
+from meltingpot.python.utils.bots import batcher
+
+
+class BatcherTest(absltest.TestCase):
+    def test_outputs_match_inputs(self):
+        double = batcher.Batcher(lambda inputs: [2 * x for x in inputs])
+        try:
+            self.assertEqual(double([1, 2, 3]), (2, 4, 6))
+        finally:
+            double.close()
+
+    def test_concurrent_requests_are_batched(self):
+        release = threading.Event()
+        batches = []
+
+        def batch_fn(inputs):
+            release.wait()
+            batches.append(list(inputs))
+            return [-x for x in inputs]
+
+        negate = batcher.Batcher(batch_fn)
+        try:
+            # The first request blocks the worker so the others queue up behind it.
+            first = negate.submit([0])
+            second = negate.submit([1, 2])
+            third = negate.submit([3])
+            release.set()
+            results = [first.result(), second.result(), third.result()]
+        finally:
+            negate.close()
+
+        with self.subTest("results"):
+            self.assertEqual(results, [(0,), (-1, -2), (-3,)])
+        with self.subTest("at_most_two_batches"):
+            self.assertLessEqual(len(batches), 2)
+        with self.subTest("submission_kept_together"):
+            self.assertTrue(any({1, 2} <= set(batch) for batch in batches))
+
+    def test_exception_is_propagated(self):
+        def batch_fn(inputs):
+            del inputs
+            raise RuntimeError("failed")
+
+        failing = batcher.Batcher(batch_fn)
+        try:
+            with self.assertRaisesRegex(RuntimeError, "failed"):
+                failing([1])
+        finally:
+            failing.close()
+
+    def test_wrong_number_of_outputs_raises(self):
+        short = batcher.Batcher(lambda inputs: inputs[1:])
+        try:
+            with self.assertRaises(ValueError):
+                short([1, 2])
+        finally:
+            short.close()
+
+    def test_submit_after_close_raises(self):
+        identity = batcher.Batcher(list)
+        identity.close()
+        with self.assertRaises(ValueError):
+            identity.submit([1])
+
+
+if __name__ == "__main__":
+    absltest.main()
@@ -0,0 +1,204 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""A registry of loaded models, shared by everything that uses them.
+
+Models are keyed by their resolved path, so every user of a path shares one
+model, loaded once. A model that is no longer in use stays resident so it can be
+handed out again, until it is evicted (least recently used first) to keep the
+total size of the resident models within a memory budget. Models in use are
+never evicted, so they may exceed the budget.
+
+The budget defaults to $MELTINGPOT_MODEL_MEMORY_BUDGET bytes if set, or 1 GiB
+otherwise. A budget of 0 evicts every model as soon as it is no longer in use.
+"""
+
+import collections
+import concurrent.futures
+import os
+import threading
+from typing import Any, Callable, Dict, Generic, NamedTuple, Optional, TypeVar
+
+T = TypeVar("T")
+
+_MEMORY_BUDGET_ENV = "MELTINGPOT_MODEL_MEMORY_BUDGET"
+_DEFAULT_MEMORY_BUDGET = 1 << 30
+
+
+def default_memory_budget() -> int:
+    """Returns the default memory budget of a registry, in bytes."""
+    budget = os.environ.get(_MEMORY_BUDGET_ENV)
+    if budget is None:
+        return _DEFAULT_MEMORY_BUDGET
+    else:
+        return int(budget)
+
+
+def saved_model_size(model_path: str) -> int:
+    """Returns the size of a SavedModel on disk, as an estimate of its memory."""
+    size = 0
+    for directory, _, filenames in os.walk(model_path):
+        for filename in filenames:
+            size += os.path.getsize(os.path.join(directory, filename))
+    return size
+
+
+class Stats(NamedTuple):
+    """Statistics of a `ModelRegistry`.
+
+  Attributes:
+    hits: the number of models handed out that were already resident.
+    misses: the number of models handed out that had to be loaded.
+    evictions: the number of models evicted.
+    resident_models: the number of models currently loaded.
+    resident_bytes: the estimated total size of the models currently loaded.
+  """
+
+    hits: int
+    misses: int
+    evictions: int
+    resident_models: int
+    resident_bytes: int
+
+
+class _Entry:
+    """A model in the registry."""
+
+    def __init__(self) -> None:
+        self.model = concurrent.futures.Future()
+        self.users = 0
+        self.size = 0
+
+
+class ModelRegistry(Generic[T]):
+    """Hands out shared models, loading each one once.
+
+  Every call to `acquire` must be matched by a call to `release` once the model
+  is no longer used.
+  """
+
+    def __init__(
+        self,
+        load_model: Callable[..., T],
+        memory_budget: Optional[int] = None,
+        model_size: Callable[[str], int] = saved_model_size,
+    ) -> None:
+        """Initializes the registry.
+
+    Args:
+      load_model: called with the path of a model (and the keyword arguments
+        passed to `acquire`) to load it.
+      memory_budget: the total size in bytes of the resident models above which
+        models no longer in use are evicted. Defaults to
+        `default_memory_budget()`.
+      model_size: returns the estimated size in bytes of the model at a path.
+    """
+        if memory_budget is None:
+            memory_budget = default_memory_budget()
+        if memory_budget < 0:
+            raise ValueError(f"memory_budget must be >= 0, got {memory_budget}.")
+        self._load_model = load_model
+        self._memory_budget = memory_budget
+        self._model_size = model_size
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Entry] = {}
+        # Keys of the loaded models not in use, least recently used first.
+        self._idle: Dict[str, None] = collections.OrderedDict()
+        self._resident_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def memory_budget(self) -> int:
+        """Returns the memory budget in bytes."""
+        return self._memory_budget
+
+    def set_memory_budget(self, memory_budget: int) -> None:
+        """Sets the memory budget in bytes, evicting models to meet it."""
+        if memory_budget < 0:
+            raise ValueError(f"memory_budget must be >= 0, got {memory_budget}.")
+        with self._lock:
+            self._memory_budget = memory_budget
+            self._evict()
+
+    def acquire(self, model_path: str, **kwargs: Any) -> T:
+        """Returns the model at model_path, loading it if it is not resident.
+
+    Concurrent calls for the same model load it once. Different models are
+    loaded concurrently.
+
+    Args:
+      model_path: the path of the model.
+      **kwargs: passed to load_model if the model is loaded. A resident model is
+        returned as it was loaded.
+    """
+        key = os.path.realpath(model_path)
+        with self._lock:
+            entry = self._entries.get(key)
+            should_load = entry is None
+            if should_load:
+                self._misses += 1
+                entry = _Entry()
+                self._entries[key] = entry
+            else:
+                self._hits += 1
+                self._idle.pop(key, None)
+            entry.users += 1
+
+        if should_load:
+            try:
+                model = self._load_model(model_path, **kwargs)
+                size = self._model_size(model_path)
+            except BaseException as e:
+                with self._lock:
+                    del self._entries[key]
+                entry.model.set_exception(e)
+                raise
+            with self._lock:
+                entry.size = size
+                self._resident_bytes += size
+                entry.model.set_result(model)
+                self._evict()
+        return entry.model.result()
+
+    def release(self, model_path: str) -> None:
+        """Releases a model returned by `acquire`."""
+        key = os.path.realpath(model_path)
+        with self._lock:
+            entry = self._entries[key]
+            entry.users -= 1
+            if not entry.users:
+                self._idle[key] = None
+                self._evict()
+
+    def stats(self) -> Stats:
+        """Returns the statistics of the registry."""
+        with self._lock:
+            return Stats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                resident_models=sum(
+                    entry.model.done() for entry in self._entries.values()
+                ),
+                resident_bytes=self._resident_bytes,
+            )
+
+    def _evict(self) -> None:
+        """Evicts models not in use until within budget. Requires the lock."""
+        while self._resident_bytes > self._memory_budget and self._idle:
+            key, _ = self._idle.popitem(last=False)
+            entry = self._entries.pop(key)
+            self._resident_bytes -= entry.size
+            self._evictions += 1
@@ -0,0 +1,138 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for model_registry."""
+
+import concurrent.futures
+import threading
+from unittest import mock
+
+from absl.testing import absltest
+
+from meltingpot.python.utils.bots import model_registry
+
+_SIZES = {"/a": 3, "/b": 4, "/c": 5}
+
+
+class _Model:
+    def __init__(self, path, **kwargs):
+        self.path = path
+        self.kwargs = kwargs
+
+
+def _registry(memory_budget=100, load_model=_Model):
+    return model_registry.ModelRegistry(
+        load_model, memory_budget=memory_budget, model_size=_SIZES.__getitem__
+    )
+
+
+class ModelRegistryTest(absltest.TestCase):
+    def test_shares_models(self):
+        registry = _registry()
+        model1 = registry.acquire("/a", option=1)
+        model2 = registry.acquire("/a", option=2)
+        with self.subTest("shared"):
+            self.assertIs(model1, model2)
+        with self.subTest("first_kwargs"):
+            self.assertEqual(model1.kwargs, {"option": 1})
+        with self.subTest("stats"):
+            self.assertEqual(
+                registry.stats(),
+                model_registry.Stats(
+                    hits=1, misses=1, evictions=0, resident_models=1, resident_bytes=3
+                ),
+            )
+
+    def test_keeps_idle_models_within_budget(self):
+        registry = _registry(memory_budget=100)
+        model = registry.acquire("/a")
+        registry.release("/a")
+        self.assertIs(registry.acquire("/a"), model)
+        self.assertEqual(registry.stats().hits, 1)
+
+    def test_evicts_least_recently_used_idle_models(self):
+        registry = _registry(memory_budget=10)
+        registry.acquire("/a")
+        registry.acquire("/b")
+        registry.release("/b")
+        registry.release("/a")
+        registry.acquire("/c")
+        with self.subTest("evicted"):
+            self.assertEqual(registry.stats().evictions, 1)
+            self.assertEqual(registry.stats().resident_bytes, 8)
+        with self.subTest("kept"):
+            registry.acquire("/a")
+            self.assertEqual(registry.stats().hits, 1)
+        with self.subTest("reloaded"):
+            registry.acquire("/b")
+            self.assertEqual(registry.stats().misses, 4)
+
+    def test_does_not_evict_models_in_use(self):
+        registry = _registry(memory_budget=0)
+        model = registry.acquire("/a")
+        registry.acquire("/b")
+        with self.subTest("in_use"):
+            self.assertEqual(registry.stats().resident_models, 2)
+            self.assertIs(registry.acquire("/a"), model)
+        registry.release("/a")
+        registry.release("/a")
+        with self.subTest("idle"):
+            self.assertEqual(registry.stats().resident_models, 1)
+            self.assertEqual(registry.stats().evictions, 1)
+
+    def test_set_memory_budget_evicts(self):
+        registry = _registry(memory_budget=100)
+        registry.acquire("/a")
+        registry.release("/a")
+        registry.set_memory_budget(0)
+        self.assertEqual(registry.stats().resident_models, 0)
+
+    def test_negative_budget_raises(self):
+        with self.assertRaises(ValueError):
+            _registry(memory_budget=-1)
+
+    def test_failed_load_is_not_resident(self):
+        load_model = mock.Mock(side_effect=[RuntimeError("failed"), _Model("/a")])
+        registry = _registry(load_model=load_model)
+        with self.subTest("raises"):
+            with self.assertRaises(RuntimeError):
+                registry.acquire("/a")
+        with self.subTest("retries"):
+            self.assertEqual(registry.acquire("/a").path, "/a")
+            self.assertEqual(registry.stats().resident_models, 1)
+
+    def test_concurrent_acquires_load_once(self):
+        loading = threading.Event()
+        loaded = threading.Event()
+
+        def load_model(path):
+            loading.set()
+            loaded.wait()
+            return _Model(path)
+
+        load_model = mock.Mock(side_effect=load_model)
+        registry = _registry(load_model=load_model)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+            first = executor.submit(registry.acquire, "/a")
+            loading.wait()
+            others = [executor.submit(registry.acquire, "/a") for _ in range(3)]
+            loaded.set()
+            models = [future.result() for future in [first, *others]]
+        with self.subTest("shared"):
+            self.assertTrue(all(model is models[0] for model in models))
+        with self.subTest("loaded_once"):
+            load_model.assert_called_once_with("/a")
+
+
+if __name__ == "__main__":
+    absltest.main()
@@ -12,18 +12,74 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 # LINT.IfChange
-"""A permissive wrapper for a SavedModel."""
+"""A permissive wrapper for a SavedModel.
+
+TensorFlow is only imported once a model is wrapped, so that importing this
+module stays cheap.
+
+Matching arguments to a function's canonical signature is costly, so it is only
+done the first time a function is called with each argument structure. The
+resulting layout is cached, and later calls with the same structure pass their
+values straight to the concrete function.
+"""
 
 import copy
 import inspect
 
-from typing import Any, Callable, NamedTuple
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+)
 
 from absl import logging
-import tensorflow as tf
 import tree
 
 
+class _NotCacheable(Exception):
+    """Raised for argument structures that have no structure key."""
+
+
+class _Leaf:
+    """Placeholder for the argument value at index in the flattened arguments."""
+
+    __slots__ = ("index",)
+
+    def __init__(self, index: int) -> None:
+        self.index = index
+
+
+_LEAF = "leaf"
+
+
+def _structure_key(structure: Any) -> Hashable:
+    """Returns a hashable key that is equal for structures that flatten alike.
+
+  Args:
+    structure: a nested structure of arguments.
+
+  Raises:
+    _NotCacheable: if structure contains a nested type other than mappings,
+      lists and tuples.
+  """
+    if isinstance(structure, Mapping):
+        return (
+            type(structure),
+            tuple((key, _structure_key(structure[key])) for key in sorted(structure)),
+        )
+    elif isinstance(structure, (list, tuple)):
+        return (type(structure), tuple(_structure_key(item) for item in structure))
+    elif tree.is_nested(structure):
+        raise _NotCacheable()
+    else:
+        return _LEAF
+
+
 class _Function(NamedTuple):
     """Function exposing signature and expected canonical arguments."""
 
@@ -46,8 +102,18 @@ class PermissiveModel:
     # Disable pytype attribute error checks.
     _HAS_DYNAMIC_ATTRIBUTES = True
 
-    def __init__(self, model):
+    def __init__(self, model, jit_compile: bool = False):
+        """Initializes the wrapper.
+
+    Args:
+      model: the loaded SavedModel.
+      jit_compile: whether to compile the concrete functions with XLA. Only
+        applies to functions whose arguments are all tensors.
+    """
+        import tensorflow as tf  # pylint: disable=g-import-not-at-top
+
         self.model = model
+        self._jit_compile = jit_compile
 
         self._tables = self.model.function_tables()
         self._initialized_tables = {}
@@ -94,6 +160,7 @@ class PermissiveModel:
     """
         if name not in self._tables:
             return
+        import tensorflow as tf  # pylint: disable=g-import-not-at-top
 
         all_nodes = dict(
             main={n.name: n for n in concrete_func.graph.as_graph_def().node}
@@ -125,6 +192,8 @@ class PermissiveModel:
 
     def _make_permissive_function(self, name: str) -> Callable[..., Any]:
         """Create a permissive version of a function in the SavedModel."""
+        import tensorflow as tf  # pylint: disable=g-import-not-at-top
+
         if name not in self.signatures:
             raise ValueError(
                 f"No function named {name} in SavedModel, "
@@ -159,10 +228,12 @@ class PermissiveModel:
             raise ValueError(f"No concrete functions found on {tf_func}")
 
         self._maybe_init_tables(concrete_func, name)
+        canonical_args = concrete_func.structured_input_signature
+        flat_canonical_specs = tree.flatten(canonical_args)
 
-        def func(*args, **kwargs):
+        def filter_arguments(args, kwargs, warn=True):
+            """Returns the arguments matched to the canonical signature."""
             bound_args = self.signatures[name].bind(*args, **kwargs)
-            canonical_args = concrete_func.structured_input_signature
 
             flat_bound_args = tree.flatten_with_path(
                 (bound_args.args, bound_args.kwargs)
@@ -190,7 +261,7 @@ class PermissiveModel:
 
                 if arg_path in flat_bound_args_dict and arg_spec is None:
                     arg_value = flat_bound_args_dict[arg_path]
-                    if arg_value is not None:
+                    if arg_value is not None and warn:
                         logging.warning(
                             "Received unexpected argument `%s` for path %s, replaced with "
                             "None.",
@@ -210,16 +281,72 @@ class PermissiveModel:
                 filtered_flat_bound_args.get(arg_path, None)
                 for arg_path, _ in flat_canonical_args
             ]
+            return tree.unflatten_as(canonical_args, full_flat_bound_args)
+
+        def get_layout(args, kwargs) -> Sequence[Optional[int]]:
+            """Returns the index in the flattened arguments of each canonical one."""
+            arguments = (args, kwargs)
+            placeholders = [_Leaf(n) for n in range(len(tree.flatten(arguments)))]
+            args, kwargs = tree.unflatten_as(arguments, placeholders)
+            filtered = filter_arguments(args, kwargs, warn=False)
+            return tuple(
+                leaf.index if isinstance(leaf, _Leaf) else None
+                for leaf in tree.flatten(filtered)
+            )
+
+        if all(
+            spec is None or isinstance(spec, tf.TensorSpec)
+            for spec in flat_canonical_specs
+        ):
+            direct_func = concrete_func
+            if self._jit_compile:
+                direct_func = tf.function(concrete_func, jit_compile=True)
+        else:
+            # Non-tensor arguments must be matched by the restored function.
+            direct_func = None
+
+        def call_direct(layout, args, kwargs):
+            """Calls the function with the arguments at the cached layout."""
+            flat_args = tree.flatten((args, kwargs))
+            flat_filtered = []
+            for index, spec in zip(layout, flat_canonical_specs):
+                if index is None or spec is None:
+                    flat_filtered.append(None)
+                elif direct_func is None:
+                    flat_filtered.append(flat_args[index])
+                else:
+                    value = tf.convert_to_tensor(flat_args[index], dtype=spec.dtype)
+                    flat_filtered.append(value)
             filtered_args, filtered_kwargs = tree.unflatten_as(
-                canonical_args, full_flat_bound_args
+                canonical_args, flat_filtered
             )
+            if direct_func is None:
+                return tf_func(*filtered_args, **filtered_kwargs)
+            else:
+                return direct_func(*filtered_args, **filtered_kwargs)
+
+        layouts: Dict[Hashable, Sequence[Optional[int]]] = {}
 
-            return tf_func(*filtered_args, **filtered_kwargs)
+        def func(*args, **kwargs):
+            try:
+                key = _structure_key((args, kwargs))
+            except _NotCacheable:
+                key = None
+            layout = layouts.get(key)
+            if layout is not None:
+                return call_direct(layout, args, kwargs)
+
+            # First call with this structure: validate it on the permissive path.
+            filtered_args, filtered_kwargs = filter_arguments(args, kwargs)
+            result = tf_func(*filtered_args, **filtered_kwargs)
+            if key is not None:
+                layouts[key] = get_layout(args, kwargs)
+            return result
 
         return _Function(
             func,
             copy.deepcopy(self.signatures[name]),
-            copy.deepcopy(concrete_func.structured_input_signature),
+            copy.deepcopy(canonical_args),
         )
 
 
@@ -0,0 +1,90 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for permissive_model."""
+
+import inspect
+import tempfile
+
+from absl.testing import absltest
+from absl.testing import parameterized
+import numpy as np
+import tensorflow as tf
+
+from meltingpot.python.utils.bots import permissive_model
+
+_OBSERVATION_SPEC = {
+    "a": tf.TensorSpec([None], tf.float32),
+    "b": tf.TensorSpec([None], tf.float32),
+}
+
+
+class _Model(tf.Module):
+    """A model exporting the functions used by PermissiveModel."""
+
+    @tf.function(input_signature=[_OBSERVATION_SPEC, tf.TensorSpec([], tf.float32)])
+    def step(self, observation, scale):
+        return (observation["a"] + observation["b"]) * scale
+
+    @tf.function(input_signature=[])
+    def function_signatures(self):
+        kind = int(inspect.Parameter.POSITIONAL_OR_KEYWORD)
+        return {"step": [(b"observation", kind), (b"scale", kind)]}
+
+    @tf.function(input_signature=[])
+    def function_tables(self):
+        return {}
+
+
+def _observation(**values):
+    return {key: np.array(value, dtype=np.float32) for key, value in values.items()}
+
+
+class PermissiveModelTest(parameterized.TestCase):
+    def _load(self, jit_compile=False):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = directory.name
+        tf.saved_model.save(_Model(), path)
+        return permissive_model.PermissiveModel(
+            tf.saved_model.load(path), jit_compile=jit_compile
+        )
+
+    @parameterized.parameters(False, True)
+    def test_repeated_calls(self, jit_compile):
+        model = self._load(jit_compile=jit_compile)
+        observation = _observation(a=[1, 2], b=[3, 4], c=[0])
+        first = model.step(observation=observation, scale=2.0)
+        second = model.step(observation=observation, scale=3.0)
+        with self.subTest("first"):
+            np.testing.assert_equal(first.numpy(), [8, 12])
+        with self.subTest("second"):
+            np.testing.assert_equal(second.numpy(), [12, 18])
+
+    def test_structure_change(self):
+        model = self._load()
+        model.step(observation=_observation(a=[1], b=[1], c=[1]), scale=1.0)
+        model.step(observation=_observation(a=[1], b=[1], c=[1]), scale=1.0)
+        actual = model.step(_observation(a=[1], b=[2]), 2.0)
+        np.testing.assert_equal(actual.numpy(), [6])
+
+    def test_missing_argument_after_cached_call(self):
+        model = self._load()
+        model.step(observation=_observation(a=[1], b=[1]), scale=1.0)
+        model.step(observation=_observation(a=[1], b=[1]), scale=1.0)
+        with self.assertRaises(ValueError):
+            model.step(observation=_observation(a=[1]), scale=1.0)
+
+
+if __name__ == "__main__":
+    absltest.main()
@@ -48,12 +48,19 @@ as the original, single-player versions:
   all_observations_ at that same timestep.
 - The actions an agent provides to step() are included in the observations
   immediately returned from step().
+
+In read-only mode (`read_only=True`) the shared observations are written into
+buffers allocated once, and all players share the same immutable mapping of
+read-only arrays instead of each receiving a deep copy. These arrays are
+overwritten by the next call to reset() or step(), so copy them if they need to
+be kept.
 """
 
 import copy
-from typing import Collection, Mapping, Sequence
+from typing import Any, Collection, Mapping, Sequence
 
 import dm_env
+import immutabledict
 import numpy as np
 
 from meltingpot.python.utils.scenarios.wrappers import base
@@ -64,6 +71,63 @@ REWARDS_KEY = "rewards"
 ACTIONS_KEY = "actions"
 
 
+def _read_only_view(array: np.ndarray) -> np.ndarray:
+    """Returns a read-only view of array that reflects writes to it."""
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+class SharedBuffers:
+    """Preallocated buffers holding the shared observations of all players."""
+
+    def __init__(self, shared_observation_spec: Mapping[str, Any]) -> None:
+        """Allocates the buffers.
+
+    Args:
+      shared_observation_spec: the spec of the shared observations, as found
+        under GLOBAL_KEY in the wrapper's observation spec.
+    """
+        self._buffers = {}
+        observation = {}
+        for key, spec in shared_observation_spec.items():
+            if key == OBSERVATIONS_KEY:
+                self._buffers[key] = {
+                    name: np.zeros(array_spec.shape, array_spec.dtype)
+                    for name, array_spec in spec.items()
+                }
+                observation[key] = immutabledict.immutabledict(
+                    {
+                        name: _read_only_view(buffer)
+                        for name, buffer in self._buffers[key].items()
+                    }
+                )
+            else:
+                self._buffers[key] = np.zeros(spec.shape, spec.dtype)
+                observation[key] = _read_only_view(self._buffers[key])
+        self._observation = immutabledict.immutabledict(observation)
+
+    @property
+    def observation(self) -> Mapping[str, Any]:
+        """Immutable mapping of read-only views of the buffers."""
+        return self._observation
+
+    def write(
+        self,
+        observations: Sequence[Mapping[str, np.ndarray]],
+        rewards: Sequence[np.ndarray],
+        actions: Sequence[np.ndarray],
+    ) -> None:
+        """Writes the shared observations of all players into the buffers."""
+        for name, buffer in self._buffers.get(OBSERVATIONS_KEY, {}).items():
+            for n, observation in enumerate(observations):
+                buffer[n] = observation[name]
+        if REWARDS_KEY in self._buffers:
+            self._buffers[REWARDS_KEY][:] = rewards
+        if ACTIONS_KEY in self._buffers:
+            self._buffers[ACTIONS_KEY][:] = actions
+
+
 class Wrapper(base.Wrapper):
     """Exposes actions/observations/rewards from all players to all players."""
 
@@ -73,6 +137,7 @@ class Wrapper(base.Wrapper):
         observations_to_share: Collection[str] = (),
         share_actions: bool = False,
         share_rewards: bool = False,
+        read_only: bool = False,
     ) -> None:
         """Wraps an environment.
 
@@ -82,6 +147,8 @@ class Wrapper(base.Wrapper):
       observations_to_share: observation keys to share with other players.
       share_actions: whether to show other players actions.
       share_rewards: whether to show other players rewards.
+      read_only: whether to share one immutable mapping of read-only arrays,
+        overwritten in place each step, between all players.
     """
         super().__init__(env)
         self._observations_to_share = observations_to_share
@@ -92,6 +159,11 @@ class Wrapper(base.Wrapper):
         self._num_players = len(action_spec)
         self._missing_actions = [spec.generate_value() for spec in action_spec]
 
+        if read_only:
+            self._buffers = SharedBuffers(self.observation_spec()[0][GLOBAL_KEY])
+        else:
+            self._buffers = None
+
     def _shared_observation(
         self,
         observations: Sequence[Mapping[str, np.ndarray]],
@@ -121,6 +193,8 @@ class Wrapper(base.Wrapper):
         self, timestep: dm_env.TimeStep, actions: Sequence[np.ndarray]
     ) -> dm_env.TimeStep:
         """Returns timestep with shared observations."""
+        if self._buffers is not None:
+            return self._read_only_timestep(timestep, actions)
         shared_observation = self._shared_observation(
             observations=timestep.observation, rewards=timestep.reward, actions=actions
         )
@@ -131,6 +205,21 @@ class Wrapper(base.Wrapper):
             observation[GLOBAL_KEY] = copy.deepcopy(shared_observation)
         return timestep._replace(observation=observations)
 
+    def _read_only_timestep(
+        self, timestep: dm_env.TimeStep, actions: Sequence[np.ndarray]
+    ) -> dm_env.TimeStep:
+        """Returns timestep sharing the read-only observation with all players."""
+        if not self._buffers.observation:
+            return timestep
+        self._buffers.write(
+            observations=timestep.observation, rewards=timestep.reward, actions=actions
+        )
+        observations = [
+            dict(obs, **{GLOBAL_KEY: self._buffers.observation})
+            for obs in timestep.observation
+        ]
+        return timestep._replace(observation=observations)
+
     def reset(self) -> dm_env.TimeStep:
         """See base class."""
         timestep = super().reset()
@@ -0,0 +1,108 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks the per-step cost of all_observations_wrapper.
+
+Compares the default mode (a deep copy of the shared observations for every
+player) with read-only mode (one preallocated mapping shared by all players) on
+a substrate with the observations used by `scenario.build`.
+
+Usage: python all_observations_wrapper_benchmark.py --num_players=16
+"""
+
+import argparse
+import timeit
+
+import dm_env
+import numpy as np
+
+from meltingpot.python.utils.scenarios.wrappers import all_observations_wrapper
+from meltingpot.python.utils.scenarios.wrappers import base
+
+_RGB_SPEC = dm_env.specs.Array(shape=[88, 88, 3], dtype=np.uint8, name="RGB")
+_POSITION_SPEC = dm_env.specs.Array(shape=[2], dtype=np.int32, name="POSITION")
+_REWARD_SPEC = dm_env.specs.Array(shape=[], dtype=np.float64, name="REWARD")
+_ACTION_SPEC = dm_env.specs.DiscreteArray(num_values=8, name="action")
+
+
+class _ConstantSubstrate(base.Wrapper):
+    """Substrate that returns the same timestep every step."""
+
+    def __init__(self, num_players: int) -> None:
+        super().__init__(env=None)
+        self._num_players = num_players
+        self._timestep = dm_env.transition(
+            reward=[0.0] * num_players,
+            observation=[
+                {
+                    "RGB": _RGB_SPEC.generate_value(),
+                    "POSITION": np.array([n, n], dtype=np.int32),
+                }
+                for n in range(num_players)
+            ],
+        )
+
+    def reset(self):
+        return self._timestep
+
+    def step(self, actions):
+        del actions
+        return self._timestep
+
+    def observation_spec(self):
+        return [{"RGB": _RGB_SPEC, "POSITION": _POSITION_SPEC}] * self._num_players
+
+    def reward_spec(self):
+        return [_REWARD_SPEC] * self._num_players
+
+    def action_spec(self):
+        return [_ACTION_SPEC] * self._num_players
+
+    def close(self):
+        pass
+
+
+def _time_per_step(num_players: int, num_steps: int, read_only: bool) -> float:
+    """Returns the mean time in seconds of a wrapped step."""
+    env = all_observations_wrapper.Wrapper(
+        _ConstantSubstrate(num_players),
+        observations_to_share=["POSITION"],
+        share_actions=True,
+        read_only=read_only,
+    )
+    actions = [0] * num_players
+    env.reset()
+    return timeit.timeit(lambda: env.step(actions), number=num_steps) / num_steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--num_players", type=int, default=16, help="Number of players"
+    )
+    parser.add_argument(
+        "--num_steps", type=int, default=10000, help="Number of steps to time"
+    )
+    args = parser.parse_args()
+
+    times = {
+        "default": _time_per_step(args.num_players, args.num_steps, read_only=False),
+        "read_only": _time_per_step(args.num_players, args.num_steps, read_only=True),
+    }
+    for mode, seconds in times.items():
+        print(f"{mode:>10}: {seconds * 1e6:8.1f} us/step")
+    print(f"   speedup: {times['default'] / times['read_only']:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
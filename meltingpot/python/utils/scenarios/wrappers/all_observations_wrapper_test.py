@@ -13,6 +13,7 @@
 # limitations under the License.
 """Tests for all_observations_wrapper."""
 
+from typing import Mapping
 from unittest import mock
 
 from absl.testing import absltest
@@ -36,6 +37,14 @@ ACTION_SPEC = dm_env.specs.DiscreteArray(num_values=5, dtype=np.int32)
 REWARD_SPEC = dm_env.specs.Array(shape=[], dtype=np.float32)
 
 
+def _as_dict(value):
+    """Converts nested mappings to dicts, for comparison with assert_equal."""
+    if isinstance(value, Mapping):
+        return {key: _as_dict(item) for key, item in value.items()}
+    else:
+        return value
+
+
 class AllObservationsWrapperTest(parameterized.TestCase):
     def test_observation_spec(self):
         env = mock.Mock(spec_set=base.Substrate)
@@ -167,6 +176,64 @@ class AllObservationsWrapperTest(parameterized.TestCase):
         )
         np.testing.assert_equal(actual, expected)
 
+    def test_read_only_step(self):
+        env = mock.Mock(spec_set=base.Substrate)
+        env.observation_spec.return_value = [
+            {
+                OBSERVATION_1: dm_env.specs.Array(shape=[1], dtype=np.float32),
+                OBSERVATION_2: dm_env.specs.Array(shape=[2], dtype=np.float32),
+            }
+        ] * 2
+        env.action_spec.return_value = [ACTION_SPEC] * 2
+        env.reward_spec.return_value = [REWARD_SPEC] * 2
+        env.step.side_effect = [
+            dm_env.transition(
+                reward=[np.array(n + 1), np.array(n + 2)],
+                observation=[
+                    {OBSERVATION_1: np.ones([1]) * n, OBSERVATION_2: np.ones([2])},
+                    {OBSERVATION_1: np.ones([1]) * -n, OBSERVATION_2: np.ones([2])},
+                ],
+            )
+            for n in range(2)
+        ]
+        wrapped = all_observations_wrapper.Wrapper(
+            env,
+            observations_to_share=[OBSERVATION_1],
+            share_actions=True,
+            share_rewards=True,
+            read_only=True,
+        )
+
+        first = wrapped.step([np.array(3), np.array(4)])
+        first_shared = [obs[GLOBAL_KEY] for obs in first.observation]
+        with self.subTest("shared_by_all_players"):
+            self.assertIs(first_shared[0], first_shared[1])
+        with self.subTest("first_step"):
+            np.testing.assert_equal(
+                _as_dict(first_shared[0]),
+                {
+                    OBSERVATIONS_KEY: {OBSERVATION_1: np.array([[0.0], [0.0]])},
+                    REWARDS_KEY: np.array([1, 2], dtype=np.float32),
+                    ACTIONS_KEY: np.array([3, 4], dtype=np.int32),
+                },
+            )
+        with self.subTest("read_only"):
+            with self.assertRaises(ValueError):
+                first_shared[0][ACTIONS_KEY][0] = 0
+
+        second = wrapped.step([np.array(1), np.array(0)])
+        with self.subTest("second_step"):
+            np.testing.assert_equal(
+                _as_dict(second.observation[0][GLOBAL_KEY]),
+                {
+                    OBSERVATIONS_KEY: {OBSERVATION_1: np.array([[1.0], [-1.0]])},
+                    REWARDS_KEY: np.array([2, 3], dtype=np.float32),
+                    ACTIONS_KEY: np.array([1, 0], dtype=np.int32),
+                },
+            )
+        with self.subTest("buffers_are_reused"):
+            self.assertIs(second.observation[0][GLOBAL_KEY], first_shared[0])
+
 
 if __name__ == "__main__":
     absltest.main()
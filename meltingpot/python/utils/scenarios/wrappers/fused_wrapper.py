@@ -0,0 +1,262 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""A single wrapper equivalent to the wrapper stack used by scenarios.
+
+Wraps a dmlab2d environment (as returned by `builder.builder`), producing the
+same specs and timesteps as the stack:
+
+  multiplayer_wrapper
+  -> discrete_action_wrapper
+  -> all_observations_wrapper (read-only)
+  -> agent_slot_wrapper
+  -> default_observation_wrapper (one per default observation)
+
+but in a single pass that reuses preallocated containers. The list of player
+observation dicts, the list of rewards and the dmlab2d action dict are created
+once and updated in place, and constant observations (the agent slot one-hots
+and default observations) are read-only arrays written once.
+
+Timesteps therefore share their containers with later timesteps: copy anything
+that needs to be kept beyond the next call to reset() or step().
+"""
+
+from typing import Any, Collection, List, Mapping, Optional, Sequence, Tuple
+
+import dm_env
+import numpy as np
+
+from meltingpot.python import substrate
+from meltingpot.python.utils.scenarios.wrappers import agent_slot_wrapper
+from meltingpot.python.utils.scenarios.wrappers import all_observations_wrapper
+from meltingpot.python.utils.scenarios.wrappers import base
+from meltingpot.python.utils.scenarios.wrappers import default_observation_wrapper
+from meltingpot.python.utils.substrates.wrappers import base as substrate_base
+from meltingpot.python.utils.substrates.wrappers import discrete_action_wrapper
+from meltingpot.python.utils.substrates.wrappers import multiplayer_wrapper
+
+GLOBAL_KEY = all_observations_wrapper.GLOBAL_KEY
+AGENT_SLOT = agent_slot_wrapper.AGENT_SLOT
+
+# The dmlab2d key and value of each part of an action.
+_Lab2dAction = Tuple[Tuple[str, np.ndarray], ...]
+
+
+class _SpecsOnly(substrate_base.Wrapper):
+    """Exposes the specs of an environment without taking ownership of it.
+
+  Used to build the equivalent wrapper stack, from which the specs are read.
+  """
+
+    def reset(self, *args, **kwargs):
+        raise NotImplementedError("Only specs are available.")
+
+    def step(self, *args, **kwargs):
+        raise NotImplementedError("Only specs are available.")
+
+    def close(self, *args, **kwargs):
+        pass
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    array = np.array(array)
+    array.flags.writeable = False
+    return array
+
+
+class Wrapper(base.Wrapper):
+    """Fused, preallocated equivalent of the scenario wrapper stack."""
+
+    def __init__(
+        self,
+        env,
+        individual_observation_names: Sequence[str],
+        global_observation_names: Sequence[str],
+        action_table: Sequence[Mapping[str, Any]],
+        observations_to_share: Collection[str] = (),
+        share_actions: bool = False,
+        share_rewards: bool = False,
+        default_observations: Optional[Mapping[str, np.ndarray]] = None,
+        separate_global_observations: bool = False,
+    ) -> None:
+        """Initializes the wrapper.
+
+    Args:
+      env: dmlab2d environment to wrap. When this wrapper closes env will also be
+        closed.
+      individual_observation_names: see `multiplayer_wrapper.Wrapper`.
+      global_observation_names: see `multiplayer_wrapper.Wrapper`.
+      action_table: see `discrete_action_wrapper.Wrapper`.
+      observations_to_share: see `all_observations_wrapper.Wrapper`.
+      share_actions: see `all_observations_wrapper.Wrapper`.
+      share_rewards: see `all_observations_wrapper.Wrapper`.
+      default_observations: observations to add to each player if missing, with
+        their default values. See `default_observation_wrapper.Wrapper`.
+      separate_global_observations: see `multiplayer_wrapper.Wrapper`.
+    """
+        super().__init__(env)
+        default_observations = dict(default_observations or {})
+        # Building the equivalent stack validates the arguments and gives specs.
+        equivalent = multiplayer_wrapper.Wrapper(
+            _SpecsOnly(env),
+            individual_observation_names=individual_observation_names,
+            global_observation_names=global_observation_names,
+            separate_global_observations=separate_global_observations,
+        )
+        player_action_spec = equivalent.action_spec()
+        equivalent = discrete_action_wrapper.Wrapper(
+            equivalent, action_table=action_table
+        )
+        equivalent = all_observations_wrapper.Wrapper(
+            substrate.Substrate(equivalent),
+            observations_to_share=observations_to_share,
+            share_actions=share_actions,
+            share_rewards=share_rewards,
+            read_only=True,
+        )
+        equivalent = agent_slot_wrapper.Wrapper(equivalent)
+        for key, value in default_observations.items():
+            equivalent = default_observation_wrapper.Wrapper(
+                equivalent, key=key, default_value=value
+            )
+        self._observation_spec = equivalent.observation_spec()
+        self._global_observation_spec = equivalent.global_observation_spec()
+        self._action_spec = equivalent.action_spec()
+        self._reward_spec = equivalent.reward_spec()
+        equivalent.close()
+
+        num_players = len(self._action_spec)
+        self._num_players = num_players
+        self._separate_global_observations = separate_global_observations
+        self._global_observation_names = tuple(global_observation_names)
+        source_spec = env.observation_spec()
+        self._individual_keys = tuple(
+            tuple(
+                (suffix, f"{n + 1}.{suffix}")
+                for suffix in individual_observation_names
+                if f"{n + 1}.{suffix}" in source_spec
+            )
+            for n in range(num_players)
+        )
+        self._reward_keys = tuple(f"{n + 1}.REWARD" for n in range(num_players))
+        self._lab2d_actions = self._get_lab2d_actions(
+            action_table, player_action_spec
+        )
+
+        self._shared = all_observations_wrapper.SharedBuffers(
+            self._observation_spec[0][GLOBAL_KEY]
+        )
+        self._missing_actions = [0] * num_players
+        self._observations: List[dict] = []
+        agent_slots = np.eye(num_players, dtype=np.float32)
+        for n in range(num_players):
+            constants = {AGENT_SLOT: _read_only(agent_slots[n])}
+            if self._shared.observation:
+                constants[GLOBAL_KEY] = self._shared.observation
+            provided = {suffix for suffix, _ in self._individual_keys[n]}
+            if not separate_global_observations:
+                provided.update(global_observation_names)
+            for key, value in default_observations.items():
+                if key not in provided and key not in constants:
+                    constants[key] = _read_only(value)
+            self._observations.append(constants)
+        self._rewards = [None] * num_players
+        self._global_observation = {}
+        self._action = {}
+
+    def _get_lab2d_actions(
+        self,
+        action_table: Sequence[Mapping[str, Any]],
+        player_action_spec: Sequence[Mapping[str, dm_env.specs.Array]],
+    ) -> Sequence[Sequence[_Lab2dAction]]:
+        """Returns the dmlab2d action parts for each player and discrete action."""
+        lab2d_actions = []
+        for n, action_spec in enumerate(player_action_spec):
+            player_actions = []
+            for action in action_table:
+                parts = []
+                for key, value in action.items():
+                    value = np.array(value, dtype=action_spec[key].dtype)
+                    value.flags.writeable = False
+                    parts.append((f"{n + 1}.{key}", value))
+                player_actions.append(tuple(parts))
+            lab2d_actions.append(tuple(player_actions))
+        return tuple(lab2d_actions)
+
+    def _update_observations(self, source: Mapping[str, np.ndarray]) -> None:
+        """Writes the values of a dmlab2d observation into the player dicts."""
+        for observation, keys in zip(self._observations, self._individual_keys):
+            for suffix, key in keys:
+                try:
+                    observation[suffix] = source[key]
+                except KeyError:
+                    observation.pop(suffix, None)
+        if self._separate_global_observations:
+            for name in self._global_observation_names:
+                self._global_observation[name] = source[name]
+        else:
+            for name in self._global_observation_names:
+                value = source[name]
+                for observation in self._observations:
+                    observation[name] = value
+        for n, key in enumerate(self._reward_keys):
+            self._rewards[n] = source.get(key)
+
+    def _get_timestep(
+        self, source: dm_env.TimeStep, actions: Sequence[int]
+    ) -> dm_env.TimeStep:
+        """Returns the timestep for a dmlab2d timestep."""
+        self._update_observations(source.observation)
+        if self._shared.observation:
+            self._shared.write(
+                observations=self._observations, rewards=self._rewards, actions=actions
+            )
+        timestep = dm_env.TimeStep(
+            step_type=source.step_type,
+            reward=self._rewards,
+            discount=0.0 if source.discount is None else source.discount,
+            observation=self._observations,
+        )
+        if self._separate_global_observations:
+            return multiplayer_wrapper.TimeStep(
+                *timestep, global_observation=self._global_observation
+            )
+        else:
+            return timestep
+
+    def reset(self) -> dm_env.TimeStep:
+        """See base class."""
+        return self._get_timestep(self._env.reset(), self._missing_actions)
+
+    def step(self, actions: Sequence[int]) -> dm_env.TimeStep:
+        """See base class."""
+        for player_actions, action in zip(self._lab2d_actions, actions):
+            for key, value in player_actions[int(action)]:
+                self._action[key] = value
+        return self._get_timestep(self._env.step(self._action), actions)
+
+    def observation_spec(self) -> Sequence[Mapping[str, dm_env.specs.Array]]:
+        """See base class."""
+        return list(self._observation_spec)
+
+    def global_observation_spec(self) -> Mapping[str, dm_env.specs.Array]:
+        """See base class."""
+        return dict(self._global_observation_spec)
+
+    def action_spec(self) -> Sequence[dm_env.specs.DiscreteArray]:
+        """See base class."""
+        return self._action_spec
+
+    def reward_spec(self) -> Sequence[dm_env.specs.Array]:
+        """See base class."""
+        return list(self._reward_spec)
@@ -0,0 +1,169 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Benchmarks the per-step allocations of fused_wrapper against the stack.
+
+Both are run over a stub dmlab2d environment that returns the same observations
+every step, so only the cost of the wrappers themselves is measured. Reports
+the time per step and the peak memory allocated by Python during each step.
+
+Usage: python fused_wrapper_benchmark.py --num_players=16
+"""
+
+import argparse
+import timeit
+import tracemalloc
+
+import dm_env
+import numpy as np
+
+from meltingpot.python import substrate
+from meltingpot.python.utils.scenarios.wrappers import agent_slot_wrapper
+from meltingpot.python.utils.scenarios.wrappers import all_observations_wrapper
+from meltingpot.python.utils.scenarios.wrappers import default_observation_wrapper
+from meltingpot.python.utils.scenarios.wrappers import fused_wrapper
+from meltingpot.python.utils.substrates.wrappers import discrete_action_wrapper
+from meltingpot.python.utils.substrates.wrappers import multiplayer_wrapper
+
+_INDIVIDUAL_OBSERVATIONS = ("RGB", "READY_TO_SHOOT", "POSITION", "ORIENTATION")
+_GLOBAL_OBSERVATIONS = ("WORLD.RGB",)
+_ACTION_TABLE = tuple({"move": n, "turn": 0} for n in range(5))
+_SPECS = {
+    "RGB": dm_env.specs.Array(shape=[88, 88, 3], dtype=np.uint8),
+    "READY_TO_SHOOT": dm_env.specs.Array(shape=[], dtype=np.float64),
+    "POSITION": dm_env.specs.Array(shape=[2], dtype=np.int32),
+    "ORIENTATION": dm_env.specs.Array(shape=[], dtype=np.int32),
+    "REWARD": dm_env.specs.Array(shape=[], dtype=np.float64),
+}
+_WORLD_SPEC = dm_env.specs.Array(shape=[168, 240, 3], dtype=np.uint8)
+_ACTION_SPEC = dm_env.specs.BoundedArray(
+    shape=[], dtype=np.int32, minimum=-1, maximum=4
+)
+
+
+class _StubLab2d:
+    """A dmlab2d environment that returns the same observations every step."""
+
+    def __init__(self, num_players: int) -> None:
+        self._observation_spec = {"WORLD.RGB": _WORLD_SPEC}
+        for n in range(num_players):
+            for name, spec in _SPECS.items():
+                self._observation_spec[f"{n + 1}.{name}"] = spec
+        self._action_spec = {}
+        for n in range(num_players):
+            self._action_spec[f"{n + 1}.move"] = _ACTION_SPEC
+            self._action_spec[f"{n + 1}.turn"] = _ACTION_SPEC
+        observation = {
+            key: spec.generate_value() for key, spec in self._observation_spec.items()
+        }
+        self._timestep = dm_env.transition(reward=None, observation=observation)
+
+    def reset(self):
+        return self._timestep
+
+    def step(self, action):
+        del action
+        return self._timestep
+
+    def observation_spec(self):
+        return self._observation_spec
+
+    def action_spec(self):
+        return self._action_spec
+
+    def discount_spec(self):
+        return dm_env.specs.BoundedArray(
+            shape=[], dtype=np.float64, minimum=0, maximum=1
+        )
+
+    def close(self):
+        pass
+
+
+def _build_stack(num_players: int) -> substrate.Substrate:
+    """Returns the wrapper stack used by `scenario.build`."""
+    env = multiplayer_wrapper.Wrapper(
+        _StubLab2d(num_players),
+        individual_observation_names=_INDIVIDUAL_OBSERVATIONS,
+        global_observation_names=_GLOBAL_OBSERVATIONS,
+    )
+    env = discrete_action_wrapper.Wrapper(env, action_table=_ACTION_TABLE)
+    env = all_observations_wrapper.Wrapper(
+        substrate.Substrate(env),
+        observations_to_share=["POSITION"],
+        share_actions=True,
+        read_only=True,
+    )
+    env = agent_slot_wrapper.Wrapper(env)
+    return default_observation_wrapper.Wrapper(
+        env, key="INVENTORY", default_value=np.zeros([1])
+    )
+
+
+def _build_fused(num_players: int) -> substrate.Substrate:
+    """Returns the fused equivalent of `_build_stack`."""
+    return fused_wrapper.Wrapper(
+        _StubLab2d(num_players),
+        individual_observation_names=_INDIVIDUAL_OBSERVATIONS,
+        global_observation_names=_GLOBAL_OBSERVATIONS,
+        action_table=_ACTION_TABLE,
+        observations_to_share=["POSITION"],
+        share_actions=True,
+        default_observations={"INVENTORY": np.zeros([1])},
+    )
+
+
+def _measure(env: substrate.Substrate, num_players: int, num_steps: int):
+    """Returns the mean time and peak allocation in bytes of a step."""
+    actions = [n % len(_ACTION_TABLE) for n in range(num_players)]
+    env.reset()
+    env.step(actions)
+    seconds = timeit.timeit(lambda: env.step(actions), number=num_steps)
+
+    peak_bytes = 0
+    tracemalloc.start()
+    try:
+        for _ in range(num_steps):
+            tracemalloc.clear_traces()
+            env.step(actions)
+            peak_bytes += tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return seconds / num_steps, peak_bytes / num_steps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--num_players", type=int, default=16, help="Number of players"
+    )
+    parser.add_argument(
+        "--num_steps", type=int, default=10000, help="Number of steps to measure"
+    )
+    args = parser.parse_args()
+
+    builders = {"stack": _build_stack, "fused": _build_fused}
+    for name, build in builders.items():
+        env = build(args.num_players)
+        try:
+            seconds, peak_bytes = _measure(env, args.num_players, args.num_steps)
+        finally:
+            env.close()
+        print(
+            f"{name:>6}: {seconds * 1e6:8.1f} us/step, "
+            f"{peak_bytes:8.0f} bytes allocated/step"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for fused_wrapper."""
+
+from typing import Mapping
+from unittest import mock
+
+from absl.testing import absltest
+from absl.testing import parameterized
+import dm_env
+import dmlab2d
+import numpy as np
+
+from meltingpot.python import substrate
+from meltingpot.python.utils.scenarios.wrappers import agent_slot_wrapper
+from meltingpot.python.utils.scenarios.wrappers import all_observations_wrapper
+from meltingpot.python.utils.scenarios.wrappers import default_observation_wrapper
+from meltingpot.python.utils.scenarios.wrappers import fused_wrapper
+from meltingpot.python.utils.substrates.wrappers import discrete_action_wrapper
+from meltingpot.python.utils.substrates.wrappers import multiplayer_wrapper
+
+NUM_PLAYERS = 3
+RGB_SPEC = dm_env.specs.Array(shape=[2, 2, 3], dtype=np.uint8)
+POSITION_SPEC = dm_env.specs.Array(shape=[2], dtype=np.int32)
+REWARD_SPEC = dm_env.specs.Array(shape=[], dtype=np.float64)
+MOVE_SPEC = dm_env.specs.BoundedArray(shape=[], dtype=np.int32, minimum=0, maximum=4)
+ACTION_TABLE = ({"move": 0}, {"move": 1}, {"move": 2})
+DEFAULT_OBSERVATIONS = {"INVENTORY": np.zeros([1])}
+
+
+def _lab2d_observation(step: int) -> Mapping[str, np.ndarray]:
+    observation = {"WORLD.RGB": np.full([4, 4, 3], step, dtype=np.uint8)}
+    for n in range(NUM_PLAYERS):
+        observation[f"{n + 1}.RGB"] = np.full([2, 2, 3], step + n, dtype=np.uint8)
+        observation[f"{n + 1}.POSITION"] = np.array([step, n], dtype=np.int32)
+        observation[f"{n + 1}.REWARD"] = np.float64(step * n)
+    return observation
+
+
+def _mock_lab2d():
+    """Returns a mock dmlab2d environment and a list of the actions it receives."""
+    env = mock.Mock(spec_set=dmlab2d.Environment)
+    action_spec = {f"{n + 1}.move": MOVE_SPEC for n in range(NUM_PLAYERS)}
+    env.action_spec.return_value = action_spec
+    env.observation_spec.return_value = {
+        "WORLD.RGB": dm_env.specs.Array(shape=[4, 4, 3], dtype=np.uint8),
+        **{f"{n + 1}.RGB": RGB_SPEC for n in range(NUM_PLAYERS)},
+        **{f"{n + 1}.POSITION": POSITION_SPEC for n in range(NUM_PLAYERS)},
+        **{f"{n + 1}.REWARD": REWARD_SPEC for n in range(NUM_PLAYERS)},
+    }
+    env.reset.return_value = dm_env.restart(_lab2d_observation(0))
+    actions = []
+
+    def step(action):
+        # Record a copy, as the fused wrapper reuses its action dict.
+        actions.append(dict(action))
+        observation = _lab2d_observation(len(actions))
+        return dm_env.transition(reward=None, observation=observation)
+
+    env.step.side_effect = step
+    return env, actions
+
+
+def _build_stack(env, separate_global_observations):
+    env = multiplayer_wrapper.Wrapper(
+        env,
+        individual_observation_names=["RGB", "POSITION"],
+        global_observation_names=["WORLD.RGB"],
+        separate_global_observations=separate_global_observations,
+    )
+    env = discrete_action_wrapper.Wrapper(env, action_table=ACTION_TABLE)
+    env = all_observations_wrapper.Wrapper(
+        substrate.Substrate(env),
+        observations_to_share=["POSITION"],
+        share_actions=True,
+        read_only=True,
+    )
+    env = agent_slot_wrapper.Wrapper(env)
+    for key, value in DEFAULT_OBSERVATIONS.items():
+        env = default_observation_wrapper.Wrapper(env, key=key, default_value=value)
+    return env
+
+
+def _build_fused(env, separate_global_observations):
+    return fused_wrapper.Wrapper(
+        env,
+        individual_observation_names=["RGB", "POSITION"],
+        global_observation_names=["WORLD.RGB"],
+        action_table=ACTION_TABLE,
+        observations_to_share=["POSITION"],
+        share_actions=True,
+        default_observations=DEFAULT_OBSERVATIONS,
+        separate_global_observations=separate_global_observations,
+    )
+
+
+def _as_dicts(value):
+    """Copies nested mappings to dicts of arrays, for use with assert_equal."""
+    if isinstance(value, Mapping):
+        return {key: _as_dicts(item) for key, item in value.items()}
+    elif isinstance(value, list):
+        return [_as_dicts(item) for item in value]
+    else:
+        return np.array(value)
+
+
+def _copy_timestep(timestep):
+    """Copies a timestep whose containers may be reused by the next step."""
+    timestep = timestep._replace(
+        reward=list(timestep.reward), observation=_as_dicts(timestep.observation)
+    )
+    if isinstance(timestep, multiplayer_wrapper.TimeStep):
+        timestep = timestep._replace(
+            global_observation=_as_dicts(timestep.global_observation)
+        )
+    return timestep
+
+
+class FusedWrapperTest(parameterized.TestCase):
+    @parameterized.parameters(False, True)
+    def test_matches_wrapper_stack(self, separate_global_observations):
+        stack_env, stack_actions = _mock_lab2d()
+        fused_env, fused_actions = _mock_lab2d()
+        stack = _build_stack(stack_env, separate_global_observations)
+        fused = _build_fused(fused_env, separate_global_observations)
+
+        with self.subTest("observation_spec"):
+            self.assertEqual(fused.observation_spec(), stack.observation_spec())
+        with self.subTest("global_observation_spec"):
+            self.assertEqual(
+                fused.global_observation_spec(), stack.global_observation_spec()
+            )
+        with self.subTest("action_spec"):
+            self.assertEqual(fused.action_spec(), stack.action_spec())
+        with self.subTest("reward_spec"):
+            self.assertEqual(fused.reward_spec(), stack.reward_spec())
+
+        expected = [_copy_timestep(stack.reset())]
+        actual = [_copy_timestep(fused.reset())]
+        for actions in ([0, 1, 2], [2, 2, 0]):
+            expected.append(_copy_timestep(stack.step(actions)))
+            actual.append(_copy_timestep(fused.step(actions)))
+
+        with self.subTest("timesteps"):
+            np.testing.assert_equal(actual, expected)
+        with self.subTest("lab2d_actions"):
+            np.testing.assert_equal(fused_actions, stack_actions)
+
+    def test_containers_are_reused(self):
+        env, _ = _mock_lab2d()
+        fused = _build_fused(env, separate_global_observations=False)
+        reset = fused.reset()
+        step = fused.step([0, 0, 0])
+
+        with self.subTest("observation"):
+            self.assertIs(step.observation, reset.observation)
+        with self.subTest("reward"):
+            self.assertIs(step.reward, reset.reward)
+        with self.subTest("constants_are_read_only"):
+            slot = step.observation[0][agent_slot_wrapper.AGENT_SLOT]
+            self.assertFalse(slot.flags.writeable)
+
+    def test_closes_env(self):
+        env, _ = _mock_lab2d()
+        fused = _build_fused(env, separate_global_observations=False)
+        env.close.assert_not_called()
+        fused.close()
+        env.close.assert_called_once()
+
+
+if __name__ == "__main__":
+    absltest.main()
@@ -15,10 +15,11 @@
 
 import copy
 import itertools
+import json
 import os
 import pathlib  # pylint: disable=unused-import
 import random
-from typing import Any, Dict, Optional, Union
+from typing import Any, Collection, Dict, Optional, Union
 
 from absl import logging
 from ml_collections import config_dict
@@ -27,8 +28,11 @@ import tree
 import dmlab2d
 from dmlab2d import runfiles_helper
 from dmlab2d import settings_helper
+from meltingpot.python.utils.substrates import content_cache
 from meltingpot.python.utils.substrates import game_object_utils
+from meltingpot.python.utils.substrates import sprite_atlas
 from meltingpot.python.utils.substrates.wrappers import reset_wrapper
+from meltingpot.python.utils.substrates.wrappers import symbolic_observation_wrapper
 
 
 Settings = Union[config_dict.ConfigDict, Dict[str, Any]]
@@ -38,6 +42,15 @@ _MAX_SEED = 2 ** 32 - 1
 _DMLAB2D_ROOT = runfiles_helper.find()
 _MELTINGPOT_ROOT = str(pathlib.Path(__file__).parent.parent.parent.parent.parent)
 
+# Compiled lab2d settings, keyed by the content of the config and the code that
+# compiles it.
+_SETTINGS_CACHE = content_cache.ContentCache(
+    namespace="lab2d_settings",
+    encode=lambda settings: json.dumps(settings, sort_keys=True).encode(),
+    decode=json.loads,
+)
+_pipeline_fingerprint = None
+
 
 # Although to_dict in ConfigDict is recursive, it is not enough for our use case
 # because the recursion will _not_ go into the list elements. And we have plenty
@@ -143,10 +156,95 @@ def locate_and_overwrite_level_directory(lab2d_settings: config_dict.ConfigDict)
         lab2d_settings.levelDirectory = _MELTINGPOT_ROOT
 
 
+def _get_pipeline_fingerprint() -> str:
+    """Returns a fingerprint of the code that compiles lab2d settings."""
+    global _pipeline_fingerprint
+    if _pipeline_fingerprint is None:
+        _pipeline_fingerprint = content_cache.file_fingerprint(
+            __file__,
+            game_object_utils.__file__,
+            settings_helper.__file__,
+            sprite_atlas.__file__,
+        )
+    return _pipeline_fingerprint
+
+
+def compile_lab2d_settings(
+    lab2d_settings: Settings, prefab_overrides: Optional[Settings] = None
+) -> Dict[str, str]:
+    """Returns the flattened Lua settings for lab2d_settings.
+
+  Args:
+    lab2d_settings: a dict of environment designation args. Not modified.
+    prefab_overrides: overrides for prefabs.
+  """
+    # Copy config, so as not to modify it.
+    lab2d_settings = config_dict.ConfigDict(copy.deepcopy(lab2d_settings)).unlock()
+
+    apply_prefab_overrides(lab2d_settings, prefab_overrides)
+    maybe_build_and_add_avatar_objects(lab2d_settings)
+    locate_and_overwrite_level_directory(lab2d_settings)
+    atlas_settings = sprite_atlas.atlas_settings(
+        _config_dict_to_dict(lab2d_settings)
+    )
+    if atlas_settings is not None:
+        lab2d_settings.spriteAtlas = atlas_settings
+
+    # Convert settings from python to Lua format.
+    return parse_python_settings_for_dmlab2d(lab2d_settings)
+
+
+def cached_compile_lab2d_settings(
+    lab2d_settings: Settings, prefab_overrides: Optional[Settings] = None
+) -> Dict[str, str]:
+    """Like `compile_lab2d_settings`, but cached in memory and on disk.
+
+  The cache is keyed by the content of the arguments and of the code that
+  compiles them, so repeated builds of the same config skip compilation.
+
+  Args:
+    lab2d_settings: a dict of environment designation args. Not modified.
+    prefab_overrides: overrides for prefabs.
+
+  Returns:
+    A new dict that the caller may modify.
+  """
+    try:
+        key = content_cache.fingerprint(
+            _get_pipeline_fingerprint(),
+            _MELTINGPOT_ROOT,
+            lab2d_settings,
+            prefab_overrides,
+        )
+    except TypeError:
+        logging.info("lab2d_settings cannot be fingerprinted, so is not cached.")
+        return compile_lab2d_settings(lab2d_settings, prefab_overrides)
+    settings = _SETTINGS_CACHE.get_or_create(
+        key, lambda: compile_lab2d_settings(lab2d_settings, prefab_overrides)
+    )
+    return dict(settings)
+
+
+def _has_random_prefabs(lab2d_settings: Settings) -> bool:
+    """Returns whether building the game objects of the map draws prefabs."""
+    simulation = lab2d_settings["simulation"]
+    layout = simulation.get("map")
+    char_prefab_map = simulation.get("charPrefabMap") or {}
+    return any(
+        (layout is None or char in layout)
+        and not isinstance(prefab, str)
+        and prefab.get("type") == "choice"
+        for char, prefab in char_prefab_map.items()
+    )
+
+
 def builder(
     lab2d_settings: Settings,
     prefab_overrides: Optional[Settings] = None,
     env_seed: Optional[int] = None,
+    prefetch_depth: int = 0,
+    observation_names: Optional[Collection[str]] = None,
+    soft_reset: bool = False,
     **settings,
 ) -> dmlab2d.Environment:
     """Builds a Melting Pot environment.
@@ -155,6 +253,19 @@ def builder(
     lab2d_settings: a dict of environment designation args.
     prefab_overrides: overrides for prefabs.
     env_seed: the seed to pass to the environment.
+    prefetch_depth: number of environments for upcoming episodes to build in a
+      background thread while the current episode runs. The seed of each
+      episode is unaffected.
+    observation_names: the Lab2d names of the observations to compute each step
+      (e.g. "1.RGB", "WORLD.RGB"). Names the environment does not provide are
+      ignored. If None, every observation the environment provides is computed.
+    soft_reset: if True, reset restarts the episode in the same Lab2d instance
+      (resetting the game objects and respawning the avatars) instead of
+      building a new one, which skips parsing the settings, registering the
+      sprites and constructing the game objects. Each episode is started with
+      the same seed as when rebuilding. Random choices made while the game
+      objects are constructed are not redrawn. Cannot be combined with
+      prefetch_depth.
     **settings: Other settings which are not used by Melting Pot but can still
       be passed from the environment builder.
 
@@ -164,27 +275,36 @@ def builder(
     del settings  #  Not currently used by DMLab2D.
 
     assert "simulation" in lab2d_settings
+    if soft_reset and prefetch_depth:
+        raise ValueError("soft_reset cannot be combined with prefetch_depth.")
+    if soft_reset and _has_random_prefabs(lab2d_settings):
+        logging.warning(
+            "soft_reset keeps the prefabs randomly chosen for the map when the "
+            "environment is built, so they are the same in every episode."
+        )
 
-    # Copy config, so as not to modify it.
-    lab2d_settings = config_dict.ConfigDict(copy.deepcopy(lab2d_settings)).unlock()
-
-    apply_prefab_overrides(lab2d_settings, prefab_overrides)
-    maybe_build_and_add_avatar_objects(lab2d_settings)
-    locate_and_overwrite_level_directory(lab2d_settings)
-
-    # Convert settings from python to Lua format.
-    lab2d_settings_dict = parse_python_settings_for_dmlab2d(lab2d_settings)
-
-    # Only the raw environment has the properties API.
-    env_raw = dmlab2d.Lab2d(_DMLAB2D_ROOT, lab2d_settings_dict)
-    observation_names = env_raw.observation_names()
-    logging.info("available observation names: %s", observation_names)
+    lab2d_settings_dict = cached_compile_lab2d_settings(
+        lab2d_settings, prefab_overrides
+    )
 
     if env_seed is None:
         # Select a long seed different than zero.
         env_seed = random.randint(1, _MAX_SEED)
     env_seeds = (seed % (_MAX_SEED + 1) for seed in itertools.count(env_seed))
 
+    if soft_reset:
+        # Every episode runs in this instance, so give it the first seed.
+        lab2d_settings_dict["env_seed"] = str(env_seed)  # Sets the Lua seed.
+    # Only the raw environment has the properties API.
+    env_raw = dmlab2d.Lab2d(_DMLAB2D_ROOT, lab2d_settings_dict)
+    available_names = env_raw.observation_names()
+    logging.info("available observation names: %s", available_names)
+    if observation_names is None:
+        observation_names = available_names
+    else:
+        requested = frozenset(observation_names)
+        observation_names = [name for name in available_names if name in requested]
+
     def build_environment():
         seed = next(env_seeds)
         lab2d_settings_dict["env_seed"] = str(seed)  # Sets the Lua seed.
@@ -193,7 +313,22 @@ def builder(
             env=env_raw, observation_names=observation_names, seed=seed
         )
 
-    # Add a wrapper that rebuilds the environment when reset is called.
-    env = reset_wrapper.ResetWrapper(build_environment)
+    def restart_environment():
+        # The seed of the environment only determines the seeds of its episodes,
+        # so a new one over the same instance starts the episode that a rebuilt
+        # environment would.
+        return dmlab2d.Environment(
+            env=env_raw, observation_names=observation_names, seed=next(env_seeds)
+        )
+
+    # Add a wrapper that rebuilds (or restarts) the environment on reset.
+    if soft_reset:
+        env = reset_wrapper.ResetWrapper(restart_environment)
+    else:
+        env = reset_wrapper.ResetWrapper(
+            build_environment, prefetch_depth=prefetch_depth
+        )
+    if any(map(symbolic_observation_wrapper.is_symbolic, observation_names)):
+        env = symbolic_observation_wrapper.Wrapper(env)
 
     return env
@@ -0,0 +1,218 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Content-addressed caches, held in memory and on disk.
+
+Values are keyed by a `fingerprint` of everything they are computed from. The
+on-disk cache lives under $MELTINGPOT_CACHE_DIR if set (set it to an empty
+string to disable it), or ~/.cache/meltingpot otherwise. Entries are written
+atomically, so the cache can be shared by concurrent processes.
+"""
+
+import collections
+import hashlib
+import os
+import pathlib
+import tempfile
+import threading
+from typing import Any, Callable, Generic, Mapping, Optional, TypeVar
+
+from absl import logging
+from ml_collections import config_dict
+import numpy as np
+
+T = TypeVar("T")
+
+_CACHE_DIR_ENV = "MELTINGPOT_CACHE_DIR"
+
+
+def _canonical(value: Any) -> Any:
+    """Returns a canonical, repr-able form of value that preserves its content.
+
+  Args:
+    value: a nested structure of config dicts, mappings, sequences, arrays and
+      scalars.
+
+  Raises:
+    TypeError: if value contains anything else.
+  """
+    if isinstance(value, config_dict.ConfigDict):
+        value = value.to_dict()
+    if isinstance(value, Mapping):
+        items = sorted((str(key), _canonical(item)) for key, item in value.items())
+        return ("mapping", tuple(items))
+    elif isinstance(value, (list, tuple)):
+        return (type(value).__name__, tuple(_canonical(item) for item in value))
+    elif isinstance(value, np.ndarray):
+        return ("ndarray", value.dtype.str, value.shape, value.tobytes())
+    elif isinstance(value, np.generic):
+        return ("ndarray", value.dtype.str, (), value.tobytes())
+    elif value is None or isinstance(value, (bool, int, float, str, bytes)):
+        return (type(value).__name__, value)
+    else:
+        raise TypeError(f"Cannot fingerprint value of type {type(value)}.")
+
+
+def fingerprint(*values: Any) -> str:
+    """Returns a stable hex digest of the content of values.
+
+  Args:
+    *values: nested structures of config dicts, mappings, sequences, arrays and
+      scalars.
+
+  Raises:
+    TypeError: if the values contain anything else.
+  """
+    return hashlib.sha256(repr(_canonical(values)).encode()).hexdigest()
+
+
+def file_fingerprint(*paths: str) -> str:
+    """Returns a stable hex digest of the content of files."""
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(pathlib.Path(path).read_bytes())
+    return digest.hexdigest()
+
+
+def default_directory() -> Optional[str]:
+    """Returns the root directory of on-disk caches, or None if disabled."""
+    directory = os.environ.get(_CACHE_DIR_ENV)
+    if directory is None:
+        return os.path.join(os.path.expanduser("~"), ".cache", "meltingpot")
+    else:
+        return directory or None
+
+
+class ContentCache(Generic[T]):
+    """A cache of values in memory, backed by files on disk.
+
+  Values returned from the cache are shared: callers must not modify them.
+  """
+
+    def __init__(
+        self,
+        namespace: str,
+        encode: Callable[[T], bytes],
+        decode: Callable[[bytes], T],
+        max_memory_entries: int = 64,
+        directory: Optional[str] = None,
+    ) -> None:
+        """Initializes the cache.
+
+    Args:
+      namespace: name of the subdirectory holding the values on disk.
+      encode: converts a value to the bytes written to disk.
+      decode: converts bytes read from disk back to a value.
+      max_memory_entries: the number of most recently used values to keep in
+        memory.
+      directory: root directory of the on-disk cache. Defaults to
+        `default_directory()`, evaluated when the disk is first accessed.
+    """
+        self._namespace = namespace
+        self._encode = encode
+        self._decode = decode
+        self._max_memory_entries = max_memory_entries
+        self._directory = directory
+        self._memory = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> Optional[pathlib.Path]:
+        directory = self._directory or default_directory()
+        if directory is None:
+            return None
+        return pathlib.Path(directory, self._namespace, key)
+
+    def _read(self, key: str) -> Optional[T]:
+        """Returns the value stored on disk, or None if missing or unreadable."""
+        path = self._path(key)
+        if path is None:
+            return None
+        try:
+            return self._decode(path.read_bytes())
+        except FileNotFoundError:
+            return None
+        except Exception:  # pylint: disable=broad-except
+            logging.warning("Ignoring unreadable cache entry %s.", path, exc_info=True)
+            return None
+
+    def _write(self, key: str, value: T) -> None:
+        """Stores value on disk. Failures are logged and otherwise ignored."""
+        path = self._path(key)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{key}.")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(self._encode(value))
+                os.replace(temp_path, path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        except OSError:
+            logging.warning("Failed to write cache entry %s.", path, exc_info=True)
+
+    def _remember(self, key: str, value: T) -> None:
+        with self._lock:
+            self._memory[key] = value
+            self._memory.move_to_end(key)
+            while len(self._memory) > self._max_memory_entries:
+                self._memory.popitem(last=False)
+
+    def get_or_create(self, key: str, create: Callable[[], T]) -> T:
+        """Returns the cached value for key, creating and caching it if missing.
+
+    Args:
+      key: the fingerprint of everything the value is computed from.
+      create: computes the value.
+    """
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                return value
+        value = self._read(key)
+        if value is None:
+            value = create()
+            self._write(key, value)
+        self._remember(key, value)
+        return value
+
+    def get_or_create_file(
+        self, key: str, create: Callable[[], T]
+    ) -> Optional[pathlib.Path]:
+        """Returns the file holding the value for key, creating it if missing.
+
+    The value is neither read from the file nor held in memory, for values that
+    are only consumed from disk.
+
+    Args:
+      key: the fingerprint of everything the value is computed from.
+      create: computes the value.
+
+    Returns:
+      The path of the file, or None if the on-disk cache is disabled or the
+      file could not be written.
+    """
+        path = self._path(key)
+        if path is None:
+            return None
+        if not path.exists():
+            self._write(key, create())
+        return path if path.exists() else None
+
+    def clear_memory(self) -> None:
+        """Removes all values held in memory. Values on disk are kept."""
+        with self._lock:
+            self._memory.clear()
@@ -0,0 +1,142 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for content_cache."""
+
+import json
+import os
+import tempfile
+from unittest import mock
+
+from absl.testing import absltest
+from absl.testing import parameterized
+from ml_collections import config_dict
+import numpy as np
+
+from meltingpot.python.utils.substrates import content_cache
+
+
+def _build_cache(directory, **kwargs):
+    return content_cache.ContentCache(
+        namespace="test",
+        encode=lambda value: json.dumps(value).encode(),
+        decode=json.loads,
+        directory=directory,
+        **kwargs,
+    )
+
+
+class FingerprintTest(parameterized.TestCase):
+    def test_is_stable(self):
+        config = config_dict.ConfigDict({"a": 1, "b": [{"c": np.ones(2)}]})
+        self.assertEqual(
+            content_cache.fingerprint(config),
+            content_cache.fingerprint(config.copy_and_resolve_references()),
+        )
+
+    def test_ignores_key_order(self):
+        self.assertEqual(
+            content_cache.fingerprint({"a": 1, "b": 2}),
+            content_cache.fingerprint({"b": 2, "a": 1}),
+        )
+
+    @parameterized.parameters(
+        ({"a": 1}, {"a": 2}),
+        ({"a": 1}, {"a": 1.0}),
+        ({"a": 1}, {"a": "1"}),
+        ([1, 2], (1, 2)),
+        (np.zeros(2), np.zeros(3)),
+        (np.zeros(2, np.int32), np.zeros(2, np.int64)),
+    )
+    def test_depends_on_content(self, a, b):
+        self.assertNotEqual(content_cache.fingerprint(a), content_cache.fingerprint(b))
+
+    def test_unsupported_type_raises(self):
+        with self.assertRaises(TypeError):
+            content_cache.fingerprint(object())
+
+
+class ContentCacheTest(absltest.TestCase):
+    def _create_tempdir(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return directory.name
+
+    def test_creates_once(self):
+        create = mock.Mock(return_value={"x": "1"})
+        cache = _build_cache(self._create_tempdir())
+        first = cache.get_or_create("key", create)
+        second = cache.get_or_create("key", create)
+
+        with self.subTest("value"):
+            self.assertEqual(first, {"x": "1"})
+        with self.subTest("shared"):
+            self.assertIs(first, second)
+        with self.subTest("created_once"):
+            create.assert_called_once()
+
+    def test_reads_from_disk(self):
+        directory = self._create_tempdir()
+        _build_cache(directory).get_or_create("key", lambda: {"x": "1"})
+        create = mock.Mock()
+        value = _build_cache(directory).get_or_create("key", create)
+
+        with self.subTest("value"):
+            self.assertEqual(value, {"x": "1"})
+        with self.subTest("not_created"):
+            create.assert_not_called()
+
+    def test_disabled_disk_cache(self):
+        with mock.patch.dict(os.environ, {"MELTINGPOT_CACHE_DIR": ""}):
+            self.assertIsNone(content_cache.default_directory())
+            cache = _build_cache(directory=None)
+            self.assertEqual(cache.get_or_create("key", lambda: 1), 1)
+
+    def test_evicts_least_recently_used(self):
+        create = mock.Mock(side_effect=lambda: 1)
+        with mock.patch.dict(os.environ, {"MELTINGPOT_CACHE_DIR": ""}):
+            cache = _build_cache(directory=None, max_memory_entries=2)
+            for key in ("a", "b", "a", "c", "a", "b"):
+                cache.get_or_create(key, create)
+        self.assertEqual(create.call_count, 4)
+
+    def test_creates_file_once(self):
+        directory = self._create_tempdir()
+        create = mock.Mock(return_value={"x": "1"})
+        cache = _build_cache(directory)
+        first = cache.get_or_create_file("key", create)
+        second = cache.get_or_create_file("key", create)
+
+        with self.subTest("path"):
+            self.assertEqual(first, second)
+        with self.subTest("content"):
+            self.assertEqual(json.loads(first.read_bytes()), {"x": "1"})
+        with self.subTest("created_once"):
+            create.assert_called_once()
+
+    def test_file_with_disabled_disk_cache(self):
+        with mock.patch.dict(os.environ, {"MELTINGPOT_CACHE_DIR": ""}):
+            cache = _build_cache(directory=None)
+            self.assertIsNone(cache.get_or_create_file("key", lambda: 1))
+
+    def test_ignores_unreadable_entries(self):
+        directory = self._create_tempdir()
+        os.makedirs(os.path.join(directory, "test"))
+        with open(os.path.join(directory, "test", "key"), "w") as f:
+            f.write("not json")
+        value = _build_cache(directory).get_or_create("key", lambda: 2)
+        self.assertEqual(value, 2)
+
+
+if __name__ == "__main__":
+    absltest.main()
@@ -0,0 +1,32 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Renders player views by cropping the image of the whole map.
+
+Cropping is enabled by setting `cropRender` in the lab2d settings, which
+`builder.builder` passes through to Lua (see `enable`). The map is then
+rendered once per step, and each player's RGB observation is copied from it,
+with only the cells whose pixels can differ from the map image rendered again
+(see meltingpot/lua/modules/crop_render.lua). Observations are pixel-identical
+to those rendered without cropping.
+"""
+
+from ml_collections import config_dict
+
+
+def enable(config: config_dict.ConfigDict) -> config_dict.ConfigDict:
+    """Returns a copy of a substrate config with crop rendering enabled."""
+    config = config.copy_and_resolve_references()
+    with config.unlocked():
+        config.lab2d_settings.cropRender = True
+    return config.lock()
@@ -0,0 +1,103 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Reads the profile of the Lua simulation of a substrate.
+
+Profiling is enabled by setting `profile` in the lab2d settings, which
+`builder.builder` passes through to Lua (see `enable`). The simulation then
+accumulates the time and number of calls of its component methods, updaters
+and observation functions (see meltingpot/lua/modules/profiler.lua), which are
+read from the environment's `profile` property.
+
+The profile is of the current episode: it restarts on every reset, including
+the soft resets of substrates built with `soft_reset`, which restart the
+episode in the same Lua environment.
+"""
+
+import collections
+from typing import Iterable, NamedTuple, Sequence
+
+from ml_collections import config_dict
+
+import dmlab2d
+
+PROFILE_PROPERTY = "profile"
+
+
+class ProfileEntry(NamedTuple):
+    """The accumulated calls to a profiled function.
+
+  Attributes:
+    name: the profiled function, e.g. "component/Edible:onEnter".
+    calls: the number of calls.
+    seconds: the total processor time of the calls, including nested calls.
+  """
+
+    name: str
+    calls: int
+    seconds: float
+
+
+def enable(config: config_dict.ConfigDict) -> config_dict.ConfigDict:
+    """Returns a copy of a substrate config with profiling enabled."""
+    config = config.copy_and_resolve_references()
+    with config.unlocked():
+        config.lab2d_settings.profile = True
+    return config.lock()
+
+
+def parse(report: str) -> Sequence[ProfileEntry]:
+    """Returns the entries of a report read from the profile property."""
+    entries = []
+    for line in report.splitlines():
+        if line:
+            name, calls, seconds = line.split("\t")
+            entries.append(ProfileEntry(name, int(calls), float(seconds)))
+    return entries
+
+
+def read(env: dmlab2d.Environment) -> Sequence[ProfileEntry]:
+    """Returns the profile of the current episode of env.
+
+  Args:
+    env: a substrate (or any wrapper of the environment returned by
+      `builder.builder`) built with profiling enabled.
+
+  Raises:
+    ValueError: if the substrate was built without profiling.
+  """
+    try:
+        report = env.read_property(PROFILE_PROPERTY)
+    except KeyError as e:
+        raise ValueError(
+            "Profiling is not enabled. Build the substrate from "
+            "`lua_profiler.enable(config)`."
+        ) from e
+    return parse(report)
+
+
+def merge(*profiles: Iterable[ProfileEntry]) -> Sequence[ProfileEntry]:
+    """Returns the sum of profiles, e.g. of several episodes."""
+    calls = collections.Counter()
+    seconds = collections.Counter()
+    for profile in profiles:
+        for entry in profile:
+            calls[entry.name] += entry.calls
+            seconds[entry.name] += entry.seconds
+    return [ProfileEntry(name, calls[name], seconds[name]) for name in calls]
+
+
+def ranked(profile: Iterable[ProfileEntry]) -> Sequence[ProfileEntry]:
+    """Returns the entries of a profile, from the most to least time taken."""
+    return sorted(profile, key=lambda entry: (-entry.seconds, entry.name))
+
@@ -0,0 +1,80 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for lua_profiler."""
+
+from absl.testing import absltest
+
+from meltingpot.python import substrate
+from meltingpot.python.utils.substrates import lua_profiler
+
+ProfileEntry = lua_profiler.ProfileEntry
+
+
+class LuaProfilerTest(absltest.TestCase):
+    def test_parse(self):
+        report = "component/Edible:onEnter\t3\t0.5\nframe/gridUpdate\t2\t1.25"
+        self.assertEqual(
+            lua_profiler.parse(report),
+            [
+                ProfileEntry("component/Edible:onEnter", 3, 0.5),
+                ProfileEntry("frame/gridUpdate", 2, 1.25),
+            ],
+        )
+
+    def test_parse_empty(self):
+        self.assertEqual(lua_profiler.parse(""), [])
+
+    def test_merge_and_rank(self):
+        first = [ProfileEntry("a", 1, 1.0), ProfileEntry("b", 2, 0.5)]
+        second = [ProfileEntry("b", 2, 1.0)]
+        self.assertEqual(
+            lua_profiler.ranked(lua_profiler.merge(first, second)),
+            [ProfileEntry("b", 4, 1.5), ProfileEntry("a", 1, 1.0)],
+        )
+
+    def test_read_from_substrate(self):
+        config = lua_profiler.enable(substrate.get_config("clean_up"))
+        with substrate.build(config) as env:
+            env.reset()
+            for _ in range(3):
+                env.step([0] * config.num_players)
+            profile = {entry.name: entry for entry in lua_profiler.read(env)}
+        with self.subTest("frames"):
+            self.assertEqual(profile["frame/simulationUpdate"].calls, 3)
+        with self.subTest("components"):
+            self.assertIn("component/DirtSpawner:update", profile)
+        with self.subTest("observations"):
+            self.assertIn("observation/WORLD.RGB", profile)
+
+    def test_soft_reset_restarts_profile(self):
+        config = lua_profiler.enable(substrate.get_config("clean_up"))
+        with config.unlocked():
+            config.soft_reset = True
+        with substrate.build(config) as env:
+            env.reset()
+            for _ in range(3):
+                env.step([0] * config.num_players)
+            env.reset()
+            env.step([0] * config.num_players)
+            profile = {entry.name: entry for entry in lua_profiler.read(env)}
+        self.assertEqual(profile["frame/simulationUpdate"].calls, 1)
+
+    def test_read_without_profiling_raises(self):
+        with substrate.build(substrate.get_config("clean_up")) as env:
+            with self.assertRaises(ValueError):
+                lua_profiler.read(env)
+
+
+if __name__ == "__main__":
+    absltest.main()
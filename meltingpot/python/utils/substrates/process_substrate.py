@@ -0,0 +1,344 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Runs substrates in worker processes, sharing observations through memory.
+
+The parent allocates observation buffers in shared memory from the substrate's
+observation spec. Workers write each step's observations into those buffers in
+place, so the only data sent through the pipe is a small control message
+(actions one way; step type, rewards and discount the other), regardless of
+the size of the observations. Global observations that the substrate returns
+separately (see `multiplayer_wrapper.TimeStep`) are shared once per substrate
+rather than once per player.
+
+All players of the substrate must have the same specs.
+"""
+
+import multiprocessing
+import traceback
+from typing import Callable, List, Mapping, NamedTuple, Optional, Sequence
+
+import dm_env
+import numpy as np
+
+from meltingpot.python.utils.substrates import shared_arrays
+from meltingpot.python.utils.substrates.wrappers import base
+from meltingpot.python.utils.substrates.wrappers import multiplayer_wrapper
+
+SubstrateBuilder = Callable[[], base.Wrapper]
+
+# The command for a substrate: the actions to step with, or None to reset it.
+Command = Optional[np.ndarray]
+
+_RESET = "reset"
+_STEP = "step"
+_CLOSE = "close"
+
+
+class Specs(NamedTuple):
+    """Specs of a substrate whose players all have the same specs."""
+
+    num_players: int
+    observation: Mapping[str, dm_env.specs.Array]
+    reward: dm_env.specs.Array
+    discount: dm_env.specs.Array
+    action: dm_env.specs.DiscreteArray
+    global_observation: Mapping[str, dm_env.specs.Array]
+
+
+class StepResult(NamedTuple):
+    """The parts of a timestep that are not written to the shared buffers."""
+
+    step_type: dm_env.StepType
+    reward: np.ndarray
+    discount: float
+
+
+class _WorkerError(NamedTuple):
+    """Sent by a worker process that raised an exception."""
+
+    traceback: str
+
+
+def get_specs(env: base.Wrapper) -> Specs:
+    """Returns the specs of env, which must be the same for all players."""
+    observation_spec = env.observation_spec()
+    reward_spec = env.reward_spec()
+    action_spec = env.action_spec()
+    for specs in (observation_spec, reward_spec, action_spec):
+        if any(spec != specs[0] for spec in specs[1:]):
+            raise ValueError(f"Substrate has heterogeneous specs: {specs}.")
+    global_observation_spec = env.global_observation_spec()
+    overlap = set(observation_spec[0]) & set(global_observation_spec)
+    if overlap:
+        raise ValueError(f"Global observations shadow player observations: {overlap}.")
+    return Specs(
+        num_players=len(action_spec),
+        observation=dict(observation_spec[0]),
+        reward=reward_spec[0],
+        discount=env.discount_spec(),
+        action=action_spec[0],
+        global_observation=dict(global_observation_spec),
+    )
+
+
+def buffer_layout(specs: Specs, num_substrates: int) -> shared_arrays.Layout:
+    """Returns the layout of the observation buffers of several substrates.
+
+  Args:
+    specs: the specs of each substrate.
+    num_substrates: the number of substrates writing to the buffers.
+
+  Returns:
+    Player observations have shape [num_substrates, num_players, ...] and global
+    observations have shape [num_substrates, ...].
+  """
+    layout = dict(
+        shared_arrays.layout_from_specs(
+            specs.observation, (num_substrates, specs.num_players)
+        )
+    )
+    layout.update(
+        shared_arrays.layout_from_specs(specs.global_observation, (num_substrates,))
+    )
+    return layout
+
+
+def run_command(env: base.Wrapper, command: Command) -> dm_env.TimeStep:
+    """Resets or steps env according to command."""
+    if command is None:
+        return env.reset()
+    else:
+        return env.step(command)
+
+
+def write_observations(
+    buffers: Mapping[str, np.ndarray],
+    specs: Specs,
+    index: int,
+    timestep: dm_env.TimeStep,
+) -> None:
+    """Writes the observations of timestep into the buffers.
+
+  Args:
+    buffers: arrays with the layout given by `buffer_layout`.
+    specs: the specs of the substrate.
+    index: the substrate that the timestep is from.
+    timestep: the timestep to write the observations of.
+  """
+    for player, observation in enumerate(timestep.observation):
+        for key in specs.observation:
+            buffers[key][index, player] = observation[key]
+    for key in specs.global_observation:
+        buffers[key][index] = timestep.global_observation[key]
+
+
+def get_step_result(timestep: dm_env.TimeStep, specs: Specs) -> StepResult:
+    """Returns the parts of timestep that are sent through the pipe."""
+    return StepResult(
+        step_type=timestep.step_type,
+        reward=np.asarray(timestep.reward, dtype=specs.reward.dtype),
+        discount=timestep.discount,
+    )
+
+
+def _worker(connection, build_substrate: SubstrateBuilder, index: int) -> None:
+    """Runs a substrate in a worker process.
+
+  Args:
+    connection: the worker's end of the pipe.
+    build_substrate: builds the substrate.
+    index: where to write observations in the shared buffers.
+  """
+    env = None
+    buffers = None
+    try:
+        env = build_substrate()
+        specs = get_specs(env)
+        connection.send(specs)
+        buffers = shared_arrays.SharedArrays.attach(connection.recv())
+        while True:
+            command, actions = connection.recv()
+            if command == _CLOSE:
+                break
+            timestep = run_command(env, None if command == _RESET else actions)
+            write_observations(buffers.arrays, specs, index, timestep)
+            connection.send(get_step_result(timestep, specs))
+    except Exception:  # pylint: disable=broad-except
+        connection.send(_WorkerError(traceback.format_exc()))
+    finally:
+        if buffers is not None:
+            buffers.close()
+        if env is not None:
+            env.close()
+        connection.close()
+
+
+class Worker:
+    """Handle to a substrate running in a worker process.
+
+  Usage: call `receive_specs`, allocate shared buffers from the specs and pass
+  them to `attach`. Then alternate calls to `send` and `receive`.
+  """
+
+    def __init__(self, build_substrate: SubstrateBuilder, index: int = 0) -> None:
+        """Starts the worker process.
+
+    Args:
+      build_substrate: builds the substrate. Must be picklable.
+      index: where the worker writes observations in the shared buffers.
+    """
+        context = multiprocessing.get_context("spawn")
+        self._index = index
+        self._connection, worker_connection = context.Pipe()
+        self._process = context.Process(
+            target=_worker,
+            args=(worker_connection, build_substrate, index),
+            daemon=True,
+        )
+        self._process.start()
+        worker_connection.close()
+
+    def _receive(self):
+        """Returns the next message from the worker."""
+        message = self._connection.recv()
+        if isinstance(message, _WorkerError):
+            raise RuntimeError(f"Worker {self._index} failed:\n{message.traceback}")
+        return message
+
+    def receive_specs(self) -> Specs:
+        """Waits for the substrate to be built and returns its specs."""
+        return self._receive()
+
+    def attach(self, handle: shared_arrays.Handle) -> None:
+        """Sends the shared buffers the worker should write observations to."""
+        self._connection.send(handle)
+
+    def send(self, command: Command) -> None:
+        """Sends a command to the worker without waiting for the result."""
+        if command is None:
+            self._connection.send((_RESET, None))
+        else:
+            self._connection.send((_STEP, command))
+
+    def receive(self) -> StepResult:
+        """Waits for the result of the last command sent."""
+        return self._receive()
+
+    def close(self) -> None:
+        """Stops the worker process."""
+        try:
+            self._connection.send((_CLOSE, None))
+        except OSError:
+            pass  # Worker has already exited.
+        self._process.join(timeout=10)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._connection.close()
+
+
+class ProcessSubstrate(dm_env.Environment):
+    """A substrate running in a worker process.
+
+  Observations in the returned timesteps are read-only views of shared memory.
+  They are overwritten by the next call to `reset` or `step`, so copy them if
+  they need to be kept.
+
+  If the substrate returns global observations separately, so does this.
+  """
+
+    def __init__(self, build_substrate: SubstrateBuilder) -> None:
+        """Initializes the object.
+
+    Args:
+      build_substrate: builds the substrate. Must be picklable.
+    """
+        self._worker = Worker(build_substrate)
+        self._shared = None
+        try:
+            self._specs = self._worker.receive_specs()
+            self._shared = shared_arrays.SharedArrays.create(
+                buffer_layout(self._specs, 1)
+            )
+            self._worker.attach(self._shared.handle)
+        except BaseException:
+            self.close()
+            raise
+        self._observations: List[Mapping[str, np.ndarray]] = []
+        for player in range(self._specs.num_players):
+            observation = {}
+            for key in self._specs.observation:
+                observation[key] = self._read_only_view(key, 0, player)
+            self._observations.append(observation)
+        self._global_observation = {
+            key: self._read_only_view(key, 0) for key in self._specs.global_observation
+        }
+
+    def _read_only_view(self, key: str, *index: int) -> np.ndarray:
+        # The trailing ellipsis ensures scalar observations are also views.
+        view = self._shared[key][(*index, ...)]
+        view.flags.writeable = False
+        return view
+
+    def _run(self, command: Command) -> dm_env.TimeStep:
+        self._worker.send(command)
+        result = self._worker.receive()
+        timestep = dm_env.TimeStep(
+            step_type=result.step_type,
+            reward=list(result.reward),
+            discount=result.discount,
+            observation=[dict(observation) for observation in self._observations],
+        )
+        if self._specs.global_observation:
+            return multiplayer_wrapper.TimeStep(
+                *timestep, global_observation=dict(self._global_observation)
+            )
+        else:
+            return timestep
+
+    def reset(self) -> dm_env.TimeStep:
+        """See base class."""
+        return self._run(None)
+
+    def step(self, actions: Sequence[int]) -> dm_env.TimeStep:
+        """See base class."""
+        return self._run(np.asarray(actions))
+
+    def observation_spec(self) -> Sequence[Mapping[str, dm_env.specs.Array]]:
+        """See base class."""
+        return [dict(self._specs.observation)] * self._specs.num_players
+
+    def global_observation_spec(self) -> Mapping[str, dm_env.specs.Array]:
+        """Returns the spec of the `global_observation` field of timesteps."""
+        return dict(self._specs.global_observation)
+
+    def reward_spec(self) -> Sequence[dm_env.specs.Array]:
+        """See base class."""
+        return [self._specs.reward] * self._specs.num_players
+
+    def discount_spec(self) -> dm_env.specs.Array:
+        """See base class."""
+        return self._specs.discount
+
+    def action_spec(self) -> Sequence[dm_env.specs.DiscreteArray]:
+        """See base class."""
+        return (self._specs.action,) * self._specs.num_players
+
+    def close(self) -> None:
+        """See base class."""
+        self._worker.close()
+        self._observations = []
+        self._global_observation = {}
+        if self._shared is not None:
+            self._shared.unlink()
+            self._shared = None
@@ -0,0 +1,162 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for process_substrate."""
+
+from absl.testing import absltest
+import dm_env
+import numpy as np
+
+from meltingpot.python.utils.substrates import process_substrate
+from meltingpot.python.utils.substrates.wrappers import base
+from meltingpot.python.utils.substrates.wrappers import multiplayer_wrapper
+
+NUM_PLAYERS = 2
+OBSERVATION_SPEC = dm_env.specs.Array(shape=[2], dtype=np.int32, name="OBS")
+REWARD_SPEC = dm_env.specs.Array(shape=[], dtype=np.float64, name="REWARD")
+GLOBAL_SPEC = dm_env.specs.Array(shape=[], dtype=np.int32, name="GLOBAL")
+ACTION_SPEC = dm_env.specs.DiscreteArray(num_values=4, dtype=np.int32, name="action")
+DISCOUNT_SPEC = dm_env.specs.BoundedArray(
+    shape=[], dtype=np.float64, minimum=0, maximum=1, name="discount"
+)
+
+
+class _FakeSubstrate(base.Wrapper):
+    """Substrate that observes the step count and the action of each player."""
+
+    def __init__(self) -> None:
+        super().__init__(env=None)
+        self._step = 0
+
+    def _timestep(self, step_type, actions):
+        observation = [
+            {"OBS": np.array([self._step, action], dtype=np.int32)}
+            for action in actions
+        ]
+        reward = [float(action) for action in actions]
+        return dm_env.TimeStep(step_type, reward, 1.0, observation)
+
+    def reset(self):
+        self._step = 0
+        return self._timestep(dm_env.StepType.FIRST, [0] * NUM_PLAYERS)
+
+    def step(self, actions):
+        if actions[0] < 0:
+            raise ValueError("Negative action.")
+        self._step += 1
+        return self._timestep(dm_env.StepType.MID, actions)
+
+    def observation_spec(self):
+        return [{"OBS": OBSERVATION_SPEC}] * NUM_PLAYERS
+
+    def global_observation_spec(self):
+        return {}
+
+    def reward_spec(self):
+        return [REWARD_SPEC] * NUM_PLAYERS
+
+    def action_spec(self):
+        return [ACTION_SPEC] * NUM_PLAYERS
+
+    def discount_spec(self):
+        return DISCOUNT_SPEC
+
+    def close(self):
+        pass
+
+
+class _FakeSubstrateWithGlobal(_FakeSubstrate):
+    """Substrate that also observes the step count once, as a global observation."""
+
+    def _timestep(self, step_type, actions):
+        timestep = super()._timestep(step_type, actions)
+        return multiplayer_wrapper.TimeStep(
+            *timestep, global_observation={"GLOBAL": np.int32(self._step)}
+        )
+
+    def global_observation_spec(self):
+        return {"GLOBAL": GLOBAL_SPEC}
+
+
+class ProcessSubstrateTest(absltest.TestCase):
+    def test_specs(self):
+        with process_substrate.ProcessSubstrate(_FakeSubstrate) as env:
+            with self.subTest("observation_spec"):
+                self.assertEqual(
+                    env.observation_spec(), [{"OBS": OBSERVATION_SPEC}] * NUM_PLAYERS
+                )
+            with self.subTest("reward_spec"):
+                self.assertEqual(env.reward_spec(), [REWARD_SPEC] * NUM_PLAYERS)
+            with self.subTest("action_spec"):
+                self.assertEqual(env.action_spec(), (ACTION_SPEC,) * NUM_PLAYERS)
+            with self.subTest("discount_spec"):
+                self.assertEqual(env.discount_spec(), DISCOUNT_SPEC)
+
+    def test_timesteps(self):
+        with process_substrate.ProcessSubstrate(_FakeSubstrate) as env:
+            reset = env.reset()
+            np.testing.assert_equal(
+                reset,
+                dm_env.TimeStep(
+                    step_type=dm_env.StepType.FIRST,
+                    reward=[0.0, 0.0],
+                    discount=1.0,
+                    observation=[{"OBS": np.array([0, 0])}] * NUM_PLAYERS,
+                ),
+            )
+            step = env.step([2, 3])
+            np.testing.assert_equal(
+                step,
+                dm_env.TimeStep(
+                    step_type=dm_env.StepType.MID,
+                    reward=[2.0, 3.0],
+                    discount=1.0,
+                    observation=[{"OBS": np.array([1, 2])}, {"OBS": np.array([1, 3])}],
+                ),
+            )
+
+    def test_observations_are_read_only_views(self):
+        with process_substrate.ProcessSubstrate(_FakeSubstrate) as env:
+            observation = env.reset().observation[0]["OBS"]
+            with self.subTest("read_only"):
+                self.assertFalse(observation.flags.writeable)
+            env.step([1, 1])
+            with self.subTest("overwritten_by_step"):
+                np.testing.assert_equal(observation, [1, 1])
+
+    def test_global_observations(self):
+        with process_substrate.ProcessSubstrate(_FakeSubstrateWithGlobal) as env:
+            with self.subTest("spec"):
+                self.assertEqual(env.global_observation_spec(), {"GLOBAL": GLOBAL_SPEC})
+            env.reset()
+            step = env.step([2, 3])
+            np.testing.assert_equal(
+                step,
+                multiplayer_wrapper.TimeStep(
+                    step_type=dm_env.StepType.MID,
+                    reward=[2.0, 3.0],
+                    discount=1.0,
+                    observation=[{"OBS": np.array([1, 2])}, {"OBS": np.array([1, 3])}],
+                    global_observation={"GLOBAL": np.array(1)},
+                ),
+            )
+
+    def test_worker_error_is_raised(self):
+        with process_substrate.ProcessSubstrate(_FakeSubstrate) as env:
+            env.reset()
+            with self.assertRaisesRegex(RuntimeError, "Negative action"):
+                env.step([-1, 0])
+
+
+if __name__ == "__main__":
+    absltest.main()
@@ -0,0 +1,140 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Named NumPy arrays stored in a single block of shared memory.
+
+The process that creates the arrays owns the memory and must `unlink` it when
+done. Its child processes `attach` using the (picklable) handle, and see the
+same memory: writes made by one process are visible to all others without
+copying.
+"""
+
+from multiprocessing import shared_memory
+from typing import Mapping, NamedTuple, Sequence, Tuple
+
+import dm_env
+import numpy as np
+
+# Offsets of arrays in the block are aligned to this many bytes.
+_ALIGNMENT = 64
+
+Layout = Mapping[str, Tuple[Sequence[int], str]]
+
+
+class Handle(NamedTuple):
+    """Picklable reference to shared arrays, used to attach to them."""
+
+    name: str
+    layout: Tuple[Tuple[str, Tuple[int, ...], str], ...]
+
+
+def layout_from_specs(
+    specs: Mapping[str, dm_env.specs.Array], leading_shape: Sequence[int] = ()
+) -> Layout:
+    """Returns the layout of arrays matching specs.
+
+  Args:
+    specs: the spec of each array.
+    leading_shape: extra leading dimensions to add to each array.
+  """
+    return {
+        key: (tuple(leading_shape) + tuple(spec.shape), np.dtype(spec.dtype).str)
+        for key, spec in specs.items()
+    }
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // _ALIGNMENT) * _ALIGNMENT
+
+
+class SharedArrays:
+    """Named arrays backed by shared memory."""
+
+    def __init__(self, memory: shared_memory.SharedMemory, handle: Handle) -> None:
+        """Initializes the object. Use `create` or `attach` instead.
+
+    Args:
+      memory: the shared memory block holding the arrays.
+      handle: the handle of the arrays.
+    """
+        self._memory = memory
+        self._handle = handle
+        self._arrays = {}
+        offset = 0
+        for key, shape, dtype in handle.layout:
+            array = np.ndarray(shape, dtype=dtype, buffer=memory.buf, offset=offset)
+            self._arrays[key] = array
+            offset = _aligned(offset + array.nbytes)
+
+    @classmethod
+    def create(cls, layout: Layout) -> "SharedArrays":
+        """Allocates new zero-initialized shared arrays.
+
+    Args:
+      layout: the shape and dtype of each array.
+
+    Returns:
+      The arrays. The caller is responsible for calling `unlink`.
+    """
+        flat_layout = tuple(
+            (key, tuple(int(dim) for dim in shape), np.dtype(dtype).str)
+            for key, (shape, dtype) in layout.items()
+        )
+        size = 0
+        for _, shape, dtype in flat_layout:
+            size = _aligned(size + int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        return cls(memory, Handle(name=memory.name, layout=flat_layout))
+
+    @classmethod
+    def attach(cls, handle: Handle) -> "SharedArrays":
+        """Attaches to shared arrays created by another process.
+
+    Args:
+      handle: the handle of the arrays to attach to.
+
+    Returns:
+      The arrays. The caller should call `close` when done.
+    """
+        # Child processes share the resource tracker of their parent, so attaching
+        # does not cause the memory to be unlinked when the child exits.
+        memory = shared_memory.SharedMemory(name=handle.name)
+        return cls(memory, handle)
+
+    @property
+    def handle(self) -> Handle:
+        """The handle used to attach to these arrays from another process."""
+        return self._handle
+
+    @property
+    def arrays(self) -> Mapping[str, np.ndarray]:
+        """The arrays, keyed by name."""
+        return self._arrays
+
+    def __getitem__(self, key: str) -> np.ndarray:
+        return self._arrays[key]
+
+    def close(self) -> None:
+        """Detaches from the shared memory. The arrays must no longer be used."""
+        self._arrays = {}
+        try:
+            self._memory.close()
+        except BufferError:
+            # Views of the arrays are still referenced elsewhere. The mapping is
+            # released once they are garbage collected.
+            pass
+
+    def unlink(self) -> None:
+        """Closes and frees the shared memory. Only call from the creator."""
+        self.close()
+        self._memory.unlink()
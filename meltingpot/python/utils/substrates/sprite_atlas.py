@@ -0,0 +1,237 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Compiles the ASCII-art sprites of a substrate into an atlas of RGBA tiles.
+
+The Appearance and AdditionalSprites components describe `ascii_shape` sprites
+as text and a palette, which Lua rasterizes into the tile set every time a Lab2d
+is constructed. The atlas holds the same sprites already rasterized, packed into
+one uint8 array of shape [num_tiles, height, width, 4] that is stored in the
+on-disk content cache. Lua loads it with a single read and sets the prebuilt
+tiles instead of parsing the text (see `sprite_atlas.lua`).
+
+Only sprites that Lua would draw pixel for pixel are compiled: those whose text
+is a square of exactly spriteSize characters, all of which the palette maps to
+RGBA colors. Other sprites, and names given different sprites by different
+components, are left to Lua.
+"""
+
+import hashlib
+from typing import Any, Dict, Iterator, List, Mapping, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from meltingpot.python.utils.substrates import content_cache
+
+# The sprite size when lab2d_settings do not set one, as in api_factory.lua.
+_DEFAULT_SPRITE_SIZE = 16
+_COMPASS = ("N", "E", "S", "W")
+
+# The kwargs naming the sprites of each component with ASCII-art sprites.
+_SPRITE_KWARGS = {
+    "Appearance": ("spriteNames", "spriteShapes", "palettes"),
+    "AdditionalSprites": ("customSpriteNames", "customSpriteShapes", "customPalettes"),
+}
+
+# Atlases written to disk, keyed by their content. Lua reads the files, so the
+# values are never decoded.
+_ATLAS_CACHE = content_cache.ContentCache(
+    namespace="sprite_atlas",
+    encode=lambda tiles: tiles.tobytes(),
+    decode=bytes,
+)
+
+
+class Atlas(NamedTuple):
+    """Prebuilt sprites.
+
+  Attributes:
+    names: the name of each sprite.
+    indices: the index in tiles of the image of each sprite.
+    tiles: the distinct images, of shape [num_tiles, height, width, 4].
+  """
+
+    names: Tuple[str, ...]
+    indices: Tuple[int, ...]
+    tiles: np.ndarray
+
+
+def rasterize(
+    text: str, palette: Mapping[str, Any], sprite_size: int
+) -> Optional[np.ndarray]:
+    """Returns the RGBA image of an ASCII-art sprite.
+
+  Args:
+    text: the sprite, one row of characters per line. Leading and trailing empty
+      lines are ignored.
+    palette: maps each character to an RGBA color.
+    sprite_size: the width and height of the tiles.
+
+  Returns:
+    A uint8 array of shape [sprite_size, sprite_size, 4], or None if the sprite
+    is not a square of sprite_size characters whose colors are all in palette.
+  """
+    if " " in text:
+        # Lua skips spaces when parsing sprites.
+        return None
+    rows = text.split("\n")
+    while rows and not rows[0]:
+        rows.pop(0)
+    while rows and not rows[-1]:
+        rows.pop()
+    if len(rows) != sprite_size or any(len(row) != sprite_size for row in rows):
+        return None
+    colors = {}
+    for char in set(text) - {"\n"}:
+        color = palette.get(char)
+        if color is None or len(color) != 4:
+            return None
+        if not all(isinstance(c, (int, np.integer)) and 0 <= c <= 255 for c in color):
+            return None
+        colors[char] = tuple(color)
+    return np.array([[colors[char] for char in row] for row in rows], dtype=np.uint8)
+
+
+def _game_object_configs(lab2d_settings: Mapping[str, Any]) -> Iterator[Any]:
+    simulation = lab2d_settings["simulation"]
+    yield from simulation.get("gameObjects") or ()
+    yield from (simulation.get("prefabs") or {}).values()
+
+
+def _sprites(
+    lab2d_settings: Mapping[str, Any], sprite_size: int
+) -> Iterator[Tuple[str, Optional[np.ndarray]]]:
+    """Yields the name and image (if it can be prebuilt) of each sprite added."""
+    for game_object in _game_object_configs(lab2d_settings):
+        for component in game_object.get("components") or ():
+            kwargs_names = _SPRITE_KWARGS.get(component.get("component"))
+            if kwargs_names is None:
+                continue
+            kwargs = component.get("kwargs") or {}
+            names_key, shapes_key, palettes_key = kwargs_names
+            names = kwargs.get(names_key) or ()
+            if kwargs.get("renderMode") != "ascii_shape":
+                for name in names:
+                    yield name, None
+                continue
+            shapes = kwargs.get(shapes_key) or ()
+            palettes = kwargs.get(palettes_key) or ()
+            for i, name in enumerate(names):
+                shape = shapes[i] if i < len(shapes) else None
+                palette = palettes[i] if i < len(palettes) else None
+                if isinstance(shape, str):
+                    sprites = [(name, shape)]
+                elif isinstance(shape, (list, tuple)) and len(shape) == 4:
+                    sprites = [
+                        (f"{name}.{direction}", text)
+                        for direction, text in zip(_COMPASS, shape)
+                    ]
+                else:
+                    sprites = [(name, None)]
+                for sprite_name, text in sprites:
+                    if isinstance(text, str) and isinstance(palette, Mapping):
+                        yield sprite_name, rasterize(text, palette, sprite_size)
+                    else:
+                        yield sprite_name, None
+
+
+def compile_atlas(lab2d_settings: Mapping[str, Any]) -> Optional[Atlas]:
+    """Returns the sprites of lab2d_settings that can be prebuilt.
+
+  Args:
+    lab2d_settings: the settings of a substrate, with its avatars built, as
+      nested dicts and lists.
+
+  Returns:
+    The atlas, or None if there are no sprites to prebuild.
+  """
+    sprite_size = int(lab2d_settings.get("spriteSize", _DEFAULT_SPRITE_SIZE))
+    images: Dict[str, Optional[np.ndarray]] = {}
+    for name, image in _sprites(lab2d_settings, sprite_size):
+        if name not in images:
+            images[name] = image
+        elif (
+            images[name] is not None
+            and (image is None or not np.array_equal(images[name], image))
+        ):
+            # Different components add different sprites with this name.
+            images[name] = None
+
+    names = []
+    indices = []
+    tiles: List[np.ndarray] = []
+    tile_indices: Dict[bytes, int] = {}
+    for name, image in images.items():
+        if image is None:
+            continue
+        key = image.tobytes()
+        if key not in tile_indices:
+            tile_indices[key] = len(tiles)
+            tiles.append(image)
+        names.append(name)
+        indices.append(tile_indices[key])
+    if not tiles:
+        return None
+    return Atlas(names=tuple(names), indices=tuple(indices), tiles=np.stack(tiles))
+
+
+def encode_sprites(atlas: Atlas) -> str:
+    """Returns the tile of each sprite of atlas, as read by `sprite_atlas.lua`.
+
+  Lab2d settings are flattened to string values, which Lua's `read_settings`
+  only accepts for keys declared in its defaults, so lists cannot be passed.
+  The sprites are therefore encoded as one string, with a line of
+  "<tile> <name>" per sprite, where tiles are indexed from 1 as in Lua.
+
+  Args:
+    atlas: the atlas.
+  """
+    for name in atlas.names:
+        if not name or "\n" in name or name != name.strip():
+            raise ValueError(f"Cannot encode sprite name {name!r}.")
+    return "\n".join(
+        f"{index + 1} {name}" for name, index in zip(atlas.names, atlas.indices)
+    )
+
+
+def atlas_settings(lab2d_settings: Mapping[str, Any]) -> Optional[Dict[str, Any]]:
+    """Prebuilds the sprites of lab2d_settings and returns the atlas setting.
+
+  The tiles are written to the on-disk content cache, and the returned
+  `spriteAtlas` setting tells Lua where to read them.
+
+  Args:
+    lab2d_settings: the settings of a substrate, with its avatars built, as
+      nested dicts and lists.
+
+  Returns:
+    The setting, or None if the disk cache is disabled or there are no sprites
+    to prebuild.
+  """
+    atlas = compile_atlas(lab2d_settings)
+    if atlas is None:
+        return None
+    key = hashlib.sha256(
+        repr((atlas.tiles.shape, atlas.tiles.tobytes())).encode()
+    ).hexdigest()
+    path = _ATLAS_CACHE.get_or_create_file(key, lambda: atlas.tiles)
+    if path is None:
+        return None
+    num_tiles, height, width, _ = atlas.tiles.shape
+    return {
+        "path": str(path),
+        "numTiles": num_tiles,
+        "height": height,
+        "width": width,
+        "sprites": encode_sprites(atlas),
+    }
@@ -0,0 +1,147 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for sprite_atlas."""
+
+import os
+import tempfile
+from unittest import mock
+
+from absl.testing import absltest
+from absl.testing import parameterized
+import numpy as np
+
+from meltingpot.python.utils.substrates import sprite_atlas
+
+_RED = (255, 0, 0, 255)
+_CLEAR = (0, 0, 0, 0)
+_PALETTE = {"r": _RED, "x": _CLEAR}
+_SHAPE = """
+rx
+xr
+"""
+
+
+def _appearance(names, shapes, palettes, render_mode="ascii_shape"):
+    return {
+        "component": "Appearance",
+        "kwargs": {
+            "renderMode": render_mode,
+            "spriteNames": names,
+            "spriteShapes": shapes,
+            "palettes": palettes,
+        },
+    }
+
+
+def _settings(*components, prefabs=None):
+    return {
+        "spriteSize": 2,
+        "simulation": {
+            "gameObjects": [{"components": [component]} for component in components],
+            "prefabs": prefabs or {},
+        },
+    }
+
+
+class RasterizeTest(parameterized.TestCase):
+    def test_rasterizes(self):
+        image = sprite_atlas.rasterize(_SHAPE, _PALETTE, 2)
+        np.testing.assert_array_equal(image, [[_RED, _CLEAR], [_CLEAR, _RED]])
+
+    @parameterized.named_parameters(
+        ("wrong_size", _SHAPE, _PALETTE, 3),
+        ("ragged", "\nrx\nx\n", _PALETTE, 2),
+        ("missing_color", _SHAPE, {"r": _RED}, 2),
+        ("rgb_color", _SHAPE, {"r": (255, 0, 0), "x": _CLEAR}, 2),
+        ("space", "\n r\nxr\n", {"r": _RED, "x": _CLEAR, " ": _CLEAR}, 2),
+    )
+    def test_not_rasterized(self, text, palette, sprite_size):
+        self.assertIsNone(sprite_atlas.rasterize(text, palette, sprite_size))
+
+
+class CompileAtlasTest(absltest.TestCase):
+    def test_shares_identical_tiles(self):
+        atlas = sprite_atlas.compile_atlas(
+            _settings(_appearance(["A", "B"], [_SHAPE, _SHAPE], [_PALETTE] * 2))
+        )
+        with self.subTest("names"):
+            self.assertEqual(atlas.names, ("A", "B"))
+        with self.subTest("indices"):
+            self.assertEqual(atlas.indices, (0, 0))
+        with self.subTest("tiles"):
+            self.assertEqual(atlas.tiles.shape, (1, 2, 2, 4))
+
+    def test_names_orientations(self):
+        atlas = sprite_atlas.compile_atlas(
+            _settings(_appearance(["A"], [[_SHAPE] * 4], [_PALETTE]))
+        )
+        self.assertEqual(atlas.names, ("A.N", "A.E", "A.S", "A.W"))
+
+    def test_includes_prefabs(self):
+        prefab = {"components": [_appearance(["A"], [_SHAPE], [_PALETTE])]}
+        atlas = sprite_atlas.compile_atlas(_settings(prefabs={"a": prefab}))
+        self.assertEqual(atlas.names, ("A",))
+
+    def test_leaves_conflicting_names_to_lua(self):
+        other_palette = {"r": _CLEAR, "x": _RED}
+        atlas = sprite_atlas.compile_atlas(
+            _settings(
+                _appearance(["A", "B"], [_SHAPE, _SHAPE], [_PALETTE] * 2),
+                _appearance(["A"], [_SHAPE], [other_palette]),
+                _appearance(["B"], [], [], render_mode="colored_square"),
+            )
+        )
+        self.assertIsNone(atlas)
+
+    def test_no_ascii_sprites(self):
+        atlas = sprite_atlas.compile_atlas(
+            _settings(_appearance(["A"], [], [], render_mode="colored_square"))
+        )
+        self.assertIsNone(atlas)
+
+
+class AtlasSettingsTest(absltest.TestCase):
+    def test_writes_tiles(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = _settings(_appearance(["A", "B"], [_SHAPE] * 2, [_PALETTE] * 2))
+        with mock.patch.dict(os.environ, {"MELTINGPOT_CACHE_DIR": directory.name}):
+            atlas_settings = sprite_atlas.atlas_settings(settings)
+
+        with self.subTest("layout"):
+            self.assertEqual(
+                {key: atlas_settings[key] for key in ("numTiles", "height", "width")},
+                {"numTiles": 1, "height": 2, "width": 2},
+            )
+        with self.subTest("one_based_sprites"):
+            self.assertEqual(atlas_settings["sprites"], "1 A\n1 B")
+        with self.subTest("scalar_values"):
+            # read_settings rejects the flattened elements of lists.
+            for value in atlas_settings.values():
+                self.assertIsInstance(value, (str, int))
+        with self.subTest("file"):
+            with open(atlas_settings["path"], "rb") as f:
+                tiles = np.frombuffer(f.read(), dtype=np.uint8)
+            np.testing.assert_array_equal(
+                tiles.reshape(2, 2, 4), sprite_atlas.rasterize(_SHAPE, _PALETTE, 2)
+            )
+
+    def test_disabled_disk_cache(self):
+        settings = _settings(_appearance(["A"], [_SHAPE], [_PALETTE]))
+        with mock.patch.dict(os.environ, {"MELTINGPOT_CACHE_DIR": ""}):
+            self.assertIsNone(sprite_atlas.atlas_settings(settings))
+
+
+if __name__ == "__main__":
+    absltest.main()
@@ -0,0 +1,352 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Runs several copies of a substrate in lockstep, batching their timesteps.
+
+Batched timesteps have:
+  - step_type: int32 array of shape [num_envs].
+  - reward: array of shape [num_envs, num_players].
+  - discount: array of shape [num_envs].
+  - observation: a dictionary mapping each observation name to an array of
+    shape [num_envs, num_players, ...].
+  - global_observation: only if the substrate returns global observations
+    separately (see `multiplayer_wrapper.TimeStep`), a dictionary mapping each
+    global observation name to an array of shape [num_envs, ...].
+
+Actions are given as an integer array of shape [num_envs, num_players].
+
+By default, the observations of each timestep are immutable mappings of
+read-only views of buffers shared by all timesteps, so they are only valid
+until the next call to `reset` or `step`, which overwrites them. Copy them if
+they need to be kept, or pass `copy_observations=True` to receive copies.
+
+Each copy is reset automatically: when a copy returns a LAST timestep, the next
+call to `step` ignores the actions for that copy and returns the FIRST timestep
+of its next episode instead.
+"""
+
+import abc
+import concurrent.futures
+from typing import Iterable, List, Mapping, Sequence
+
+import dm_env
+import immutabledict
+import numpy as np
+
+from meltingpot.python.utils.substrates import process_substrate
+from meltingpot.python.utils.substrates import shared_arrays
+from meltingpot.python.utils.substrates.wrappers import multiplayer_wrapper
+
+BACKENDS = ("serial", "thread", "process")
+
+SubstrateBuilder = process_substrate.SubstrateBuilder
+
+_Command = process_substrate.Command
+_Result = process_substrate.StepResult
+_Specs = process_substrate.Specs
+
+
+class _Backend(metaclass=abc.ABCMeta):
+    """Runs the copies of the substrate."""
+
+    @property
+    @abc.abstractmethod
+    def specs(self) -> _Specs:
+        """The specs of a single copy."""
+
+    @property
+    @abc.abstractmethod
+    def buffers(self) -> Mapping[str, np.ndarray]:
+        """The batched observation buffers written by `run`."""
+
+    @abc.abstractmethod
+    def run(self, commands: Sequence[_Command]) -> Sequence[_Result]:
+        """Runs a command on each copy, writing observations to the buffers."""
+
+    @abc.abstractmethod
+    def close(self) -> None:
+        """Closes all copies."""
+
+
+class _InProcessBackend(_Backend):
+    """Runs the copies in this process, optionally on a thread each."""
+
+    def __init__(
+        self, build_substrates: Sequence[SubstrateBuilder], threaded: bool
+    ) -> None:
+        """Initializes the backend.
+
+    Args:
+      build_substrates: builds each copy of the substrate.
+      threaded: whether to run each copy on its own thread.
+    """
+        num_envs = len(build_substrates)
+        if threaded:
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=num_envs, thread_name_prefix="VectorSubstrate"
+            )
+            self._map = self._executor.map
+        else:
+            self._executor = None
+            self._map = map
+        self._envs = list(self._map(lambda build: build(), build_substrates))
+        self._specs = process_substrate.get_specs(self._envs[0])
+        layout = process_substrate.buffer_layout(self._specs, num_envs)
+        self._buffers = {
+            key: np.zeros(shape, dtype=dtype) for key, (shape, dtype) in layout.items()
+        }
+
+    @property
+    def specs(self) -> _Specs:
+        return self._specs
+
+    @property
+    def buffers(self) -> Mapping[str, np.ndarray]:
+        return self._buffers
+
+    def _run_one(self, index: int, command: _Command) -> _Result:
+        timestep = process_substrate.run_command(self._envs[index], command)
+        process_substrate.write_observations(
+            self._buffers, self._specs, index, timestep
+        )
+        return process_substrate.get_step_result(timestep, self._specs)
+
+    def run(self, commands: Sequence[_Command]) -> Sequence[_Result]:
+        return list(self._map(self._run_one, range(len(commands)), commands))
+
+    def close(self) -> None:
+        for env in self._envs:
+            env.close()
+        if self._executor:
+            self._executor.shutdown(wait=False)
+
+
+class _ProcessBackend(_Backend):
+    """Runs each copy in a worker process.
+
+  Observations are written by the workers directly into shared memory, so only
+  small control messages (actions, rewards, step types) are sent between
+  processes.
+  """
+
+    def __init__(self, build_substrates: Sequence[SubstrateBuilder]) -> None:
+        """Initializes the backend.
+
+    Args:
+      build_substrates: builds each copy of the substrate. Must be picklable.
+    """
+        num_envs = len(build_substrates)
+        self._workers: List[process_substrate.Worker] = []
+        self._shared = None
+        try:
+            for index, build_substrate in enumerate(build_substrates):
+                self._workers.append(process_substrate.Worker(build_substrate, index))
+            all_specs = [worker.receive_specs() for worker in self._workers]
+            self._specs = all_specs[0]
+            self._shared = shared_arrays.SharedArrays.create(
+                process_substrate.buffer_layout(self._specs, num_envs)
+            )
+            for worker in self._workers:
+                worker.attach(self._shared.handle)
+        except BaseException:
+            self.close()
+            raise
+
+    @property
+    def specs(self) -> _Specs:
+        return self._specs
+
+    @property
+    def buffers(self) -> Mapping[str, np.ndarray]:
+        return self._shared.arrays
+
+    def run(self, commands: Sequence[_Command]) -> Sequence[_Result]:
+        for worker, command in zip(self._workers, commands):
+            worker.send(command)
+        return [worker.receive() for worker in self._workers]
+
+    def close(self) -> None:
+        for worker in self._workers:
+            worker.close()
+        self._workers = []
+        if self._shared is not None:
+            self._shared.unlink()
+            self._shared = None
+
+
+class VectorSubstrate:
+    """Runs several copies of a substrate in lockstep."""
+
+    def __init__(
+        self,
+        build_substrates: Sequence[SubstrateBuilder],
+        backend: str = "serial",
+        copy_observations: bool = False,
+    ) -> None:
+        """Initializes the object.
+
+    Args:
+      build_substrates: builds each copy of the substrate. For the "process"
+        backend these must be picklable.
+      backend: how to run the copies. One of:
+        "serial": one after the other in the calling thread.
+        "thread": concurrently, each on its own thread.
+        "process": concurrently, each in its own process. Observations are
+          returned through shared memory.
+      copy_observations: whether each timestep holds copies of the observations.
+        Otherwise it holds read-only views that the next call to `reset` or
+        `step` overwrites.
+    """
+        num_envs = len(build_substrates)
+        if num_envs < 1:
+            raise ValueError("At least one substrate is required.")
+        if backend == "serial":
+            self._backend = _InProcessBackend(build_substrates, threaded=False)
+        elif backend == "thread":
+            self._backend = _InProcessBackend(build_substrates, threaded=True)
+        elif backend == "process":
+            self._backend = _ProcessBackend(build_substrates)
+        else:
+            raise ValueError(f"Unknown backend {backend!r}, options are {BACKENDS}.")
+        self._num_envs = num_envs
+        self._specs = self._backend.specs
+        self._copy_observations = copy_observations
+        self._observation = self._read_only_views(self._specs.observation)
+        self._global_observation = self._read_only_views(
+            self._specs.global_observation
+        )
+        # Copies to reset on the next call to step.
+        self._needs_reset = [True] * num_envs
+
+    @property
+    def num_envs(self) -> int:
+        """The number of copies of the substrate."""
+        return self._num_envs
+
+    @property
+    def num_players(self) -> int:
+        """The number of players in each copy of the substrate."""
+        return self._specs.num_players
+
+    def _read_only_views(self, keys: Iterable[str]) -> Mapping[str, np.ndarray]:
+        """Returns an immutable mapping of read-only views of the buffers."""
+        views = {}
+        for key in keys:
+            views[key] = self._backend.buffers[key].view()
+            views[key].flags.writeable = False
+        return immutabledict.immutabledict(views)
+
+    def _observations(
+        self, views: Mapping[str, np.ndarray]
+    ) -> Mapping[str, np.ndarray]:
+        """Returns the observations to return in a timestep."""
+        if self._copy_observations:
+            return {key: view.copy() for key, view in views.items()}
+        else:
+            return views
+
+    def _batched_timestep(self, results: Sequence[_Result]) -> dm_env.TimeStep:
+        """Returns the batched timestep of all copies."""
+        step_type = np.array([result.step_type for result in results], np.int32)
+        self._needs_reset = [
+            result.step_type == dm_env.StepType.LAST for result in results
+        ]
+        timestep = dm_env.TimeStep(
+            step_type=step_type,
+            reward=np.stack([result.reward for result in results]),
+            discount=np.array(
+                [result.discount for result in results],
+                dtype=self._specs.discount.dtype,
+            ),
+            observation=self._observations(self._observation),
+        )
+        if self._specs.global_observation:
+            return multiplayer_wrapper.TimeStep(
+                *timestep,
+                global_observation=self._observations(self._global_observation),
+            )
+        else:
+            return timestep
+
+    def reset(self) -> dm_env.TimeStep:
+        """Resets all copies of the substrate."""
+        commands: List[_Command] = [None] * self._num_envs
+        return self._batched_timestep(self._backend.run(commands))
+
+    def step(self, actions: np.ndarray) -> dm_env.TimeStep:
+        """Steps all copies, resetting those whose last timestep was LAST.
+
+    Args:
+      actions: integer array of shape [num_envs, num_players].
+
+    Returns:
+      The batched timestep.
+    """
+        actions = np.asarray(actions)
+        if actions.shape != (self._num_envs, self.num_players):
+            raise ValueError(
+                f"Expected actions of shape {(self._num_envs, self.num_players)}, "
+                f"got {actions.shape}."
+            )
+        commands = [
+            None if needs_reset else env_actions
+            for needs_reset, env_actions in zip(self._needs_reset, actions)
+        ]
+        return self._batched_timestep(self._backend.run(commands))
+
+    def observation_spec(self) -> Mapping[str, dm_env.specs.Array]:
+        """Returns the batched observation spec."""
+        leading_shape = (self._num_envs, self.num_players)
+        return {
+            key: spec.replace(shape=leading_shape + tuple(spec.shape))
+            for key, spec in self._specs.observation.items()
+        }
+
+    def global_observation_spec(self) -> Mapping[str, dm_env.specs.Array]:
+        """Returns the batched spec of the `global_observation` field."""
+        return {
+            key: spec.replace(shape=(self._num_envs,) + tuple(spec.shape))
+            for key, spec in self._specs.global_observation.items()
+        }
+
+    def reward_spec(self) -> dm_env.specs.Array:
+        """Returns the batched reward spec."""
+        spec = self._specs.reward
+        return spec.replace(shape=(self._num_envs, self.num_players) + spec.shape)
+
+    def discount_spec(self) -> dm_env.specs.Array:
+        """Returns the batched discount spec."""
+        spec = self._specs.discount
+        return spec.replace(shape=(self._num_envs,) + spec.shape)
+
+    def action_spec(self) -> dm_env.specs.BoundedArray:
+        """Returns the batched action spec."""
+        spec = self._specs.action
+        return dm_env.specs.BoundedArray(
+            shape=(self._num_envs, self.num_players),
+            dtype=spec.dtype,
+            minimum=0,
+            maximum=spec.num_values - 1,
+            name=spec.name,
+        )
+
+    def close(self) -> None:
+        """Closes all copies of the substrate."""
+        self._backend.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args, **kwargs):
+        del args, kwargs
+        self.close()
@@ -0,0 +1,203 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for vector_substrate."""
+
+import functools
+
+from absl.testing import absltest
+from absl.testing import parameterized
+import dm_env
+import numpy as np
+
+from meltingpot.python.utils.substrates import vector_substrate
+from meltingpot.python.utils.substrates.wrappers import base
+
+NUM_PLAYERS = 2
+EPISODE_LENGTH = 2
+OBSERVATION_SPEC = dm_env.specs.Array(shape=[3], dtype=np.float32, name="OBS")
+REWARD_SPEC = dm_env.specs.Array(shape=[], dtype=np.float64, name="REWARD")
+ACTION_SPEC = dm_env.specs.DiscreteArray(num_values=4, dtype=np.int32, name="action")
+DISCOUNT_SPEC = dm_env.specs.BoundedArray(
+    shape=[], dtype=np.float64, minimum=0, maximum=1, name="discount"
+)
+
+
+class _FakeSubstrate(base.Wrapper):
+    """Substrate whose observations encode its id, the step and the actions."""
+
+    def __init__(self, env_id: int) -> None:
+        super().__init__(env=None)
+        self._env_id = env_id
+        self._step = 0
+
+    def _timestep(self, step_type, actions):
+        observation = [
+            {"OBS": np.array([self._env_id, self._step, action], dtype=np.float32)}
+            for action in actions
+        ]
+        reward = [float(action) for action in actions]
+        discount = 0.0 if step_type == dm_env.StepType.LAST else 1.0
+        return dm_env.TimeStep(step_type, reward, discount, observation)
+
+    def reset(self):
+        self._step = 0
+        return self._timestep(dm_env.StepType.FIRST, [0] * NUM_PLAYERS)
+
+    def step(self, actions):
+        self._step += 1
+        if self._step == EPISODE_LENGTH:
+            step_type = dm_env.StepType.LAST
+        else:
+            step_type = dm_env.StepType.MID
+        return self._timestep(step_type, actions)
+
+    def observation_spec(self):
+        return [{"OBS": OBSERVATION_SPEC}] * NUM_PLAYERS
+
+    def global_observation_spec(self):
+        return {}
+
+    def reward_spec(self):
+        return [REWARD_SPEC] * NUM_PLAYERS
+
+    def action_spec(self):
+        return [ACTION_SPEC] * NUM_PLAYERS
+
+    def discount_spec(self):
+        return DISCOUNT_SPEC
+
+    def close(self):
+        pass
+
+
+def _build_vector_substrate(num_envs, backend, copy_observations=False):
+    build_substrates = [functools.partial(_FakeSubstrate, n) for n in range(num_envs)]
+    return vector_substrate.VectorSubstrate(
+        build_substrates, backend=backend, copy_observations=copy_observations
+    )
+
+
+class VectorSubstrateTest(parameterized.TestCase):
+    @parameterized.parameters(*vector_substrate.BACKENDS)
+    def test_specs(self, backend):
+        with _build_vector_substrate(3, backend) as env:
+            with self.subTest("observation_spec"):
+                self.assertEqual(
+                    env.observation_spec(),
+                    {"OBS": OBSERVATION_SPEC.replace(shape=[3, NUM_PLAYERS, 3])},
+                )
+            with self.subTest("reward_spec"):
+                self.assertEqual(
+                    env.reward_spec(), REWARD_SPEC.replace(shape=[3, NUM_PLAYERS])
+                )
+            with self.subTest("discount_spec"):
+                self.assertEqual(env.discount_spec(), DISCOUNT_SPEC.replace(shape=[3]))
+            with self.subTest("action_spec"):
+                self.assertEqual(
+                    env.action_spec(),
+                    dm_env.specs.BoundedArray(
+                        shape=[3, NUM_PLAYERS],
+                        dtype=np.int32,
+                        minimum=0,
+                        maximum=3,
+                        name="action",
+                    ),
+                )
+
+    @parameterized.parameters(*vector_substrate.BACKENDS)
+    def test_batched_timesteps(self, backend):
+        with _build_vector_substrate(2, backend, copy_observations=True) as env:
+            reset = env.reset()
+            step = env.step(np.array([[1, 2], [3, 0]]))
+
+        with self.subTest("reset"):
+            np.testing.assert_equal(
+                reset,
+                dm_env.TimeStep(
+                    step_type=np.array([0, 0], dtype=np.int32),
+                    reward=np.zeros([2, 2]),
+                    discount=np.ones([2]),
+                    observation={
+                        "OBS": np.array(
+                            [[[0, 0, 0], [0, 0, 0]], [[1, 0, 0], [1, 0, 0]]],
+                            dtype=np.float32,
+                        )
+                    },
+                ),
+            )
+        with self.subTest("step"):
+            np.testing.assert_equal(
+                step,
+                dm_env.TimeStep(
+                    step_type=np.array([1, 1], dtype=np.int32),
+                    reward=np.array([[1, 2], [3, 0]], dtype=np.float64),
+                    discount=np.ones([2]),
+                    observation={
+                        "OBS": np.array(
+                            [[[0, 1, 1], [0, 1, 2]], [[1, 1, 3], [1, 1, 0]]],
+                            dtype=np.float32,
+                        )
+                    },
+                ),
+            )
+
+    @parameterized.parameters(*vector_substrate.BACKENDS)
+    def test_auto_reset(self, backend):
+        actions = np.ones([1, NUM_PLAYERS])
+        with _build_vector_substrate(1, backend) as env:
+            step_types = [env.reset().step_type[0]]
+            for _ in range(2 * EPISODE_LENGTH):
+                step_types.append(env.step(actions).step_type[0])
+        self.assertEqual(
+            step_types,
+            [
+                dm_env.StepType.FIRST,
+                dm_env.StepType.MID,
+                dm_env.StepType.LAST,
+                dm_env.StepType.FIRST,
+                dm_env.StepType.MID,
+            ],
+        )
+
+    @parameterized.parameters(*vector_substrate.BACKENDS)
+    def test_observations_are_read_only_views(self, backend):
+        with _build_vector_substrate(1, backend) as env:
+            first = env.reset().observation
+            second = env.step(np.ones([1, NUM_PLAYERS])).observation
+            with self.subTest("read_only"):
+                self.assertFalse(first["OBS"].flags.writeable)
+            with self.subTest("shared"):
+                self.assertIs(first["OBS"], second["OBS"])
+            with self.subTest("overwritten"):
+                np.testing.assert_equal(first["OBS"], [[[0, 1, 1], [0, 1, 1]]])
+
+    def test_copied_observations_are_not_overwritten(self):
+        with _build_vector_substrate(1, "serial", copy_observations=True) as env:
+            first = env.reset().observation["OBS"]
+            env.step(np.ones([1, NUM_PLAYERS]))
+        np.testing.assert_equal(first, np.zeros([1, NUM_PLAYERS, 3]))
+
+    def test_wrong_action_shape_raises(self):
+        with _build_vector_substrate(2, "serial") as env:
+            env.reset()
+            with self.assertRaises(ValueError):
+                env.step(np.ones([2]))
+
+    def test_unknown_backend_raises(self):
+        with self.assertRaises(ValueError):
+            _build_vector_substrate(1, "unknown")
+
+
+if __name__ == "__main__":
+    absltest.main()
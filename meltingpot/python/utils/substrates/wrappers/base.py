@@ -59,6 +59,10 @@ class Wrapper(dmlab2d.Environment):
         """See base class."""
         return self._env.action_spec(*args, **kwargs)
 
+    def global_observation_spec(self, *args, **kwargs):
+        """Returns the spec of observations shared by all players, if any."""
+        return self._env.global_observation_spec(*args, **kwargs)
+
     def close(self, *args, **kwargs):
         """See base class."""
         return self._env.close(*args, **kwargs)
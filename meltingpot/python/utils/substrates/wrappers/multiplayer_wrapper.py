@@ -11,9 +11,15 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
-"""Wrapper that converts the DMLab2D specs into lists of action/observation."""
+"""Wrapper that converts the DMLab2D specs into lists of action/observation.
 
-from typing import Iterator, Mapping, Sequence, TypeVar
+By default, global observations (e.g. WORLD.RGB) are added to the observations
+of every player. When `separate_global_observations` is set they are instead
+returned once per timestep, in the `global_observation` field of a `TimeStep`.
+Use `player_observations` to get per-player views that include them.
+"""
+
+from typing import Any, Iterator, Mapping, NamedTuple, Sequence, TypeVar
 
 import dm_env
 import numpy as np
@@ -23,6 +29,48 @@ from meltingpot.python.utils.substrates.wrappers import base
 T = TypeVar("T")
 
 
+class TimeStep(NamedTuple):
+    """A multiplayer timestep that holds global observations only once.
+
+  Attributes:
+    step_type: as in `dm_env.TimeStep`.
+    reward: the reward of each player.
+    discount: as in `dm_env.TimeStep`.
+    observation: the individual observations of each player.
+    global_observation: the observations shared by all players.
+  """
+
+    step_type: Any
+    reward: Any
+    discount: Any
+    observation: Any
+    global_observation: Mapping[str, Any]
+
+    def first(self) -> bool:
+        return self.step_type == dm_env.StepType.FIRST
+
+    def mid(self) -> bool:
+        return self.step_type == dm_env.StepType.MID
+
+    def last(self) -> bool:
+        return self.step_type == dm_env.StepType.LAST
+
+
+def player_observations(timestep: dm_env.TimeStep) -> Sequence[Mapping[str, Any]]:
+    """Returns the observations of each player, including global observations.
+
+  Args:
+    timestep: a multiplayer timestep. If it is a `TimeStep` its global
+      observations are added to the observations of each player.
+  """
+    global_observation = getattr(timestep, "global_observation", None)
+    if not global_observation:
+        return timestep.observation
+    return [
+        dict(observation, **global_observation) for observation in timestep.observation
+    ]
+
+
 def _player_observations(
     observations: Mapping[str, T], suffix: str, num_players: int
 ) -> Iterator[T]:
@@ -52,6 +100,9 @@ class Wrapper(base.Wrapper):
   -   rewards are returned as lists of scalars
   -   actions are received as lists of dictionary observations
   -   discounts are never None
+  -   global observations are either added to the observations of each player
+      or, if `separate_global_observations` is set, returned once in the
+      `global_observation` field of a `TimeStep`
   """
 
     def __init__(
@@ -59,6 +110,7 @@ class Wrapper(base.Wrapper):
         env,
         individual_observation_names: Sequence[str],
         global_observation_names: Sequence[str],
+        separate_global_observations: bool = False,
     ):
         """Constructor.
 
@@ -68,11 +120,14 @@ class Wrapper(base.Wrapper):
       individual_observation_names: (list) of per-player observations.
       global_observation_names: (list) of observations that are available to all
         players and analytics.
+      separate_global_observations: whether to return global observations once
+        per timestep instead of adding them to the observations of each player.
     """
         super().__init__(env)
         self._num_players = self._get_num_players()
         self._individual_observation_suffixes = individual_observation_names
         self._global_observation_names = global_observation_names
+        self._separate_global_observations = separate_global_observations
 
     def _get_num_players(self) -> int:
         """Returns maximum player index in dmlab2d action spec."""
@@ -90,12 +145,20 @@ class Wrapper(base.Wrapper):
         for suffix in self._individual_observation_suffixes:
             for i, value in _player_observations(source, suffix, self._num_players):
                 player_observations[i][suffix] = value
-        for name in self._global_observation_names:
-            value = source[name]
-            for i in range(self._num_players):
-                player_observations[i][name] = value
+        if not self._separate_global_observations:
+            global_observations = self._get_global_observations(source)
+            for observation in player_observations:
+                observation.update(global_observations)
         return player_observations
 
+    def _get_global_observations(self, source: Mapping[str, T]) -> Mapping[str, T]:
+        """Returns global observations from dmlab2d observations.
+
+    Args:
+      source: dmlab2d observations source to check.
+    """
+        return {name: source[name] for name in self._global_observation_names}
+
     def _get_rewards(self, source: Mapping[str, T]) -> Sequence[T]:
         """Returns multiplayer rewards from dmlab2d observations.
 
@@ -113,12 +176,19 @@ class Wrapper(base.Wrapper):
     Args:
       source: dmlab2d observations source to check.
     """
-        return dm_env.TimeStep(
+        timestep = dm_env.TimeStep(
             step_type=source.step_type,
             reward=self._get_rewards(source.observation),
             discount=0.0 if source.discount is None else source.discount,
             observation=self._get_observations(source.observation),
         )
+        if self._separate_global_observations:
+            return TimeStep(
+                *timestep,
+                global_observation=self._get_global_observations(source.observation),
+            )
+        else:
+            return timestep
 
     def _get_action(self, source: Sequence[Mapping[str, T]]) -> Mapping[str, T]:
         """Returns dmlab2 action from multiplayer actions.
@@ -158,6 +228,17 @@ class Wrapper(base.Wrapper):
         source = super().observation_spec()
         return self._get_observations(source)
 
+    def global_observation_spec(self) -> Mapping[str, dm_env.specs.Array]:
+        """Returns the spec of the `global_observation` field of timesteps.
+
+    This is empty unless `separate_global_observations` is set.
+    """
+        if self._separate_global_observations:
+            source = super().observation_spec()
+            return self._get_global_observations(source)
+        else:
+            return {}
+
     def reward_spec(self) -> Sequence[dm_env.specs.Array]:
         """See base class."""
         source = super().observation_spec()
@@ -261,6 +261,79 @@ class Lab2DToListsWrapperTest(absltest.TestCase):
         )
         np.testing.assert_equal(actual, expected)
 
+    def test_separate_global_observations(self):
+        env = mock.Mock(spec_set=dmlab2d.Environment)
+        env.action_spec.return_value = {
+            "1.MOVE": ACT_SPEC,
+            "2.MOVE": ACT_SPEC,
+        }
+        env.observation_spec.return_value = {
+            "1.RGB": RGB_SPEC,
+            "2.RGB": RGB_SPEC,
+            "1.REWARD": REWARD_SPEC,
+            "2.REWARD": REWARD_SPEC,
+            "WORLD.RGB": RGB_SPEC,
+        }
+        env.reset.return_value = dm_env.restart(
+            {
+                "1.RGB": RGB_VALUE * 1,
+                "2.RGB": RGB_VALUE * 2,
+                "1.REWARD": REWARD_VALUE * 0,
+                "2.REWARD": REWARD_VALUE * 0,
+                "WORLD.RGB": RGB_VALUE,
+            }
+        )
+        wrapped = multiplayer_wrapper.Wrapper(
+            env,
+            individual_observation_names=["RGB"],
+            global_observation_names=["WORLD.RGB"],
+            separate_global_observations=True,
+        )
+        timestep = wrapped.reset()
+
+        with self.subTest("observation_spec"):
+            self.assertEqual(
+                wrapped.observation_spec(), [{"RGB": RGB_SPEC}, {"RGB": RGB_SPEC}],
+            )
+        with self.subTest("global_observation_spec"):
+            self.assertEqual(
+                wrapped.global_observation_spec(), {"WORLD.RGB": RGB_SPEC}
+            )
+        with self.subTest("timestep"):
+            expected = multiplayer_wrapper.TimeStep(
+                step_type=dm_env.StepType.FIRST,
+                reward=[REWARD_VALUE * 0, REWARD_VALUE * 0],
+                discount=0.0,
+                observation=[{"RGB": RGB_VALUE * 1}, {"RGB": RGB_VALUE * 2}],
+                global_observation={"WORLD.RGB": RGB_VALUE},
+            )
+            np.testing.assert_equal(timestep, expected)
+        with self.subTest("first"):
+            self.assertTrue(timestep.first())
+        with self.subTest("player_observations"):
+            np.testing.assert_equal(
+                multiplayer_wrapper.player_observations(timestep),
+                [
+                    {"RGB": RGB_VALUE * 1, "WORLD.RGB": RGB_VALUE},
+                    {"RGB": RGB_VALUE * 2, "WORLD.RGB": RGB_VALUE},
+                ],
+            )
+
+    def test_global_observations_are_not_separated_by_default(self):
+        env = mock.Mock(spec_set=dmlab2d.Environment)
+        env.action_spec.return_value = {"1.MOVE": ACT_SPEC}
+        env.observation_spec.return_value = {
+            "1.RGB": RGB_SPEC,
+            "1.REWARD": REWARD_SPEC,
+            "WORLD.RGB": RGB_SPEC,
+        }
+        wrapped = multiplayer_wrapper.Wrapper(
+            env,
+            individual_observation_names=["RGB"],
+            global_observation_names=["WORLD.RGB"],
+        )
+        self.assertEqual(wrapped.global_observation_spec(), {})
+
 
 if __name__ == "__main__":
     absltest.main()
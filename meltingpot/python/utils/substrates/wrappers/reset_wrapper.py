@@ -13,7 +13,9 @@
 # limitations under the License.
 """Wrapper that rebuilds the Lab2d environment on every reset."""
 
-from typing import Callable
+import collections
+import concurrent.futures
+from typing import Callable, Deque
 
 import dm_env
 
@@ -22,25 +24,75 @@ from meltingpot.python.utils.substrates.wrappers import base
 
 
 class ResetWrapper(base.Wrapper):
-    """Wrapper that rebuilds the environment on reset."""
+    """Wrapper that rebuilds the environment on reset.
 
-    def __init__(self, build_environment: Callable[[], dmlab2d.Environment]):
+  Optionally, the environments for upcoming episodes are built ahead of time on
+  a background thread, so that reset only has to swap in an environment that is
+  (usually) ready. Environments are always built in the order that
+  build_environment would have been called without prefetching.
+  """
+
+    def __init__(
+        self,
+        build_environment: Callable[[], dmlab2d.Environment],
+        prefetch_depth: int = 0,
+    ):
         """Initializes the object.
 
     Args:
       build_environment: Called to build the underlying environment.
+      prefetch_depth: number of environments for upcoming episodes to build in
+        the background. If 0, environments are built synchronously on reset.
     """
+        if prefetch_depth < 0:
+            raise ValueError(f"prefetch_depth must be >= 0, got {prefetch_depth}.")
         env = build_environment()
         super().__init__(env)
         self._rebuild_environment = build_environment
         self._reset = False
+        self._prefetched: Deque[concurrent.futures.Future] = collections.deque()
+        if prefetch_depth:
+            # A single worker guarantees environments are built in order.
+            self._executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="ResetWrapper"
+            )
+            for _ in range(prefetch_depth):
+                self._prefetch()
+        else:
+            self._executor = None
+
+    def _prefetch(self) -> None:
+        """Starts building an environment for a future episode."""
+        future = self._executor.submit(self._rebuild_environment)
+        self._prefetched.append(future)
+
+    def _next_environment(self) -> dmlab2d.Environment:
+        """Returns the environment to use for the next episode."""
+        if not self._prefetched:
+            return self._rebuild_environment()
+        future = self._prefetched.popleft()
+        self._prefetch()
+        return future.result()
 
     def reset(self) -> dm_env.TimeStep:
         """Rebuilds the environment and calls reset on it."""
         if self._reset:
             self._env.close()
-            self._env = self._rebuild_environment()
+            self._env = self._next_environment()
         else:
             # Don't rebuild on very first reset call (it's inefficient).
             self._reset = True
         return super().reset()
+
+    def close(self) -> None:
+        """See base class."""
+        if self._executor:
+            for future in self._prefetched:
+                future.cancel()
+            self._executor.shutdown(wait=True)
+            for future in self._prefetched:
+                if not future.cancelled() and future.exception() is None:
+                    future.result().close()
+            self._prefetched.clear()
+            self._executor = None
+        super().close()
@@ -0,0 +1,85 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for reset_wrapper."""
+
+import itertools
+from unittest import mock
+
+from absl.testing import absltest
+from absl.testing import parameterized
+
+import dmlab2d
+from meltingpot.python.utils.substrates.wrappers import reset_wrapper
+
+
+def _environment_builder():
+    """Returns a builder of mock environments and the environments it built."""
+    built = []
+    seeds = itertools.count()
+
+    def build_environment():
+        env = mock.Mock(spec_set=dmlab2d.Environment)
+        env.reset.return_value = next(seeds)
+        built.append(env)
+        return env
+
+    return build_environment, built
+
+
+class ResetWrapperTest(parameterized.TestCase):
+    @parameterized.parameters(0, 1, 3)
+    def test_episodes_use_environments_in_build_order(self, prefetch_depth):
+        build_environment, _ = _environment_builder()
+        env = reset_wrapper.ResetWrapper(
+            build_environment, prefetch_depth=prefetch_depth
+        )
+        try:
+            actual = [env.reset() for _ in range(5)]
+        finally:
+            env.close()
+        self.assertEqual(actual, [0, 1, 2, 3, 4])
+
+    @parameterized.parameters(0, 1, 3)
+    def test_previous_environment_is_closed(self, prefetch_depth):
+        build_environment, built = _environment_builder()
+        env = reset_wrapper.ResetWrapper(
+            build_environment, prefetch_depth=prefetch_depth
+        )
+        env.reset()
+        env.reset()
+        try:
+            built[0].close.assert_called_once()
+            built[1].close.assert_not_called()
+        finally:
+            env.close()
+
+    @parameterized.parameters(1, 3)
+    def test_close_closes_prefetched_environments(self, prefetch_depth):
+        build_environment, built = _environment_builder()
+        env = reset_wrapper.ResetWrapper(
+            build_environment, prefetch_depth=prefetch_depth
+        )
+        env.reset()
+        env.close()
+        for built_env in built:
+            built_env.close.assert_called_once()
+
+    def test_negative_prefetch_depth_raises(self):
+        build_environment, _ = _environment_builder()
+        with self.assertRaises(ValueError):
+            reset_wrapper.ResetWrapper(build_environment, prefetch_depth=-1)
+
+
+if __name__ == "__main__":
+    absltest.main()
@@ -0,0 +1,117 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Wrapper that adds the vocabulary of symbolic observations to their specs.
+
+A symbolic observation (`SYMBOLIC`) is the egocentric view window of a player's
+`RGB` observation as a uint8 array of shape [height, width, num_layers], with
+one entry per grid cell and layer. Each entry indexes the vocabulary of the
+substrate: the names of its sprites without their orientation. Index 0 (the
+name "") is an empty layer. See meltingpot/lua/modules/symbolic_observation.lua.
+"""
+
+from typing import Mapping, Optional, Sequence
+
+import dm_env
+import numpy as np
+
+from meltingpot.python.utils.substrates.wrappers import base
+
+SYMBOLIC_OBSERVATION = "SYMBOLIC"
+VOCABULARY_PROPERTY = "symbolicVocabulary"
+
+
+class SymbolicArray(dm_env.specs.BoundedArray):
+    """A `BoundedArray` spec of a symbolic observation, with its vocabulary."""
+
+    def __init__(
+        self,
+        shape: Sequence[int],
+        dtype: np.dtype,
+        vocabulary: Sequence[str],
+        name: Optional[str] = None,
+    ):
+        """Initializes the spec.
+
+    Args:
+      shape: the shape of the observation.
+      dtype: the dtype of the observation.
+      vocabulary: the name of each index in the observation.
+      name: the name of the observation.
+    """
+        super().__init__(
+            shape=shape,
+            dtype=dtype,
+            minimum=0,
+            maximum=len(vocabulary) - 1,
+            name=name,
+        )
+        self._vocabulary = tuple(vocabulary)
+
+    @property
+    def vocabulary(self) -> Sequence[str]:
+        """Returns the name of each index in the observation."""
+        return self._vocabulary
+
+    def __repr__(self):
+        return (
+            f"SymbolicArray(shape={self.shape!r}, dtype={self.dtype!r}, "
+            f"name={self.name!r}, vocabulary={self.vocabulary!r})"
+        )
+
+    def __reduce__(self):
+        return SymbolicArray, (self.shape, self.dtype, self.vocabulary, self.name)
+
+
+def is_symbolic(name: str) -> bool:
+    """Returns whether a Lab2d observation name is of a symbolic observation."""
+    return name.rpartition(".")[2] == SYMBOLIC_OBSERVATION
+
+
+class Wrapper(base.Wrapper):
+    """Wrapper that gives symbolic observations a `SymbolicArray` spec.
+
+  Added by `builder.builder` when symbolic observations are computed. Timesteps
+  are unchanged.
+  """
+
+    def __init__(self, env):
+        """Initializes the wrapper.
+
+    Args:
+      env: environment to wrap. When this wrapper closes env will also be
+        closed.
+    """
+        super().__init__(env)
+        self._vocabulary = tuple(
+            env.read_property(VOCABULARY_PROPERTY).split("\n")
+        )
+        observation_spec = dict(env.observation_spec())
+        for name, spec in observation_spec.items():
+            if is_symbolic(name):
+                observation_spec[name] = SymbolicArray(
+                    shape=spec.shape,
+                    dtype=spec.dtype,
+                    vocabulary=self._vocabulary,
+                    name=spec.name,
+                )
+        self._observation_spec = observation_spec
+
+    @property
+    def vocabulary(self) -> Sequence[str]:
+        """Returns the vocabulary of the symbolic observations."""
+        return self._vocabulary
+
+    def observation_spec(self) -> Mapping[str, dm_env.specs.Array]:
+        """See base class."""
+        return self._observation_spec
@@ -0,0 +1,84 @@
+# Copyright 2020 DeepMind Technologies Limited.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     https://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""Tests for symbolic_observation_wrapper."""
+
+import pickle
+from unittest import mock
+
+from absl.testing import absltest
+
+import dm_env
+import numpy as np
+
+import dmlab2d
+from meltingpot.python.utils.substrates.wrappers import symbolic_observation_wrapper
+
+SymbolicArray = symbolic_observation_wrapper.SymbolicArray
+
+RGB_SPEC = dm_env.specs.Array(shape=(8, 8, 3), dtype=np.uint8, name="1.RGB")
+SYMBOLIC_SPEC = dm_env.specs.Array(shape=(2, 2, 3), dtype=np.uint8, name="1.SYMBOLIC")
+VOCABULARY = ("", "Wall", "Apple")
+
+
+class SymbolicArrayTest(absltest.TestCase):
+    def test_bounds(self):
+        spec = SymbolicArray(shape=(2,), dtype=np.uint8, vocabulary=VOCABULARY)
+        with self.subTest("in_bounds"):
+            spec.validate(np.array([0, 2], dtype=np.uint8))
+        with self.subTest("out_of_bounds"):
+            with self.assertRaises(ValueError):
+                spec.validate(np.array([0, 3], dtype=np.uint8))
+
+    def test_replace_keeps_vocabulary(self):
+        spec = SymbolicArray(shape=(2,), dtype=np.uint8, vocabulary=VOCABULARY)
+        replaced = spec.replace(name="SYMBOLIC")
+        self.assertIsInstance(replaced, SymbolicArray)
+        self.assertEqual(replaced.vocabulary, VOCABULARY)
+
+    def test_pickle_keeps_vocabulary(self):
+        spec = SymbolicArray(
+            shape=(2,), dtype=np.uint8, vocabulary=VOCABULARY, name="SYMBOLIC"
+        )
+        unpickled = pickle.loads(pickle.dumps(spec))
+        self.assertIsInstance(unpickled, SymbolicArray)
+        self.assertEqual(unpickled.vocabulary, VOCABULARY)
+
+
+class WrapperTest(absltest.TestCase):
+    def test_observation_spec(self):
+        env = mock.Mock(spec_set=dmlab2d.Environment)
+        env.read_property.return_value = "\n".join(VOCABULARY)
+        env.observation_spec.return_value = {
+            "1.RGB": RGB_SPEC,
+            "1.SYMBOLIC": SYMBOLIC_SPEC,
+        }
+        wrapped = symbolic_observation_wrapper.Wrapper(env)
+        expected = {
+            "1.RGB": RGB_SPEC,
+            "1.SYMBOLIC": SymbolicArray(
+                shape=(2, 2, 3),
+                dtype=np.uint8,
+                vocabulary=VOCABULARY,
+                name="1.SYMBOLIC",
+            ),
+        }
+        actual = wrapped.observation_spec()
+        with self.subTest("specs"):
+            self.assertEqual(actual, expected)
+        with self.subTest("vocabulary"):
+            self.assertEqual(actual["1.SYMBOLIC"].vocabulary, VOCABULARY)
+
+
+if __name__ == "__main__":
+    absltest.main()
@@ -49,7 +49,7 @@ setuptools.setup(
             "lua/levels/**/*",
         ],
     },
-    python_requires=">=3.7",
+    python_requires=">=3.8",
     install_requires=[
         "absl-py",
         "dm_env",